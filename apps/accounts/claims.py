@@ -1,9 +1,25 @@
+from datetime import date
 from apps.oidc.claims import BaseProvider
 from django.conf import settings
 
 
+class IALExpiryMixin(object):
+    """For providers of ial and the claims derived from it."""
+
+    def get_claims_expiry(self):
+        # The IAL drops to 1 after ial_expires_at.
+        try:
+            expires_at = self.user.userprofile.ial_expires_at
+        except Exception:
+            return None
+        return expires_at if expires_at and expires_at >= date.today() else None
+
+
 # For address Claim
 class AddressClaimProvider(BaseProvider):
+    select_related = ('userprofile', )
+    prefetch_related = ('address_set', )
+    scope = 'address'
 
     def claim_address(self):
         try:
@@ -24,6 +40,9 @@ class AMRClaimProvider(BaseProvider):
 
 
 class IdentifierClaimProvider(BaseProvider):
+    select_related = ('userprofile', )
+    prefetch_related = ('individualidentifier_set', )
+    scope = 'document'
 
     def claim_document(self):
         try:
@@ -34,6 +53,9 @@ class IdentifierClaimProvider(BaseProvider):
 
 # For adding agent_to_organuization claim (e.g. "employee of", etc.)
 class AgentToOrganizationClaimProvider(BaseProvider):
+    select_related = ('userprofile', )
+    prefetch_related = ('org_staff__point_of_contact__userprofile', )
+    scope = 'organization'
 
     def claim_agent_to_organization(self):
         try:
@@ -44,6 +66,8 @@ class AgentToOrganizationClaimProvider(BaseProvider):
 
 # Reserved for future versions
 class AgentToMemberClaimProvider(BaseProvider):
+    select_related = ('userprofile', )
+    scope = 'organization'
 
     def claim_agent_to_member(self):
         try:
@@ -56,6 +80,9 @@ class AgentToMemberClaimProvider(BaseProvider):
 
 # Member to
 class MemberToOrganizationClaimProvider(BaseProvider):
+    select_related = ('userprofile', )
+    prefetch_related = ('org_members__point_of_contact__userprofile', )
+    scope = 'organization'
 
     def claim_member_to_organization(self):
         try:
@@ -66,6 +93,9 @@ class MemberToOrganizationClaimProvider(BaseProvider):
 
 # Identity Assurance for OIDC.
 class VerifiedPersonDataClaimProvider(BaseProvider):
+    select_related = ('userprofile', )
+    prefetch_related = ('subject_user', 'address_set')
+    scope = 'verified_claims'
 
     def claim_verified_claims(self):
         try:
@@ -74,8 +104,16 @@ class VerifiedPersonDataClaimProvider(BaseProvider):
             print(e)
             return None
 
+    def get_claims_expiry(self):
+        # Each piece of evidence leaves verified_claims after its expires_at.
+        today = date.today()
+        return min((d.expires_at for d in self.user.subject_user.all()
+                    if d.evidence and d.expires_at and d.expires_at >= today), default=None)
+
 
 class ExtendedGenderClaimProvider(BaseProvider):
+    select_related = ('userprofile', )
+    scope = 'profile'
 
     def claim_gender_identity_custom_value(self):
         try:
@@ -91,7 +129,19 @@ class ExtendedGenderClaimProvider(BaseProvider):
 
 
 # Contains most of the basic claims
-class UserProfileClaimProvider(BaseProvider):
+class UserProfileClaimProvider(IALExpiryMixin, BaseProvider):
+    select_related = ('userprofile', )
+    scope = 'profile'
+    scope_by_claim = {
+        'sub': 'openid',
+        'aal': 'openid',
+        'ial': 'openid',
+        'vot': 'openid',
+        'vtm': 'openid',
+        'email_verified': 'email',
+        'phone_number': 'phone',
+        'phone_verified': 'phone',
+    }
 
     def claim_sub(self):
         """"This claim is MANDATORY"""
@@ -230,6 +280,7 @@ class UserProfileClaimProvider(BaseProvider):
 
 class SubjectClaimProvider(BaseProvider):
     """"This claim is Mandatory"""
+    select_related = ('userprofile', )
 
     def claim_sub(self):
         try:
@@ -239,6 +290,8 @@ class SubjectClaimProvider(BaseProvider):
 
 
 class EmailVerifiedClaimProvider(BaseProvider):
+    select_related = ('userprofile', )
+    scope = 'email'
 
     def claim_email_verified(self):
         try:
@@ -247,7 +300,8 @@ class EmailVerifiedClaimProvider(BaseProvider):
             return None
 
 
-class IdentityAssuranceLevelClaimProvider(BaseProvider):
+class IdentityAssuranceLevelClaimProvider(IALExpiryMixin, BaseProvider):
+    select_related = ('userprofile', )
 
     def claim_ial(self):
         try:
@@ -256,8 +310,9 @@ class IdentityAssuranceLevelClaimProvider(BaseProvider):
             return None
 
 
-class AuthenticationContextClassReferencClaimProvider(BaseProvider):
+class AuthenticationContextClassReferencClaimProvider(IALExpiryMixin, BaseProvider):
     """acr"""
+    select_related = ('userprofile', )
 
     def claim_acr(self):
         try:
@@ -267,6 +322,7 @@ class AuthenticationContextClassReferencClaimProvider(BaseProvider):
 
 
 class AuthenticatorAssuranceLevelClaimProvider(BaseProvider):
+    select_related = ('userprofile', )
 
     def claim_aal(self):
         try:
@@ -275,7 +331,8 @@ class AuthenticatorAssuranceLevelClaimProvider(BaseProvider):
             return None
 
 
-class VectorsOfTrustClaimProvider(BaseProvider):
+class VectorsOfTrustClaimProvider(IALExpiryMixin, BaseProvider):
+    select_related = ('userprofile', )
 
     def claim_vot(self):
         try:
@@ -285,6 +342,8 @@ class VectorsOfTrustClaimProvider(BaseProvider):
 
 
 class PhoneNumberClaimProvider(BaseProvider):
+    select_related = ('userprofile', )
+    scope = 'phone'
 
     def claim_phone_number(self):
         try:
@@ -301,6 +360,8 @@ class PhoneNumberClaimProvider(BaseProvider):
 
 # Deprecated - Use AgentToOrganizationClaimProvider instead
 class OrganizationAgentClaimProvider(BaseProvider):
+    select_related = ('userprofile', )
+    scope = 'organization'
 
     def claim_organization_agent(self):
         try:
@@ -311,6 +372,8 @@ class OrganizationAgentClaimProvider(BaseProvider):
 
 # Deprecated - Use MemberToOrganizationClaimProvider
 class MembershipClaimProvider(BaseProvider):
+    select_related = ('userprofile', )
+    scope = 'organization'
 
     def claim_memberships(self):
         try:
@@ -3,6 +3,7 @@ from django.conf import settings
 from django.urls import reverse
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import get_template
+from apps.notifications.outbox import queue_email
 
 # Copyright Videntity Systems Inc.
 __author__ = "Alan Viars"
@@ -40,7 +41,7 @@ def send_member_verify_request_email(to_user, about_user_profile, organization):
     msg = EmailMultiAlternatives(subject=subject, body=text_content,
                                  to=to, from_email=from_email)
     msg.attach_alternative(html_content, 'text/html')
-    msg.send()
+    queue_email(msg)
 
 
 def send_password_reset_url_via_email(user, reset_key):
@@ -77,11 +78,15 @@ def send_password_reset_url_via_email(user, reset_key):
     """ % (link, settings.ORGANIZATION_NAME)
     msg = EmailMultiAlternatives(subject, text_content, from_email, [to, ])
     msg.attach_alternative(html_content, 'text/html')
-    msg.send()
+    queue_email(msg)
 
 
 def send_activation_key_via_email(user, signup_key):
     """Do not call this directly.  Instead use create_signup_key in utils."""
+    queue_email(activation_key_email(user, signup_key))
+
+
+def activation_key_email(user, signup_key):
     plaintext = get_template('verify-your-email-email.txt')
     htmly = get_template('verify-your-email-email.html')
 
@@ -104,7 +109,7 @@ def send_activation_key_via_email(user, signup_key):
     msg = EmailMultiAlternatives(subject=subject, body=text_content,
                                  to=to, from_email=from_email)
     msg.attach_alternative(html_content, 'text/html')
-    msg.send()
+    return msg
 
 
 def send_new_org_account_approval_email(to_user, about_user, organization):
@@ -131,7 +136,7 @@ def send_new_org_account_approval_email(to_user, about_user, organization):
     msg = EmailMultiAlternatives(subject=subject, body=text_content,
                                  to=to, from_email=from_email)
     msg.attach_alternative(html_content, 'text/html')
-    msg.send()
+    queue_email(msg)
 
 
 def send_org_account_approved_email(to_user, organization):
@@ -156,4 +161,4 @@ def send_org_account_approved_email(to_user, organization):
     msg = EmailMultiAlternatives(subject=subject, body=text_content,
                                  to=to, from_email=from_email)
     msg.attach_alternative(html_content, 'text/html')
-    msg.send()
+    queue_email(msg)
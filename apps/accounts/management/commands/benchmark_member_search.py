@@ -0,0 +1,97 @@
+import random
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from ...member_search import search_members
+from ...models import Organization, UserProfile
+
+User = get_user_model()
+
+FIRST_NAMES = ["JAMES", "MARY", "ROBERT", "PATRICIA", "JOHN", "JENNIFER", "MICHAEL", "LINDA",
+               "DAVID", "ELIZABETH", "WILLIAM", "BARBARA", "RICHARD", "SUSAN", "JOSEPH", "JESSICA"]
+LAST_NAMES = ["SMITH", "JOHNSON", "WILLIAMS", "BROWN", "JONES", "GARCIA", "MILLER", "DAVIS",
+              "RODRIGUEZ", "MARTINEZ", "HERNANDEZ", "LOPEZ", "GONZALEZ", "WILSON", "ANDERSON",
+              "THOMAS", "TAYLOR", "MOORE", "JACKSON", "MARTIN", "LEE", "PEREZ", "THOMPSON", "WHITE"]
+
+
+def scan_search(last_name, organization):
+    # Mimics the previous search: an exact match over every profile, then
+    # the organization's members loaded and each result checked in Python.
+    search_results = UserProfile.objects.filter(user__last_name=last_name)
+    all_members = organization.members.all()
+    return [r for r in search_results if r.user in all_members]
+
+
+def run(count, search):
+    start = time.perf_counter()
+    for i in range(count):
+        search()
+    return (time.perf_counter() - start) * 1000 / count
+
+
+class Command(BaseCommand):
+    help = ('Measure an organization-scoped member search against a large profile '
+            'table, scanning and filtering in Python and with the indexed search. '
+            'The profiles are rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', type=int, default=1000000)
+        parser.add_argument('--members', type=int, default=10000,
+                            help='Profiles that are members of the searched organization.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--count', type=int, default=5)
+        parser.add_argument('--pages', type=int, default=20,
+                            help='Pages followed to time a deep page.')
+        parser.add_argument('--skip-scan', action='store_true',
+                            help='Time the indexed search only.')
+
+    def create_profiles(self, count, batch_size):
+        rng = random.Random(0)
+        for start in range(0, count, batch_size):
+            users = [User(username="benchmark-member-%d" % (i), email="member%d@example.com" % (i),
+                          first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES))
+                     for i in range(start, min(start + batch_size, count))]
+            User.objects.bulk_create(users)
+            # bulk_create does not set the primary keys on every database.
+            users = User.objects.in_bulk([u.username for u in users], field_name='username')
+            profiles = [UserProfile(user=user, mobile_phone_number="+1518555%04d" % (rng.randrange(10000)))
+                        for user in users.values()]
+            for profile in profiles:
+                profile.set_search_fields()
+            UserProfile.objects.bulk_create(profiles)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            started = time.perf_counter()
+            self.create_profiles(options['profiles'], options['batch_size'])
+            organization = Organization.objects.create(name="Member search benchmark")
+            member_ids = User.objects.filter(username__startswith="benchmark-member-").order_by(
+                'pk').values_list('pk', flat=True)[:options['members']]
+            Members = organization.members.through
+            Members.objects.bulk_create([Members(organization=organization, user_id=user_id)
+                                         for user_id in member_ids], batch_size=options['batch_size'])
+            self.stdout.write("Created %d profiles, %d members in %.0f s" % (
+                options['profiles'], options['members'], time.perf_counter() - started))
+
+            count = options['count']
+            if not options['skip_scan']:
+                ms = run(count, lambda: scan_search("SMITH", organization))
+                self.stdout.write("%-22s %9.2f ms/search" % ("Scan, exact name", ms))
+            ms = run(count, lambda: list(search_members({'last_name': "smi"}, organization=organization)))
+            self.stdout.write("%-22s %9.2f ms/search" % ("Indexed, first page", ms))
+
+            pages = []
+
+            def follow_pages():
+                page = search_members({'last_name': "smi"}, organization=organization)
+                pages[:] = [page]
+                while page.has_next and len(pages) < options['pages']:
+                    page = search_members({'last_name': "smi"}, organization=organization,
+                                          cursor=page.next_cursor)
+                    pages.append(page)
+            ms = run(count, follow_pages) / len(pages)
+            self.stdout.write("%-22s %9.2f ms/page over %d pages" % ("Indexed, keyset pages", ms, len(pages)))
+            ms = run(count, lambda: list(search_members({'mobile_phone_number': "518-555-12"})))
+            self.stdout.write("%-22s %9.2f ms/search" % ("Indexed, phone prefix", ms))
+            transaction.set_rollback(True)
@@ -11,6 +11,9 @@ groups = ["Member",
           "IdentityAssuranceTrustedReferee",
           "OrganizationAdministrator",
           "OrganizationAgentReport",
+          "MembersByOrganizationReport",
+          "MFAEnrollmentReport",
+          "UpstreamIdPLinksReport",
           "DynamicClientRegistrationProtocol",
           "PersonToPersonAPI"
           ]
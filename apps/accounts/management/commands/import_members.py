@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from ...member_import import import_members, open_text, send_import_notifications
+from ...models import MemberImport, Organization
+
+
+class Command(BaseCommand):
+    help = ('Import the members and agents of an organization from a CSV or '
+            'JSON lines file, in batches.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('organization', help='The slug of the organization.')
+        parser.add_argument('path', help='The CSV (with a header row) or JSON lines file.')
+        parser.add_argument('--format', choices=('csv', 'jsonl'),
+                            help='Defaults to jsonl for .jsonl files, else csv.')
+        parser.add_argument('--batch-size', type=int, default=settings.MEMBER_IMPORT_BATCH_SIZE,
+                            help='Rows written per transaction.')
+        parser.add_argument('--resume', type=int, metavar='IMPORT_ID',
+                            help='Continue an interrupted import from its checkpoint.')
+        parser.add_argument('--notify', action='store_true',
+                            help='Then queue the activation emails and welcome texts.')
+
+    def handle(self, *args, **options):
+        try:
+            organization = Organization.objects.get(slug=options['organization'])
+        except Organization.DoesNotExist:
+            raise CommandError("No organization %s." % (options['organization']))
+        member_import = None
+        if options['resume']:
+            member_import = MemberImport.objects.get(pk=options['resume'], organization=organization)
+        path = options['path']
+        format = options['format'] or ('jsonl' if path.endswith('.jsonl') else 'csv')
+        with open(path, 'rb') as f:
+            member_import = import_members(organization, open_text(f), format=format, source=path,
+                                           batch_size=options['batch_size'],
+                                           member_import=member_import)
+        for error in member_import.errors.all():
+            self.stderr.write("Row %d: %s" % (error.row, error.errors))
+        self.stdout.write("Import %d: %d rows, %d created, %d errors, %s rows/s." % (
+            member_import.pk, member_import.rows_read, member_import.created_count,
+            member_import.error_count, member_import.rows_per_second))
+        if options['notify']:
+            count = send_import_notifications(member_import)
+            self.stdout.write("Queued notifications for %d members." % (count))
@@ -0,0 +1,291 @@
+"""
+Bulk import of an organization's members and agents from CSV or JSON lines.
+
+Rows are validated and written in batches: each batch costs a fixed number
+of queries (bulk_create of the users, profiles, addresses, identifiers and
+memberships) and is committed with the import's checkpoint, so an
+interrupted import resumes after the last committed batch. Imported users
+are inactive with an unusable password; their activation emails and welcome
+texts are queued in the notification outbox by send_import_notifications().
+"""
+import csv
+import io
+import itertools
+import json
+import logging
+import re
+import time
+from datetime import timedelta
+from django import forms
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+from phonenumber_field.formfields import PhoneNumberField
+from apps.notifications.outbox import email_notification, queue_many, text_notification
+from .emails import activation_key_email
+from .models import (
+    ActivationKey,
+    Address,
+    ImportedMember,
+    IndividualIdentifier,
+    MemberImport,
+    MemberImportError,
+    SEX_CHOICES,
+    UserProfile,
+)
+from .subject_generator import member_subjects
+
+logger = logging.getLogger('verifymyidentity_.%s' % __name__)
+
+User = get_user_model()
+
+ROLE_CHOICES = (('member', 'Member'),
+                ('agent', 'Agent'))
+ADDRESS_FIELDS = ('street_1', 'street_2', 'city', 'state', 'zipcode', 'country')
+USERNAME_RE = re.compile(r'^[\w.@+-]+\Z')
+
+
+class MemberImportRowForm(forms.Form):
+    """One imported row. Uniqueness is checked per batch by the importer."""
+    username = forms.CharField(max_length=30)
+    first_name = forms.CharField(max_length=100)
+    last_name = forms.CharField(max_length=100)
+    middle_name = forms.CharField(max_length=100, required=False)
+    nickname = forms.CharField(max_length=100, required=False)
+    email = forms.EmailField(max_length=150, required=False)
+    mobile_phone_number = PhoneNumberField(required=False)
+    birth_date = forms.DateField(required=False)
+    sex = forms.ChoiceField(choices=SEX_CHOICES, required=False)
+    role = forms.ChoiceField(choices=ROLE_CHOICES, required=False)
+    street_1 = forms.CharField(max_length=250, required=False)
+    street_2 = forms.CharField(max_length=250, required=False)
+    city = forms.CharField(max_length=250, required=False)
+    state = forms.CharField(max_length=2, required=False)
+    zipcode = forms.CharField(max_length=10, required=False)
+    country = forms.CharField(max_length=2, required=False)
+    identifier_type = forms.ChoiceField(choices=(('', ''), ) + tuple(settings.INDIVIDUAL_ID_TYPE_CHOICES),
+                                        required=False)
+    identifier_value = forms.CharField(max_length=250, required=False)
+    identifier_issuer = forms.CharField(max_length=255, required=False)
+
+    def clean_username(self):
+        username = self.cleaned_data['username'].strip().lower()
+        if not USERNAME_RE.match(username):
+            raise forms.ValidationError(_('Enter a valid username. This value may contain only English letters, '
+                                          'numbers, and @/./+/-/_ characters.'))
+        return username
+
+    def clean_first_name(self):
+        return self.cleaned_data["first_name"].strip().upper()
+
+    def clean_last_name(self):
+        return self.cleaned_data["last_name"].strip().upper()
+
+    def clean_middle_name(self):
+        return self.cleaned_data.get("middle_name", "").strip().upper()
+
+    def clean_nickname(self):
+        return self.cleaned_data.get("nickname", "").strip().upper()
+
+    def clean_email(self):
+        return self.cleaned_data.get('email', "").strip().lower()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('identifier_value') and not cleaned_data.get('identifier_type'):
+            self.add_error('identifier_type', _('An identifier needs a type.'))
+        return cleaned_data
+
+
+def read_rows(stream, format="csv"):
+    """The rows of a CSV (with a header) or JSON lines text stream, as dicts."""
+    if format == "jsonl":
+        return (json.loads(line) for line in stream if line.strip())
+    return csv.DictReader(stream)
+
+
+def open_text(fileobj):
+    """A text stream over an uploaded or opened binary file."""
+    if isinstance(fileobj, io.TextIOBase):
+        return fileobj
+    return io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class MemberImporter(object):
+    """Imports rows into ``member_import``, ``batch_size`` rows per transaction."""
+
+    def __init__(self, member_import, batch_size=None):
+        self.member_import = member_import
+        self.organization = member_import.organization
+        self.batch_size = batch_size or settings.MEMBER_IMPORT_BATCH_SIZE
+        self.agent_group_ids = list(
+            self.organization.default_groups_for_agents.values_list('pk', flat=True))
+
+    def run(self, rows):
+        """Import ``rows``, skipping those committed by an earlier run."""
+        job = self.member_import
+        rows = itertools.islice(rows, job.rows_read, None)
+        try:
+            for batch in chunked(rows, self.batch_size):
+                self.import_batch(batch, time.monotonic())
+        except Exception:
+            MemberImport.objects.filter(pk=job.pk).update(status='FAILED')
+            job.status = 'FAILED'
+            raise
+        MemberImport.objects.filter(pk=job.pk).update(status='DONE')
+        job.status = 'DONE'
+        logger.info("%s: %d rows, %d created, %d errors, %s rows/s.", job, job.rows_read,
+                    job.created_count, job.error_count, job.rows_per_second)
+        return job
+
+    def validate(self, batch):
+        """The cleaned rows by row number, and the errors by row number."""
+        first_row = self.member_import.rows_read + 1
+        valid = {}
+        errors = {}
+        for number, row in enumerate(batch, first_row):
+            form = MemberImportRowForm(row)
+            if form.is_valid():
+                valid[number] = form.cleaned_data
+            else:
+                errors[number] = form.errors.get_json_data()
+        self.check_unique(valid, errors, 'username', 'username')
+        self.check_unique(valid, errors, 'email', 'email')
+        return valid, errors
+
+    def check_unique(self, valid, errors, field, lookup):
+        """Reject values used by an existing user or an earlier row, in one query."""
+        values = {data[field] for data in valid.values() if data[field]}
+        taken = set(User.objects.annotate(value=Lower(lookup)).filter(
+            value__in=values).values_list('value', flat=True)) if values else set()
+        for number in sorted(valid):
+            value = valid[number][field]
+            if not value:
+                continue
+            if value in taken:
+                del valid[number]
+                errors[number] = {field: [{'message': 'This %s is already taken.' % (field),
+                                           'code': 'unique'}]}
+            else:
+                taken.add(value)
+
+    @transaction.atomic
+    def import_batch(self, batch, started):
+        job = self.member_import
+        valid, errors = self.validate(batch)
+        rows = [valid[number] for number in sorted(valid)]
+        password = make_password(None)
+        User.objects.bulk_create([
+            User(username=data['username'], first_name=data['first_name'],
+                 last_name=data['last_name'], email=data['email'],
+                 password=password, is_active=False)
+            for data in rows])
+        # bulk_create does not set the primary keys on every database.
+        users = User.objects.in_bulk([data['username'] for data in rows], field_name='username')
+        subjects = member_subjects.allocate_many(len(rows))
+        profiles = [
+            UserProfile(user=users[data['username']], subject=subject,
+                        middle_name=data['middle_name'], nickname=data['nickname'],
+                        mobile_phone_number=data['mobile_phone_number'] or "",
+                        birth_date=data['birth_date'], sex=data['sex'],
+                        agree_tos=settings.CURRENT_TOS_VERSION,
+                        agree_privacy_policy=settings.CURRENT_PP_VERSION)
+            for data, subject in zip(rows, subjects)]
+        # bulk_create skips UserProfile.save, which sets them.
+        for profile in profiles:
+            profile.set_search_fields()
+        UserProfile.objects.bulk_create(profiles)
+        Address.objects.bulk_create([
+            Address(user=users[data['username']], **{f: data[f] for f in ADDRESS_FIELDS})
+            for data in rows if any(data[f] for f in ADDRESS_FIELDS)])
+        IndividualIdentifier.objects.bulk_create([
+            IndividualIdentifier(user=users[data['username']], type=data['identifier_type'],
+                                 name=data['identifier_type'], value=data['identifier_value'],
+                                 issuer=data['identifier_issuer'])
+            for data in rows if data['identifier_value']])
+        self.add_memberships(rows, users)
+        # Imported here, the reports app reads this module.
+        from apps.reports.counts import users_changed
+        users_changed([user.pk for user in users.values()])
+        ImportedMember.objects.bulk_create([
+            ImportedMember(member_import=job, user=users[data['username']]) for data in rows])
+        MemberImportError.objects.bulk_create([
+            MemberImportError(member_import=job, row=number, errors=json.dumps(row_errors))
+            for number, row_errors in sorted(errors.items())])
+
+        job.rows_read += len(batch)
+        job.created_count += len(rows)
+        job.error_count += len(errors)
+        job.seconds += time.monotonic() - started
+        job.save(update_fields=['rows_read', 'created_count', 'error_count', 'seconds', 'updated_at'])
+
+    def add_memberships(self, rows, users):
+        organization = self.organization
+        members = [users[data['username']] for data in rows if data['role'] != 'agent']
+        agents = [users[data['username']] for data in rows if data['role'] == 'agent']
+        Members = organization.members.through
+        Members.objects.bulk_create([
+            Members(organization=organization, user=user) for user in members])
+        Agents = organization.users.through
+        Agents.objects.bulk_create([
+            Agents(organization=organization, user=user) for user in agents])
+        Groups = User.groups.through
+        Groups.objects.bulk_create([
+            Groups(user=user, group_id=group_id)
+            for user in agents for group_id in self.agent_group_ids])
+
+
+def import_members(organization, stream, format="csv", source="", created_by=None,
+                   batch_size=None, member_import=None):
+    """Import the rows of ``stream``, or resume ``member_import``."""
+    if member_import is None:
+        member_import = MemberImport.objects.create(
+            organization=organization, source=source, created_by=created_by)
+    elif member_import.status != 'RUNNING':
+        MemberImport.objects.filter(pk=member_import.pk).update(status='RUNNING')
+        member_import.status = 'RUNNING'
+    return MemberImporter(member_import, batch_size).run(read_rows(stream, format))
+
+
+def send_import_notifications(member_import, batch_size=None):
+    """
+    Queue the activation emails and welcome texts of the imported members
+    not notified yet. Returns the number of members notified.
+    """
+    batch_size = batch_size or settings.MEMBER_IMPORT_BATCH_SIZE
+    pending = ImportedMember.objects.filter(member_import=member_import, notified=False)
+    count = 0
+    while True:
+        with transaction.atomic():
+            batch = list(pending.select_related('user__userprofile')[:batch_size])
+            if not batch:
+                return count
+            expires = timezone.now() + timedelta(days=settings.SIGNUP_TIMEOUT_DAYS)
+            # bulk_create skips ActivationKey.save, which queues the email itself.
+            keys = ActivationKey.objects.bulk_create([
+                ActivationKey(user=m.user, expires=expires) for m in batch if m.user.email])
+            notifications = [email_notification(activation_key_email(key.user, key.key))
+                             for key in keys]
+            for m in batch:
+                profile = m.user.userprofile
+                if profile.mobile_phone_number:
+                    notifications.append(text_notification("""Hello %s. Welcome to %s.
+            As a reminder, your account number is %s and your username is %s.""" % (
+                        m.user.first_name.title(), settings.TOP_LEFT_TITLE,
+                        profile.subject, m.user.username), profile.mobile_phone_number))
+            queue_many(notifications)
+            ImportedMember.objects.filter(pk__in=[m.pk for m in batch]).update(notified=True)
+        count += len(batch)
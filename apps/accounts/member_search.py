@@ -0,0 +1,110 @@
+"""
+Member search over the indexed search_* columns of UserProfile.
+
+Names, email and phone number are matched by prefix on their normalized
+copies (see search_keys.py), so the database reads an index range rather
+than every profile. An organization's search joins its membership in the
+same query. Results come in pages ordered by last name, first name and id,
+and the next page starts after the last row of the previous one (keyset
+pagination), so every page costs the same however deep it is.
+"""
+import base64
+import json
+from django.conf import settings
+from django.db.models import Q
+from .models import UserProfile
+from .search_keys import email_key, name_key, phone_key
+
+# Criteria matched by prefix: the column and its normalization.
+PREFIX_CRITERIA = {
+    'first_name': ('search_first_name', name_key),
+    'last_name': ('search_last_name', name_key),
+    'email': ('search_email', email_key),
+    'mobile_phone_number': ('search_phone', phone_key),
+}
+# Criteria matched exactly.
+EXACT_CRITERIA = {
+    'username': ('user__username', lambda value: value.strip().lower()),
+    'nickname': ('nickname', lambda value: value.strip().upper()),
+    'subject': ('subject', lambda value: value.strip()),
+    'sex': ('sex', lambda value: value),
+    'birth_date': ('birth_date', lambda value: value),
+}
+ORDER = ('search_last_name', 'search_first_name', 'pk')
+
+
+class SearchPage(object):
+
+    def __init__(self, results, next_cursor=None):
+        self.results = results
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+
+def encode_cursor(profile):
+    key = [profile.search_last_name, profile.search_first_name, profile.pk]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """The (last name, first name, id) a cursor starts after. Raises ValueError."""
+    try:
+        last_name, first_name, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor.")
+    if not (isinstance(last_name, str) and isinstance(first_name, str) and isinstance(pk, int)):
+        raise ValueError("Invalid cursor.")
+    return last_name, first_name, pk
+
+
+def after(cursor):
+    last_name, first_name, pk = decode_cursor(cursor)
+    return (Q(search_last_name__gt=last_name)
+            | Q(search_last_name=last_name, search_first_name__gt=first_name)
+            | Q(search_last_name=last_name, search_first_name=first_name, pk__gt=pk))
+
+
+def get_queryset(criteria, organization=None):
+    query = {}
+    for name, (column, normalize) in PREFIX_CRITERIA.items():
+        value = normalize(criteria.get(name) or '')
+        if value:
+            # The range lets any database seek the index, LIKE alone may not.
+            query['%s__gte' % (column)] = value
+            query['%s__lt' % (column)] = value[:-1] + chr(ord(value[-1]) + 1)
+            query['%s__startswith' % (column)] = value
+    for name, (column, normalize) in EXACT_CRITERIA.items():
+        value = criteria.get(name)
+        if value:
+            query[column] = normalize(value)
+    profiles = UserProfile.objects.filter(**query)
+    if organization is not None:
+        profiles = profiles.filter(user__org_members=organization)
+    return profiles
+
+
+def search_members(criteria, organization=None, cursor=None, page_size=None):
+    """
+    The page of profiles matching ``criteria``, a dict as cleaned by the
+    UserSearchForm, that comes after ``cursor``. Only members of
+    ``organization`` are found when it is given. Raises ValueError for an
+    invalid cursor.
+    """
+    page_size = page_size or settings.MEMBER_SEARCH_PAGE_SIZE
+    profiles = get_queryset(criteria, organization).select_related('user').order_by(*ORDER)
+    if cursor:
+        profiles = profiles.filter(after(cursor))
+    results = list(profiles[:page_size + 1])
+    if len(results) <= page_size:
+        return SearchPage(results)
+    results = results[:page_size]
+    return SearchPage(results, encode_cursor(results[-1]))
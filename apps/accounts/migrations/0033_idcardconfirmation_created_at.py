@@ -0,0 +1,18 @@
+# Generated by Django 2.2.20 on 2026-10-18 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0032_auto_20210505_1557'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idcardconfirmation',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, null=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.20 on 2026-10-18 20:12
+
+from datetime import date
+from django.db import migrations, models
+
+
+def set_ial_level(apps, schema_editor):
+    Documentation = apps.get_model('ial', 'IdentityAssuranceLevelDocumentation')
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    today = date.today()
+    expiries = {}
+    for user_id, expires_at in Documentation.objects.exclude(evidence='').values_list(
+            'subject_user_id', 'expires_at'):
+        expiries.setdefault(user_id, []).append(expires_at)
+    for user_id, user_expiries in expiries.items():
+        live = [e for e in user_expiries if e is None or e >= today]
+        if live:
+            UserProfile.objects.filter(user_id=user_id).update(
+                ial_level=2, ial_expires_at=None if None in live else max(live))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0033_idcardconfirmation_created_at'),
+        ('ial', '0027_auto_20210108_1652'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='ial_expires_at',
+            field=models.DateField(blank=True, db_index=True, editable=False, help_text='When the evidence supporting ial_level expires.', null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='ial_level',
+            field=models.PositiveSmallIntegerField(db_index=True, default=1, editable=False),
+        ),
+        migrations.RunPython(set_ial_level, migrations.RunPython.noop),
+    ]
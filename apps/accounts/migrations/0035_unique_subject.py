@@ -0,0 +1,48 @@
+# Generated by Django 2.2.20 on 2026-10-18 20:17
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from apps.accounts.subject_generator import generate_subject_id
+
+# The first digit of the subjects of each model, as in subject_generator.
+SUBJECT_STARTS_WITH = {'UserProfile': "1", 'Organization': "2"}
+
+
+def renumber_duplicate_subjects(apps, schema_editor):
+    """
+    Give a new subject to every row sharing its subject with an older row,
+    so the unique constraints can be added. Organization.save used to check
+    the UserProfile subjects for collisions, so organizations may share one.
+    """
+    for model_name, starts_with in SUBJECT_STARTS_WITH.items():
+        model = apps.get_model('accounts', model_name)
+        duplicated = model.objects.exclude(subject='').order_by().values('subject').annotate(
+            rows=Count('pk')).filter(rows__gt=1).values_list('subject', flat=True)
+        for subject in list(duplicated):
+            pks = model.objects.filter(subject=subject).order_by('pk').values_list('pk', flat=True)
+            for pk in list(pks)[1:]:
+                new_subject = subject
+                while model.objects.filter(subject=new_subject).exists():
+                    new_subject = generate_subject_id(prefix=settings.SUBJECT_LUHN_PREFIX,
+                                                      starts_with=starts_with)
+                model.objects.filter(pk=pk).update(subject=new_subject)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0034_userprofile_ial_level'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_duplicate_subjects, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='organization',
+            constraint=models.UniqueConstraint(condition=models.Q(_negated=True, subject=''), fields=('subject',), name='accounts_organization_unique_subject'),
+        ),
+        migrations.AddConstraint(
+            model_name='userprofile',
+            constraint=models.UniqueConstraint(condition=models.Q(_negated=True, subject=''), fields=('subject',), name='accounts_userprofile_unique_subject'),
+        ),
+    ]
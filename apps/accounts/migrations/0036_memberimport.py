@@ -0,0 +1,53 @@
+# Generated by Django 2.2.20 on 2026-10-18 20:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0035_unique_subject'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberImport',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(blank=True, default='', max_length=255)),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='RUNNING', max_length=16)),
+                ('rows_read', models.PositiveIntegerField(default=0)),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('error_count', models.PositiveIntegerField(default=0)),
+                ('seconds', models.FloatField(default=0, help_text='Time spent importing.')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.Organization')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MemberImportError',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row', models.PositiveIntegerField()),
+                ('errors', models.TextField(help_text='JSON object of the errors by field.')),
+                ('member_import', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='errors', to='accounts.MemberImport')),
+            ],
+            options={
+                'ordering': ('row',),
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportedMember',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notified', models.BooleanField(db_index=True, default=False)),
+                ('member_import', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='accounts.MemberImport')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
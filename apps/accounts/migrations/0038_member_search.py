@@ -0,0 +1,65 @@
+# Generated by Django 2.2.20 on 2026-10-18 21:02
+
+from django.db import migrations, models
+from apps.accounts.search_keys import email_key, name_key, phone_key
+
+BATCH_SIZE = 1000
+
+
+def set_search_fields(apps, schema_editor):
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    profiles = UserProfile.objects.select_related('user').only(
+        'mobile_phone_number', 'user__first_name', 'user__last_name', 'user__email').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(profiles.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            return
+        for up in batch:
+            up.search_first_name = name_key(up.user.first_name)
+            up.search_last_name = name_key(up.user.last_name)
+            up.search_email = email_key(up.user.email)
+            up.search_phone = phone_key(up.mobile_phone_number)
+        UserProfile.objects.bulk_update(batch, ['search_first_name', 'search_last_name',
+                                                'search_email', 'search_phone'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0037_usersession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='search_email',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='search_first_name',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=150),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='search_last_name',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=150),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='search_phone',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='birth_date',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(set_search_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['search_last_name', 'search_first_name', 'id'], name='accounts_up_search_order'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 2.2.20 on 2026-10-18 22:10
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.exceptions import ValidationError
+from django.db import migrations
+from django.utils import timezone
+
+BATCH_SIZE = 400
+
+
+def copy_sessions(apps, schema_editor):
+    """
+    Copy the unexpired django_session rows into UserSession, which
+    SESSION_ENGINE reads from now on, so nobody is logged out by the
+    upgrade. The user is taken from each session's decoded data.
+    """
+    Session = apps.get_model('sessions', 'Session')
+    UserSession = apps.get_model('accounts', 'UserSession')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    to_python = User._meta.pk.to_python
+    # The data is signed with a salt naming the class, as SessionStore.
+    decoder = SessionStore()
+    sessions = Session.objects.filter(expire_date__gt=timezone.now()).order_by('session_key')
+    last_key = ''
+    while True:
+        batch = list(sessions.filter(session_key__gt=last_key)[:BATCH_SIZE])
+        if not batch:
+            return
+        user_ids = {}
+        for session in batch:
+            try:
+                user_ids[session.session_key] = to_python(
+                    decoder.decode(session.session_data).get(SESSION_KEY))
+            except ValidationError:
+                user_ids[session.session_key] = None
+        # Sessions of deleted users are left out, they can't log anyone in.
+        existing = set(User.objects.filter(
+            pk__in={pk for pk in user_ids.values() if pk is not None}).values_list('pk', flat=True))
+        UserSession.objects.bulk_create([
+            UserSession(session_key=session.session_key,
+                        session_data=session.session_data,
+                        expire_date=session.expire_date,
+                        user_id=user_ids[session.session_key])
+            for session in batch
+            if user_ids[session.session_key] is None or user_ids[session.session_key] in existing
+        ], ignore_conflicts=True)
+        last_key = batch[-1].session_key
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('sessions', '0001_initial'),
+        ('accounts', '0038_member_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_sessions, migrations.RunPython.noop),
+    ]
@@ -3,27 +3,27 @@ import random
 import uuid
 from django.template.defaultfilters import slugify
 from django.urls import reverse
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from django.utils import timezone
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_save
 from django.conf import settings
 from django.contrib.auth.models import Group
 from django.contrib.auth import get_user_model
+from django.contrib.sessions.base_session import AbstractBaseSession
 from django.utils.translation import ugettext_lazy as _
-import boto3
 from phonenumber_field.modelfields import PhoneNumberField
 from .emails import (send_password_reset_url_via_email,
                      send_activation_key_via_email,
                      send_new_org_account_approval_email)
-from .subject_generator import generate_subject_id
-from collections import OrderedDict
+from .search_keys import email_key, name_key, phone_key
+from .subject_generator import member_subjects, organization_subjects, save_with_subject
+from .texts import send_text
+from collections import OrderedDict, defaultdict
 from ..ial.models import IdentityAssuranceLevelDocumentation
-from twilio.rest import Client
 import logging
 import json
-from io import BytesIO
-from django.core.files import File
-import qrcode
+from libs import qrcodes
 
 logger = logging.getLogger('verifymyidentity_.%s' % __name__)
 
@@ -59,6 +59,7 @@ class IDCardConfirmation(models.Model):
     email = models.CharField(max_length=254, blank=True, default='')
     email_verified = models.BooleanField(blank=True, default=False)
     details = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
 
     def __str__(self):
         return "%s" % (self.confirmation_uuid)
@@ -305,7 +306,7 @@ class PersonToPersonRelationship(models.Model):
 
     def structured_response(self):
         od = OrderedDict()
-        subject_up = UserProfile.objects.get(user=self.subject)
+        subject_up = self.subject.userprofile
         od['sub'] = subject_up.sub
         od['name'] = "%s %s" % (self.subject.first_name.title(), self.subject.last_name.title())
         od['given_name'] = self.subject.first_name.title()
@@ -413,6 +414,10 @@ class Organization(models.Model):
 
     class Meta:
         ordering = ('name', )
+        constraints = [
+            models.UniqueConstraint(fields=['subject'], condition=~models.Q(subject=''),
+                                    name='accounts_organization_unique_subject'),
+        ]
 
     @property
     def signup_url(self):
@@ -444,8 +449,7 @@ class Organization(models.Model):
     @property
     def point_of_contact_dict(self):
         od = OrderedDict()
-        self.point_of_contact
-        up = UserProfile.objects.get(user=self.point_of_contact)
+        up = self.point_of_contact.userprofile
         od['first_name'] = self.point_of_contact.first_name
         od['last_name'] = self.point_of_contact.last_name
         od['phone_number'] = up.phone_number
@@ -466,24 +470,16 @@ class Organization(models.Model):
         if not self.slug:
             self.slug = slugify(self.name)
 
-        if not self.subject:
-            self.subject = generate_subject_id(prefix=settings.SUBJECT_LUHN_PREFIX,
-                                               starts_with="2",
-                                               number_str_include=self.number_str_include)
-
-            # Make sure the Subject has not been assigned to someone else.
-            up_exist = Organization.objects.filter(
-                subject=self.subject).exists()
-            if up_exist:
-                while True:
-                    self.subject = generate_subject_id(prefix=settings.SUBJECT_LUHN_PREFIX,
-                                                       starts_with="2",
-                                                       number_str_include=self.number_str_include)
-                    if not UserProfile.objects.filter(subject=self.subject).exists():
-                        break
+        new_subject = not self.subject
+        if new_subject:
+            self.subject = organization_subjects.allocate(self.number_str_include)
 
         if commit:
-            super(Organization, self).save(*args, **kwargs)
+            if new_subject:
+                save_with_subject(self, organization_subjects,
+                                  lambda: super(Organization, self).save(*args, **kwargs))
+            else:
+                super(Organization, self).save(*args, **kwargs)
             # If the POC is not an org agent, then make them one.
 
 
@@ -500,9 +496,9 @@ class OrganizationAffiliationRequest(models.Model):
         return "%s %s seeks affiliation approval for %s" % (
             self.user.first_name, self.user.last_name, self.organization.name)
 
+    @transaction.atomic
     def save(self, commit=True, **kwargs):
         if commit:
-            print("send to", self.organization.point_of_contact.email)
             send_new_org_account_approval_email(
                 to_user=self.organization.point_of_contact,
                 about_user=self.user,
@@ -560,7 +556,7 @@ class UserProfile(models.Model):
     gender_identity_custom_value = models.CharField(max_length=64, default="", blank=True,
                                                     help_text=_('Enter a custom value for gender_identity.'),
                                                     )
-    birth_date = models.DateField(blank=True, null=True)
+    birth_date = models.DateField(blank=True, null=True, db_index=True)
     subject_qrcode = models.ImageField(upload_to='subject_qrcodes', blank=True, null=True)
     public_safety_profile = models.CharField(choices=PSP_CHOICES,
                                              default='PRIVATE', blank=True, max_length=16)
@@ -574,28 +570,140 @@ class UserProfile(models.Model):
                                                         the code of conduct."""))
     verifying_agent_email = models.EmailField(
         blank=True, default="", help_text="Email of agent performing identity verification.")
+    # Derived from the IdentityAssuranceLevelDocumentation of the user by
+    # update_ial() and downgraded by downgrade_expired_ial(). Don't edit.
+    ial_level = models.PositiveSmallIntegerField(default=1, db_index=True, editable=False)
+    ial_expires_at = models.DateField(blank=True, null=True, db_index=True, editable=False,
+                                      help_text=_("When the evidence supporting ial_level expires."))
+    # The searched fields of the user and profile, normalized by
+    # set_search_fields() for indexed prefix matching. See member_search.py.
+    search_first_name = models.CharField(max_length=150, default='', blank=True, db_index=True, editable=False)
+    search_last_name = models.CharField(max_length=150, default='', blank=True, db_index=True, editable=False)
+    search_email = models.CharField(max_length=254, default='', blank=True, db_index=True, editable=False)
+    search_phone = models.CharField(max_length=20, default='', blank=True, db_index=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['subject'], condition=~models.Q(subject=''),
+                                    name='accounts_userprofile_unique_subject'),
+        ]
+        indexes = [
+            # The order of search results, paged by keyset.
+            models.Index(fields=['search_last_name', 'search_first_name', 'id'],
+                         name='accounts_up_search_order'),
+        ]
+
+    @staticmethod
+    def compute_ial(evidence_expiries, today=None):
+        """
+        The (ial_level, ial_expires_at) given the expires_at of each piece of
+        IAL2 evidence of a user. ial_expires_at is None while some evidence
+        never expires.
+        """
+        today = today or date.today()
+        live = [e for e in evidence_expiries if e is None or e >= today]
+        if not live:
+            return 1, None
+        if None in live:
+            return 2, None
+        return 2, max(live)
+
+    @classmethod
+    def update_ial(cls, user_ids, today=None):
+        """Recompute the stored IAL of ``user_ids`` from their documentation."""
+        user_ids = set(user_ids)
+        expiries = {user_id: [] for user_id in user_ids}
+        docs = IdentityAssuranceLevelDocumentation.objects.filter(
+            subject_user_id__in=user_ids).exclude(evidence='')
+        for user_id, expires_at in docs.values_list('subject_user_id', 'expires_at'):
+            expiries[user_id].append(expires_at)
+        # One update per resulting (level, expiry) rather than per user.
+        users_by_ial = defaultdict(list)
+        for user_id, user_expiries in expiries.items():
+            users_by_ial[cls.compute_ial(user_expiries, today)].append(user_id)
+        for (level, expires_at), ial_user_ids in users_by_ial.items():
+            cls.objects.filter(user_id__in=ial_user_ids).update(ial_level=level, ial_expires_at=expires_at)
+        # Imported here, the reports app reads this app's models.
+        from apps.reports.counts import users_changed
+        users_changed(user_ids)
+
+    @classmethod
+    def downgrade_expired_ial(cls, today=None, batch_size=None):
+        """
+        Set every profile whose IAL2 evidence expired before ``today`` back to
+        IAL1, one update of at most ``batch_size`` profiles per transaction.
+        Returns the number of profiles downgraded.
+        """
+        # Imported here, the oidc and reports apps read this app's models.
+        from apps.oidc.signals import invalidate_source_snapshots
+        from apps.reports.counts import users_changed
+        batch_size = batch_size or settings.IAL_DOWNGRADE_BATCH_SIZE
+        expired = cls.objects.filter(ial_level__gt=1, ial_expires_at__lt=today or date.today())
+        count = 0
+        while True:
+            # Downgraded profiles leave ``expired``, so each batch is its head.
+            batch = list(expired.order_by('pk').values_list('pk', 'user_id')[:batch_size])
+            if not batch:
+                break
+            pks = [pk for pk, user_id in batch]
+            with transaction.atomic():
+                count += cls.objects.filter(pk__in=pks).update(ial_level=1, ial_expires_at=None)
+                invalidate_source_snapshots(cls, pks)
+                users_changed([user_id for pk, user_id in batch])
+            if len(batch) < batch_size:
+                break
+        return count
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._qr_source = instance.qr_source
+        return instance
+
+    @property
+    def qr_source(self):
+        """The fields the PSI QR code is rendered from, as loaded or last saved."""
+        return (self.__dict__.get('subject'), self.__dict__.get('public_safety_profile'))
+
     def save(self, commit=True, **kwargs):
-        if not self.subject:
-            self.subject = generate_subject_id(prefix=settings.SUBJECT_LUHN_PREFIX,
-                                               number_str_include=self.number_str_include)
-
-            # Make sure the Subject has not been assigned to someone else.
-            up_exist = UserProfile.objects.filter(
-                subject=self.subject).exists()
-            if up_exist:
-                while True:
-                    self.subject = generate_subject_id(prefix=settings.SUBJECT_LUHN_PREFIX,
-                                                       number_str_include=self.number_str_include)
-                    if not UserProfile.objects.filter(subject=self.subject).exists():
-                        break
-        if self.public_safety_profile is True and not self.subject_qrcode:
-            self.make_subject_qrcode()
+        if self._state.adding and self.user_id:
+            # Evidence may have been recorded before the profile existed.
+            self.ial_level, self.ial_expires_at = self.compute_ial(
+                IdentityAssuranceLevelDocumentation.objects.filter(
+                    subject_user_id=self.user_id).exclude(evidence='').values_list('expires_at', flat=True))
+        new_subject = not self.subject
+        if new_subject:
+            self.subject = member_subjects.allocate(self.number_str_include)
+        self.set_search_fields()
 
         if commit:
-            super(UserProfile, self).save(**kwargs)
+            loaded = getattr(self, '_qr_source', None)
+            # Only the QR code of a public profile is rendered behind a save.
+            public = "PUBLIC" in (self.public_safety_profile, loaded and loaded[1])
+            if public and not kwargs.get('force_insert'):
+                kwargs['update_fields'] = qrcodes.save_fields(
+                    self, ('subject_qrcode', ), kwargs.get('update_fields'))
+            if new_subject:
+                save_with_subject(self, member_subjects,
+                                  lambda: super(UserProfile, self).save(**kwargs))
+            else:
+                super(UserProfile, self).save(**kwargs)
+            self._qr_source = self.qr_source
+            if self.public_safety_profile == "PUBLIC" and self._qr_source != loaded:
+                self.make_subject_qrcode()
+
+    @staticmethod
+    def user_search_fields(user):
+        return {'search_first_name': name_key(user.first_name),
+                'search_last_name': name_key(user.last_name),
+                'search_email': email_key(user.email)}
+
+    def set_search_fields(self):
+        for field, value in self.user_search_fields(self.user).items():
+            setattr(self, field, value)
+        self.search_phone = phone_key(self.mobile_phone_number)
 
     def __str__(self):
         display = '%s %s (%s)' % (self.user.first_name.lower().title(),
@@ -603,20 +711,21 @@ class UserProfile(models.Model):
                                   self.user.username)
         return display
 
+    @property
+    def psi_qr_segments(self):
+        """The content of the Patient Safety Identifier QR code: the PSI page's URL."""
+        return ["%s%s" % (settings.HOSTNAME_URL, reverse('shc_psi', args=[str(self.sub)]))]
+
     def make_subject_qrcode(self):
-        url = "%s%s" % (settings.HOSTNAME_URL, reverse('shc_psi', args=[str(self.sub)]))
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=6,
-            border=0)
-        qr.add_data(url)
-        qr.make(fit=True)
-        img = qr.make_image()
-        buffer = BytesIO()
-        img.save(buffer)
-        filename = 'psi-%s.png' % (self.sub)
-        self.subject_qrcode.save(filename, File(buffer), save=False)
+        """Render the PSI QR code in the background, unless it is unchanged."""
+        qrcodes.render_later(self, 'subject_qrcode', self.psi_qr_segments)
+
+    @property
+    def subject_qrcode_url(self):
+        # Served on demand until the stored image is ready.
+        if self.subject_qrcode:
+            return self.subject_qrcode.url
+        return reverse('psi_qrcode', args=[str(self.sub)])
 
     @property
     def given_name(self):
@@ -677,61 +786,50 @@ class UserProfile(models.Model):
 
     @property
     def ial(self):
-        level = 1
-        ialdocs = IdentityAssuranceLevelDocumentation.objects.filter(
-            subject_user=self.user)
-        for doc in ialdocs:
-            if int(doc.level) == 2:
-                if level == 1:
-                    level = doc.level
-            elif int(doc.level) == 3:
-                level = int(doc.level)
-        return str(level)
-
-    @property
-    def verified_claims(self):
-
+        # Evidence expired since the last downgrade_expired_ial() no longer counts.
+        if self.ial_expires_at and date.today() > self.ial_expires_at:
+            return "1"
+        return str(self.ial_level)
+
+    def get_verified_claims(self, documents):
+        """
+        The OIDC for Identity Assurance verified_claims of ``documents``.
+
+        Read only: users without IAL2 evidence get an empty list. The
+        verified claims are built once per evidence type and shared by the
+        documents of that type.
+        """
         vpa_list = []
-        ialds = IdentityAssuranceLevelDocumentation.objects.filter(
-            subject_user=self.user)
-
-        if not ialds:
-            IdentityAssuranceLevelDocumentation.objects.create(
-                subject_user=self.user)
-            ialds = IdentityAssuranceLevelDocumentation.objects.filter(
-                subject_user=self.user, )
-
-        od = OrderedDict()
-        od["verification"] = OrderedDict()
-        od["verification"]["trust_framework"] = "nist_800_63A_ial_2"
-        od["verification"]["time"] = str(self.updated_at)
-        od["verification"]["evidence"] = []
-
-        for i in ialds:
-            od = OrderedDict()
-            od["verification"] = OrderedDict()
-            od["verification"]["trust_framework"] = "nist_800_63A_ial_2"
-            od["verification"]["time"] = str(self.updated_at)
-            od["verification"]["evidence"] = []
-
-            if i.level != "1":
-                od["verification"]["evidence"].append(i.oidc_ia_evidence)
-                od["verification"]["claims"] = OrderedDict()
-
+        time = str(self.updated_at)
+        verified = {}
+        for i in documents:
+            if not i.evidence or i.level == "1":
+                continue
+            claims = verified.get(i.evidence_type)
+            if claims is None:
                 # TODO Check the list of claims to be applied.
-                od["verification"]["claims"]["given_name"] = self.given_name
-                od["verification"]["claims"]["family_name"] = self.family_name
-
+                claims = OrderedDict()
+                claims["given_name"] = self.given_name
+                claims["family_name"] = self.family_name
                 if i.evidence_type == "id_document":
-                    od["verification"]["claims"][
-                        "birthdate"] = self.preferred_birthdate
+                    claims["birthdate"] = self.preferred_birthdate
                 if i.evidence_type == "utility_bill":
-                    od["verification"]["claims"]["address"] = self.address
-                # od["verification"]["claims"]["gender"] = self.gender
-                vpa_list.append(od)
-
+                    claims["address"] = self.address
+                verified[i.evidence_type] = claims
+            od = OrderedDict()
+            od["verification"] = OrderedDict()
+            od["verification"]["trust_framework"] = "nist_800_63A_ial_2"
+            od["verification"]["time"] = time
+            od["verification"]["evidence"] = [i.oidc_ia_evidence]
+            od["verification"]["claims"] = claims
+            vpa_list.append(od)
         return vpa_list
 
+    @property
+    def verified_claims(self):
+        # Read through the relation so a prefetched claim context is reused.
+        return self.get_verified_claims(self.user.subject_user.all())
+
     @property
     def aal(self):
         # Default value only
@@ -787,7 +885,7 @@ class UserProfile(models.Model):
     @property
     def address(self):
         formatted_addresses = []
-        addresses = Address.objects.filter(user=self.user)
+        addresses = self.user.address_set.all()
         for a in addresses:
             formatted_addresses.append(a.formatted_address)
         return formatted_addresses
@@ -795,7 +893,7 @@ class UserProfile(models.Model):
     @property
     def doc(self):
         formatted_identifiers = []
-        identifiers = IndividualIdentifier.objects.filter(user=self.user)
+        identifiers = self.user.individualidentifier_set.all()
         for i in identifiers:
             formatted_identifiers.append(i.doc_oidc_format_enhanced)
         return formatted_identifiers
@@ -803,42 +901,34 @@ class UserProfile(models.Model):
     @property
     def agent_to_organization(self):
         # Get the organizations for this user.
-        orgs = []
-        for o in Organization.objects.all():
-            for u in o.users.all():
-                if u == self.user:
-                    orgs.append(o.formatted_organization)
-        return orgs
+        return [o.formatted_organization for o in self.agent_organizations]
 
     @property
     def agent_organizations(self):
         # Get the organizations for this user is an agent.
-        orgs = []
-        for o in Organization.objects.all():
-            for u in o.users.all():
-                if u == self.user:
-                    orgs.append(o)
-        return orgs
+        # Read through the relation so a prefetched claim context is reused.
+        return list(self.user.org_staff.all())
 
     @property
     def member_organizations(self):
         # Get the organizations for which this user is a member.
-        orgs = []
-        for o in Organization.objects.all():
-            for u in o.members.all():
-                if u == self.user:
-                    orgs.append(o)
-        return orgs
+        return list(self.user.org_members.all())
 
     @property
     def member_to_organization(self):
         # Get the organizations for this user as formated organizations.
-        members = []
-        for o in Organization.objects.all():
-            for m in o.members.all():
-                if m == self.user:
-                    members.append(o.formatted_organization)
-        return members
+        return [o.formatted_organization for o in self.member_organizations]
+
+
+def update_profile_search_fields(sender, instance, created, update_fields=None, **kwargs):
+    """Copy a user's searched fields to the profile's search columns."""
+    if created or (update_fields and not set(update_fields) & {'first_name', 'last_name', 'email'}):
+        return
+    UserProfile.objects.filter(user_id=instance.pk).update(**UserProfile.user_search_fields(instance))
+
+
+post_save.connect(update_profile_search_fields, sender=settings.AUTH_USER_MODEL,
+                  dispatch_uid='accounts_profile_search_fields')
 
 
 MFA_CHOICES = (
@@ -865,6 +955,7 @@ class PhoneVerifyCode(models.Model):
                                  self.mode)
         return name
 
+    @transaction.atomic
     def save(self, commit=True, **kwargs):
         if not self.id:
             now = pytz.utc.localize(datetime.utcnow())
@@ -872,34 +963,9 @@ class PhoneVerifyCode(models.Model):
             self.code = str(random.randint(1000, 9999))
             up = UserProfile.objects.get(user=self.user)
             if up.mobile_phone_number:
-
-                number = "%s" % (up.mobile_phone_number)
-                # Send SMS to up.mobile_phone_number
-                if settings.SMS_STRATEGY == "AWS-SNS":
-                    sns = boto3.client('sns', region_name='us-east-1')
-                    sns.publish(
-                        PhoneNumber=number,
-                        Message="Your verification code for %s is : %s" % (settings.ORGANIZATION_NAME,
-                                                                           self.code),
-                        MessageAttributes={
-                            'AWS.SNS.SMS.SenderID': {
-                                'DataType': 'String',
-                                'StringValue': 'MySenderID'
-                            }
-                        }
-                    )
-                    logger.info("Message sent to %s by AWS SNS." % (number))
-
-                if settings.SMS_STRATEGY == "TWILIO":
-                    client = Client(settings.TWILIO_ACCOUNT_SID,
-                                    settings.TWILIO_TOKEN)
-                    message = client.messages.create(
-                        to=str(number),
-                        from_=settings.TWILIO_FROM_NUMBER,
-                        body="Your verification code for %s is : %s" % (settings.ORGANIZATION_NAME,
-                                                                        self.code))
-                    logger.info("Message sent to %s by Twilio. %s" %
-                                (number, message.sid))
+                # Queue an SMS to up.mobile_phone_number
+                send_text("Your verification code for %s is : %s" % (
+                    settings.ORGANIZATION_NAME, self.code), up.mobile_phone_number)
 
         if commit:
             super(PhoneVerifyCode, self).save(**kwargs)
@@ -914,6 +980,7 @@ class ActivationKey(models.Model):
         return 'Key for %s expires at %s' % (self.user.username,
                                              self.expires)
 
+    @transaction.atomic
     def save(self, commit=True, **kwargs):
         self.signup_key = str(uuid.uuid4())
 
@@ -921,7 +988,7 @@ class ActivationKey(models.Model):
         expires = now + timedelta(days=settings.SIGNUP_TIMEOUT_DAYS)
         self.expires = expires
 
-        # send an email with reset url
+        # queue an email with the activation url
         send_activation_key_via_email(self.user, self.key)
         if commit:
             super(ActivationKey, self).save(**kwargs)
@@ -938,6 +1005,7 @@ class ValidPasswordResetKey(models.Model):
                                                  self.user.username,
                                                  self.expires)
 
+    @transaction.atomic
     def save(self, commit=True, **kwargs):
         self.reset_password_key = str(uuid.uuid4())
         # use timezone.now() instead of datetime.now()
@@ -945,13 +1013,74 @@ class ValidPasswordResetKey(models.Model):
         expires = now + timedelta(minutes=1440)
         self.expires = expires
 
-        # send an email with reset url
+        # queue an email with reset url
         if self.user.email:
             send_password_reset_url_via_email(self.user, self.reset_password_key)
         if commit:
             super(ValidPasswordResetKey, self).save(**kwargs)
 
 
+class UserSession(AbstractBaseSession):
+    """A database session, indexed by the user logged in with it."""
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE,
+                             null=True, blank=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def get_session_store_class(cls):
+        from .sessions import SessionStore
+        return SessionStore
+
+
+class MemberImport(models.Model):
+    """A bulk import of members and agents into an organization."""
+    STATUS_CHOICES = (('RUNNING', 'Running'),
+                      ('DONE', 'Done'),
+                      ('FAILED', 'Failed'))
+
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE)
+    created_by = models.ForeignKey(get_user_model(), on_delete=models.SET_NULL,
+                                   null=True, blank=True)
+    source = models.CharField(max_length=255, blank=True, default='')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='RUNNING')
+    # The checkpoint: rows read and committed so far. A resumed import
+    # skips them.
+    rows_read = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    seconds = models.FloatField(default=0, help_text=_("Time spent importing."))
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return "Import %s of %s into %s" % (self.pk, self.source, self.organization)
+
+    @property
+    def rows_per_second(self):
+        if not self.seconds:
+            return 0
+        return round(self.rows_read / self.seconds, 1)
+
+
+class MemberImportError(models.Model):
+    member_import = models.ForeignKey(MemberImport, on_delete=models.CASCADE,
+                                      related_name='errors')
+    # 1 based, not counting a CSV header.
+    row = models.PositiveIntegerField()
+    errors = models.TextField(help_text=_("JSON object of the errors by field."))
+
+    class Meta:
+        ordering = ('row', )
+
+
+class ImportedMember(models.Model):
+    """A user created by a MemberImport, until they are notified."""
+    member_import = models.ForeignKey(MemberImport, on_delete=models.CASCADE,
+                                      related_name='members')
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
+    notified = models.BooleanField(default=False, db_index=True)
+
+
 def random_key_id(y=20):
     return ''.join(random.choice('ABCDEFGHIJKLM'
                                  'NOPQRSTUVWXYZ') for x in range(y))
@@ -0,0 +1,32 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from .models import (
+    ActivationKey,
+    IDCardConfirmation,
+    PhoneVerifyCode,
+    UserSession,
+    ValidPasswordResetKey,
+)
+
+
+def spent_phone_verify_codes(now):
+    return PhoneVerifyCode.objects.filter(Q(expires__lt=now) | Q(valid=False))
+
+
+def expired_activation_keys(now):
+    return ActivationKey.objects.filter(expires__lt=now)
+
+
+def expired_password_reset_keys(now):
+    return ValidPasswordResetKey.objects.filter(expires__lt=now)
+
+
+def old_id_card_confirmations(now):
+    # Rows created before created_at existed are kept.
+    days = settings.ID_CARD_CONFIRMATION_RETENTION_DAYS
+    return IDCardConfirmation.objects.filter(created_at__lt=now - timedelta(days=days))
+
+
+def expired_sessions(now):
+    return UserSession.objects.filter(expire_date__lt=now)
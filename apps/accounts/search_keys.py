@@ -0,0 +1,30 @@
+"""
+The normalized forms of searched values, stored in the indexed search_*
+columns of UserProfile and applied to search terms alike, so a prefix
+match on the column is case, accent and punctuation insensitive.
+"""
+import re
+import unicodedata
+
+
+def name_key(value):
+    """Upper case, without accents or punctuation, single spaced."""
+    value = unicodedata.normalize('NFKD', str(value or ''))
+    value = ''.join(c for c in value if not unicodedata.combining(c))
+    return ' '.join(re.sub(r"[^\w\s]", '', value).split()).upper()
+
+
+def email_key(value):
+    return str(value or '').strip().lower()
+
+
+def phone_key(value):
+    """
+    The digits of a US number without the country code, also when only the
+    first digits of a number are given, e.g. "+1 518".
+    """
+    value = str(value or '').strip()
+    digits = re.sub(r'\D', '', value)
+    if digits.startswith('1') and (value.startswith('+') or len(digits) == 11):
+        digits = digits[1:]
+    return digits
@@ -0,0 +1,38 @@
+"""
+Database sessions indexed by user (SESSION_ENGINE = 'apps.accounts.sessions').
+
+Every save of a session records the user logged in with it, so one user's
+sessions are found or deleted with an indexed query instead of decoding
+every session.
+"""
+from django.contrib.auth import SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+
+class SessionStore(DBStore):
+
+    @classmethod
+    def get_model_class(cls):
+        from .models import UserSession
+        return UserSession
+
+    def create_model_instance(self, data):
+        obj = super().create_model_instance(data)
+        try:
+            obj.user_id = get_user_model()._meta.pk.to_python(data.get(SESSION_KEY))
+        except ValidationError:
+            obj.user_id = None
+        return obj
+
+
+def get_user_sessions(user):
+    """The unexpired sessions of ``user``."""
+    return SessionStore.get_model_class().objects.filter(
+        user=user, expire_date__gt=timezone.now())
+
+
+def delete_user_sessions(user):
+    """Log ``user`` out everywhere. Returns the number of sessions deleted."""
+    return SessionStore.get_model_class().objects.filter(user=user).delete()[0]
@@ -1,9 +1,18 @@
 import random
+import threading
+from collections import deque
 from luhn import generate
+from django.apps import apps
 from django.conf import settings
+from django.db import IntegrityError, transaction
 
 __author__ = "Alan Viars"
 
+# Retries of a save whose subject was taken by another process meanwhile.
+SUBJECT_SAVE_ATTEMPTS = 5
+# Candidates checked per query. Stays under SQLite's 999 parameters.
+SUBJECT_LOOKUP_CHUNK = 900
+
 
 def random_number(y=10):
     return ''.join(random.choice('1234567890') for x in range(y))
@@ -26,3 +35,90 @@ def generate_subject_id(prefix=settings.SUBJECT_LUHN_PREFIX, starts_with="1",  n
     prefixed_number = "%s%s" % (prefix, number)
     luhn_checksum = generate(prefixed_number)
     return "%s%s" % (number, luhn_checksum)
+
+
+class SubjectAllocator(object):
+    """
+    Hands out unused, Luhn valid subject IDs of ``model_label``.
+
+    IDs are reserved per process in blocks of ``block_size``: a block of
+    random candidates costs one query dropping those already taken. The
+    unique constraint on ``subject`` settles the rare race between
+    processes, see save_with_subject().
+    """
+
+    def __init__(self, model_label, starts_with="1", block_size=None):
+        self.model_label = model_label
+        self.starts_with = starts_with
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._reserved = deque()
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def get_block_size(self):
+        return self.block_size or settings.SUBJECT_ID_BLOCK_SIZE
+
+    def generate(self, number_str_include=""):
+        return generate_subject_id(prefix=settings.SUBJECT_LUHN_PREFIX,
+                                   starts_with=self.starts_with,
+                                   number_str_include=number_str_include)
+
+    def get_taken(self, subjects):
+        taken = set()
+        subjects = list(subjects)
+        for i in range(0, len(subjects), SUBJECT_LOOKUP_CHUNK):
+            taken.update(self.model.objects.filter(
+                subject__in=subjects[i:i + SUBJECT_LOOKUP_CHUNK]).values_list('subject', flat=True))
+        return taken
+
+    def is_taken(self, subject):
+        return self.model.objects.filter(subject=subject).exists()
+
+    def reserve(self, count, number_str_include=""):
+        """``count`` new subjects, in one query per SUBJECT_LOOKUP_CHUNK."""
+        subjects = []
+        while len(subjects) < count:
+            candidates = set()
+            while len(candidates) < count - len(subjects):
+                candidates.add(self.generate(number_str_include))
+            candidates -= set(subjects)
+            subjects.extend(candidates - self.get_taken(candidates))
+        return subjects
+
+    def allocate(self, number_str_include=""):
+        # IDs including picked numbers are not interchangeable, so they
+        # are reserved one at a time.
+        if number_str_include and number_str_include.isnumeric():
+            return self.reserve(1, number_str_include)[0]
+        with self._lock:
+            if not self._reserved:
+                self._reserved.extend(self.reserve(self.get_block_size()))
+            return self._reserved.popleft()
+
+    def allocate_many(self, count):
+        """``count`` subjects for a bulk import."""
+        with self._lock:
+            subjects = [self._reserved.popleft() for i in range(min(count, len(self._reserved)))]
+        return subjects + self.reserve(count - len(subjects))
+
+
+def save_with_subject(instance, allocator, save):
+    """
+    Calls ``save()``, drawing a new subject from ``allocator`` when the
+    one given to ``instance`` was taken by another process meanwhile.
+    """
+    for attempt in range(SUBJECT_SAVE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            if attempt + 1 == SUBJECT_SAVE_ATTEMPTS or not allocator.is_taken(instance.subject):
+                raise
+            instance.subject = allocator.allocate(instance.number_str_include)
+
+
+member_subjects = SubjectAllocator('accounts.UserProfile', starts_with="1")
+organization_subjects = SubjectAllocator('accounts.Organization', starts_with="2")
@@ -1,7 +1,23 @@
+from datetime import date, timedelta
+from unittest import mock
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
+from apps.fido.models import AttestedCredentialData
+from apps.ial.models import IdentityAssuranceLevelDocumentation
+from apps.mfa.backends.sms.models import SMSDevice
 from apps.oidc.claims import get_claims_provider
-from .models import UserProfile
+from apps.oidc.models import ClaimSnapshot
+from apps.oidc.settings import oidc_settings
+from .models import (
+    Address,
+    IndividualIdentifier,
+    Organization,
+    PersonToPersonRelationship,
+    UpstreamIdentityProviderUserAuthenticatorAssurance,
+    UserProfile,
+)
 
 UserModel = get_user_model()
 
@@ -26,3 +42,279 @@ class ClaimProviderTests(TestCase):
         cp = get_claims_provider()(user=self.test_user)
         claims = cp.get_claims()
         self.assertTrue(claims['email_verified'])
+
+
+@mock.patch.object(oidc_settings, "OIDC_CLAIM_SNAPSHOTS", False)
+class ClaimContextQueryCountTests(TestCase):
+
+    def setUp(self):
+        self.user = UserModel.objects.create_user(
+            "query_user",
+            "query@example.com",
+            "123456")
+        UserProfile.objects.create(user=self.user)
+        self.subject = UserModel.objects.create_user(
+            "subject_user",
+            "subject@example.com",
+            "123456")
+        UserProfile.objects.create(user=self.subject)
+        PersonToPersonRelationship.objects.create(
+            subject=self.subject, delegate=self.user,
+            relationship_type="PARENT-OR-GUARDIAN")
+        UpstreamIdentityProviderUserAuthenticatorAssurance.objects.create(
+            user=self.user, upstream_idp_sub="123", amr='["pwd", "sms"]')
+        SMSDevice.objects.create(user=self.user, phone_number="+15555555555")
+        self.add_claim_inputs(1)
+
+    def add_claim_inputs(self, count):
+        for i in range(count):
+            Address.objects.create(user=self.user, street_1="%s Main St." % (i))
+            IndividualIdentifier.objects.create(user=self.user, type="MPI", value=str(i))
+            IdentityAssuranceLevelDocumentation.objects.create(
+                subject_user=self.user, evidence="IAL2-GENERIC")
+            AttestedCredentialData.objects.create(
+                user=self.user, aaguid=b"", credential_id=b"%d" % (i), public_key=b"")
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            claims = get_claims_provider()(user=self.user).get_claims()
+        self.assertEqual(claims["ial"], "2")
+        self.assertEqual(len(claims["person_to_person"]), 1)
+        return len(context.captured_queries), claims
+
+    def test_query_count_is_constant(self):
+        queries, claims = self.count_queries()
+        self.assertEqual(len(claims["address"]), 1)
+
+        self.add_claim_inputs(10)
+        more_queries, claims = self.count_queries()
+        self.assertEqual(len(claims["address"]), 11)
+        self.assertEqual(len(claims["document"]), 11)
+        self.assertEqual(queries, more_queries)
+
+
+@mock.patch.object(oidc_settings, "OIDC_CLAIM_SNAPSHOTS", False)
+class ScopedClaimsTests(TestCase):
+
+    def setUp(self):
+        self.user = UserModel.objects.create_user(
+            "scoped_user",
+            "scoped@example.com",
+            "123456")
+        UserProfile.objects.create(user=self.user, email_verified=True)
+        Address.objects.create(user=self.user, street_1="1 Main St.")
+
+    def get_claims(self, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            claims = get_claims_provider()(user=self.user, **kwargs).get_claims()
+        return claims, len(context.captured_queries)
+
+    def test_openid_scope_only_returns_openid_claims(self):
+        claims, queries = self.get_claims(scopes=["openid"])
+        self.assertIn("sub", claims)
+        self.assertIn("ial", claims)
+        for name in ("email", "email_verified", "address", "document",
+                     "member_to_organizations", "person_to_person",
+                     "verified_claims"):
+            self.assertNotIn(name, claims)
+        all_claims, all_queries = self.get_claims()
+        self.assertIn("address", all_claims)
+        self.assertLess(queries, all_queries)
+
+    def test_scope_grants_claims(self):
+        claims, queries = self.get_claims(scopes=["openid", "email", "address"])
+        self.assertEqual(claims["email"], "scoped@example.com")
+        self.assertTrue(claims["email_verified"])
+        self.assertEqual(len(claims["address"]), 1)
+        self.assertNotIn("phone_number", claims)
+
+    def test_requested_claims(self):
+        claims, queries = self.get_claims(
+            scopes=["openid", "email", "address"], requested_claims=["email"])
+        self.assertEqual(claims["email"], "scoped@example.com")
+        self.assertNotIn("address", claims)
+
+    def test_openid_scope_all_claims(self):
+        with mock.patch.object(oidc_settings, "OIDC_OPENID_SCOPE_ALL_CLAIMS", True):
+            claims, queries = self.get_claims(scopes=["openid"])
+        self.assertEqual(set(claims), set(self.get_claims()[0]))
+
+
+class ClaimSnapshotTests(TestCase):
+
+    def setUp(self):
+        self.user = UserModel.objects.create_user(
+            "snapshot_user",
+            "snapshot@example.com",
+            "123456")
+        UserProfile.objects.create(user=self.user)
+        Address.objects.create(user=self.user, street_1="1 Main St.")
+
+    def get_claims(self, **kwargs):
+        return get_claims_provider()(user=self.user, **kwargs).get_claims()
+
+    def test_snapshot_matches_computed_claims(self):
+        claims = self.get_claims()
+        self.assertTrue(ClaimSnapshot.objects.filter(user=self.user).exists())
+        with self.assertNumQueries(1):
+            snapshot_claims = self.get_claims()
+        self.assertEqual(snapshot_claims["address"], claims["address"])
+        with mock.patch.object(oidc_settings, "OIDC_CLAIM_SNAPSHOTS", False):
+            computed = self.get_claims()
+        for name in ("exp", "iat"):
+            computed.pop(name)
+            snapshot_claims.pop(name)
+        self.assertEqual(snapshot_claims, computed)
+
+    def test_request_claims_are_overlaid(self):
+        self.get_claims()
+        request = mock.Mock(nonce="abc", client=mock.Mock(client_id="client"))
+        claims = self.get_claims(request=request)
+        self.assertEqual(claims["nonce"], "abc")
+        self.assertEqual(claims["aud"], "client")
+        self.assertNotIn("nonce", ClaimSnapshot.objects.get(user=self.user).claims)
+
+    def test_snapshot_is_scoped(self):
+        self.get_claims()
+        claims = self.get_claims(scopes=["openid", "phone"])
+        self.assertIn("sub", claims)
+        self.assertNotIn("address", claims)
+
+    def test_changes_invalidate_the_snapshot(self):
+        self.get_claims()
+        Address.objects.create(user=self.user, street_1="2 Main St.")
+        self.assertFalse(ClaimSnapshot.objects.filter(user=self.user).exists())
+        self.assertEqual(len(self.get_claims()["address"]), 2)
+
+        self.user.userprofile.nickname = "Snap"
+        self.user.userprofile.save()
+        self.assertEqual(self.get_claims()["nickname"], "Snap")
+
+        Address.objects.filter(user=self.user).first().delete()
+        self.assertEqual(len(self.get_claims()["address"]), 1)
+
+    def test_organization_membership_invalidates_the_snapshot(self):
+        organization = Organization.objects.create(
+            name="Snapshot Org", point_of_contact=self.user)
+        self.assertEqual(self.get_claims()["member_to_organization"], [])
+        organization.members.add(self.user)
+        self.assertEqual(len(self.get_claims()["member_to_organization"]), 1)
+        self.user.org_members.clear()
+        self.assertEqual(self.get_claims()["member_to_organization"], [])
+
+    def test_delegate_snapshot_follows_the_subject(self):
+        subject = UserModel.objects.create_user(
+            "snapshot_subject",
+            "subject@example.com",
+            "123456",
+            first_name="sam")
+        UserProfile.objects.create(user=subject)
+        PersonToPersonRelationship.objects.create(
+            subject=subject, delegate=self.user,
+            relationship_type="PARENT-OR-GUARDIAN")
+        self.assertEqual(self.get_claims()["person_to_person"][0]["given_name"], "Sam")
+        subject.first_name = "alex"
+        subject.save()
+        self.assertEqual(self.get_claims()["person_to_person"][0]["given_name"], "Alex")
+
+    def test_login_keeps_the_snapshot(self):
+        self.get_claims()
+        self.assertTrue(self.client.login(username="snapshot_user", password="123456"))
+        self.assertTrue(ClaimSnapshot.objects.filter(user=self.user).exists())
+
+    def test_snapshot_expires_with_the_evidence(self):
+        today = date.today()
+        for days in (10, 3):
+            IdentityAssuranceLevelDocumentation.objects.create(
+                subject_user=self.user, evidence="IAL2-GENERIC", expires_at=today + timedelta(days=days))
+        self.assertEqual(self.get_claims()["ial"], "2")
+        snapshot = ClaimSnapshot.objects.get(user=self.user)
+        self.assertEqual(snapshot.expires_at, today + timedelta(days=3))
+
+        # Once expired, the snapshot is rebuilt rather than read.
+        ClaimSnapshot.objects.filter(user=self.user).update(
+            expires_at=today - timedelta(days=1), claims='{"ial": "stale"}')
+        self.assertEqual(self.get_claims()["ial"], "2")
+        self.assertEqual(ClaimSnapshot.objects.get(user=self.user).expires_at, today + timedelta(days=3))
+
+    def test_snapshot_without_evidence_does_not_expire(self):
+        self.get_claims()
+        self.assertIsNone(ClaimSnapshot.objects.get(user=self.user).expires_at)
+
+
+@mock.patch.object(oidc_settings, "OIDC_CLAIM_SNAPSHOTS", False)
+class VerifiedClaimsTests(TestCase):
+
+    def setUp(self):
+        self.user = UserModel.objects.create_user(
+            "verified_user",
+            "verified@example.com",
+            "123456",
+            first_name="Vera")
+        UserProfile.objects.create(user=self.user)
+
+    def get_verified_claims(self):
+        with CaptureQueriesContext(connection) as context:
+            claims = get_claims_provider()(user=self.user).get_claims()
+        for query in context.captured_queries:
+            self.assertTrue(query["sql"].startswith("SELECT"), query["sql"])
+        return claims["verified_claims"]
+
+    def test_no_evidence_writes_nothing(self):
+        self.assertEqual(self.get_verified_claims(), [])
+        self.assertFalse(IdentityAssuranceLevelDocumentation.objects.exists())
+
+    def test_one_entry_per_evidence(self):
+        IdentityAssuranceLevelDocumentation.objects.create(
+            subject_user=self.user, evidence="IAL2-GENERIC")
+        IdentityAssuranceLevelDocumentation.objects.create(
+            subject_user=self.user, evidence="IAL2-GENERIC", evidence_type="utility_bill")
+        IdentityAssuranceLevelDocumentation.objects.create(subject_user=self.user)
+        verified_claims = self.get_verified_claims()
+        self.assertEqual(len(verified_claims), 2)
+        id_document, utility_bill = [v["verification"] for v in verified_claims]
+        self.assertEqual(id_document["evidence"][0]["type"], "id_document")
+        self.assertIn("birthdate", id_document["claims"])
+        self.assertEqual(utility_bill["claims"]["given_name"], "Vera")
+        self.assertIn("address", utility_bill["claims"])
+
+
+@mock.patch.object(oidc_settings, "OIDC_CLAIM_SNAPSHOTS", False)
+class OrganizationClaimQueryCountTests(TestCase):
+
+    def setUp(self):
+        self.user = UserModel.objects.create_user(
+            "org_user",
+            "org@example.com",
+            "123456")
+        UserProfile.objects.create(user=self.user)
+        contact = UserModel.objects.create_user(
+            "org_contact",
+            "contact@example.com",
+            "123456",
+            first_name="Pat")
+        UserProfile.objects.create(user=contact)
+        member_of = Organization.objects.create(name="Member Org", point_of_contact=contact)
+        member_of.members.add(self.user)
+        agent_of = Organization.objects.create(name="Agent Org", point_of_contact=contact)
+        agent_of.users.add(self.user)
+        self.contact = contact
+        self.add_organizations(10)
+
+    def add_organizations(self, count):
+        Organization.objects.bulk_create([
+            Organization(name="Other Org %d" % (i), point_of_contact=self.contact)
+            for i in range(count)])
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            claims = get_claims_provider()(user=self.user).get_claims()
+        self.assertEqual([o["name"] for o in claims["member_to_organization"]], ["Member Org"])
+        self.assertEqual([o["name"] for o in claims["agent_to_organization"]], ["Agent Org"])
+        self.assertEqual(claims["agent_to_organization"][0]["point_of_contact"]["first_name"], "Pat")
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_depend_on_the_organizations(self):
+        queries = self.count_queries()
+        self.add_organizations(10000 - 10)
+        self.assertEqual(self.count_queries(), queries)
@@ -0,0 +1,128 @@
+import io
+import json
+import tempfile
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from apps.notifications.models import Notification
+from apps.notifications.worker import deliver_pending
+from ..member_import import MemberImporter, import_members, read_rows, send_import_notifications
+from ..models import Address, IndividualIdentifier, MemberImport, Organization, UserProfile
+from ..subject_generator import member_subjects
+
+User = get_user_model()
+
+HEADER = "username,first_name,last_name,email,mobile_phone_number,birth_date,role,street_1,city,state," \
+         "zipcode,identifier_type,identifier_value\n"
+
+
+def csv_rows(start, count, **overrides):
+    lines = []
+    for i in range(start, start + count):
+        row = {"username": "member%d" % (i), "email": "member%d@example.com" % (i),
+               "role": "member", "street_1": "%d Main St." % (i), "identifier_value": str(i)}
+        row.update(overrides)
+        lines.append("%(username)s,Jane,Doe,%(email)s,,1980-01-02,%(role)s,%(street_1)s,Albany,NY,"
+                     "12207,MPI,%(identifier_value)s\n" % row)
+    return "".join(lines)
+
+
+class MemberImportTest(TestCase):
+
+    def setUp(self):
+        self.contact = User.objects.create_user("contact", "contact@example.com", "pass")
+        UserProfile.objects.create(user=self.contact)
+        self.organization = Organization.objects.create(
+            name="Import Org", slug="import-org", point_of_contact=self.contact)
+        self.group = Group.objects.create(name="Import Agents")
+        self.organization.default_groups_for_agents.add(self.group)
+
+    def run_import(self, text, **kwargs):
+        return import_members(self.organization, io.StringIO(text), **kwargs)
+
+    def test_rows_are_imported_in_batches(self):
+        job = self.run_import(HEADER + csv_rows(0, 20) + csv_rows(20, 1, role="agent"), batch_size=10)
+        self.assertEqual((job.status, job.rows_read, job.created_count, job.error_count), ("DONE", 21, 21, 0))
+        user = User.objects.get(username="member3")
+        self.assertFalse(user.is_active)
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(user.first_name, "JANE")
+        self.assertTrue(user.userprofile.subject)
+        self.assertEqual(Address.objects.get(user=user).street_1, "3 Main St.")
+        self.assertEqual(IndividualIdentifier.objects.get(user=user).value, "3")
+        self.assertEqual(self.organization.members.count(), 20)
+        agent = self.organization.users.get()
+        self.assertEqual(agent.username, "member20")
+        self.assertEqual(list(agent.groups.all()), [self.group])
+        self.assertEqual(UserProfile.objects.exclude(subject='').values('subject').distinct().count(), 22)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        def count(start, size):
+            member_subjects._reserved.clear()
+            job = MemberImport.objects.create(organization=self.organization)
+            importer = MemberImporter(job, batch_size=size)
+            with CaptureQueriesContext(connection) as context:
+                importer.run(read_rows(io.StringIO(HEADER + csv_rows(start, size))))
+            return len(context.captured_queries)
+        self.assertEqual(count(0, 5), count(100, 20))
+
+    def test_errors_are_reported_per_row(self):
+        User.objects.create_user("taken", "taken@example.com", "pass")
+        text = HEADER + csv_rows(0, 1) + csv_rows(1, 1, username="TAKEN") + \
+            csv_rows(2, 1, email="member0@example.com") + csv_rows(3, 1, role="boss")
+        job = self.run_import(text)
+        self.assertEqual((job.created_count, job.error_count), (1, 3))
+        errors = {e.row: json.loads(e.errors) for e in job.errors.all()}
+        self.assertEqual(errors[2]["username"][0]["code"], "unique")
+        self.assertEqual(errors[3]["email"][0]["code"], "unique")
+        self.assertIn("role", errors[4])
+
+    def test_jsonl(self):
+        text = '{"username": "json1", "first_name": "Al", "last_name": "Bo", "email": "json1@example.com"}\n\n'
+        job = self.run_import(text, format="jsonl")
+        self.assertEqual(job.created_count, 1)
+        self.assertEqual(User.objects.get(username="json1").userprofile.user.last_name, "BO")
+
+    def test_resume_from_the_checkpoint(self):
+        text = HEADER + csv_rows(0, 30)
+        original = MemberImporter.import_batch
+        calls = []
+
+        def fail_third_batch(importer, batch, started):
+            calls.append(len(batch))
+            if len(calls) == 3:
+                raise RuntimeError("interrupted")
+            return original(importer, batch, started)
+
+        with mock.patch.object(MemberImporter, 'import_batch', fail_third_batch):
+            with self.assertRaises(RuntimeError):
+                self.run_import(text, batch_size=10)
+        job = MemberImport.objects.get()
+        self.assertEqual((job.status, job.rows_read), ("FAILED", 20))
+        job = self.run_import(text, batch_size=10, member_import=job)
+        self.assertEqual((job.status, job.rows_read, job.created_count), ("DONE", 30, 30))
+        self.assertEqual(self.organization.members.count(), 30)
+
+    def test_notifications_are_queued(self):
+        job = self.run_import(HEADER + csv_rows(0, 3))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(job.members.filter(notified=False).count(), 3)
+        self.assertEqual(send_import_notifications(job, batch_size=2), 3)
+        self.assertEqual(Notification.objects.filter(channel=Notification.EMAIL).count(), 3)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(send_import_notifications(job), 0)
+        deliver_pending()
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_command(self):
+        out = io.StringIO()
+        with tempfile.NamedTemporaryFile(suffix=".csv") as f:
+            f.write((HEADER + csv_rows(0, 2)).encode())
+            f.flush()
+            call_command('import_members', 'import-org', f.name, stdout=out)
+        self.assertIn("2 created", out.getvalue())
@@ -0,0 +1,91 @@
+from datetime import date
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from ..member_search import search_members
+from ..models import Organization, UserProfile
+from ..search_keys import name_key, phone_key
+
+User = get_user_model()
+
+
+class MemberSearchTest(TestCase):
+
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Acme", slug="acme")
+        self.profiles = {}
+        for username, first_name, last_name, phone in [
+                ("mary", "Mary", "Smith", "+15185550101"),
+                ("marty", "MARTY", "Smithers", ""),
+                ("jose", "José", "O'Brien", "+15185550102"),
+                ("john", "John", "Smyth", "+12125550103")]:
+            user = User.objects.create_user(username, "%s@example.com" % (username), "pass",
+                                            first_name=first_name, last_name=last_name)
+            self.profiles[username] = UserProfile.objects.create(
+                user=user, mobile_phone_number=phone, birth_date=date(1980, 1, 2))
+        self.organization.members.add(*[self.profiles[u].user for u in ("mary", "jose", "john")])
+
+    def search(self, **criteria):
+        return [up.user.username for up in search_members(criteria, organization=criteria.pop('org', None))]
+
+    def test_keys(self):
+        self.assertEqual(name_key("  José  O'Brien-Smith "), "JOSE OBRIENSMITH")
+        self.assertEqual(phone_key("+1 (518) 555-0101"), "5185550101")
+        self.assertEqual(phone_key("+1 518"), "518")
+        self.assertEqual(phone_key("1-518-555-0101"), "5185550101")
+
+    def test_prefix_and_case_insensitive(self):
+        self.assertEqual(self.search(last_name="smi"), ["mary", "marty"])
+        self.assertEqual(self.search(first_name="jose"), ["jose"])
+        self.assertEqual(self.search(last_name="obri"), ["jose"])
+        self.assertEqual(self.search(mobile_phone_number="518-555"), ["jose", "mary"])
+        self.assertEqual(self.search(mobile_phone_number="+1 518"), ["jose", "mary"])
+        self.assertEqual(self.search(email="MAR"), ["mary", "marty"])
+        self.assertEqual(self.search(first_name="mar", birth_date=date(1980, 1, 2)), ["mary", "marty"])
+        self.assertEqual(self.search(birth_date=date(1990, 1, 2)), [])
+
+    def test_user_changes_update_the_search_columns(self):
+        user = self.profiles["john"].user
+        user.last_name = "Smithson"
+        user.save()
+        self.assertEqual(self.search(last_name="smith"), ["mary", "marty", "john"])
+
+    def test_organization_filter_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.search(last_name="sm", org=self.organization), ["mary", "john"])
+
+    def test_keyset_pagination(self):
+        seen = []
+        cursor = None
+        for i in range(3):
+            page = search_members({}, organization=self.organization, cursor=cursor, page_size=1)
+            seen += [up.user.username for up in page]
+            cursor = page.next_cursor
+        self.assertIsNone(cursor)
+        self.assertEqual(seen, ["jose", "mary", "john"])
+        with self.assertRaises(ValueError):
+            search_members({}, cursor="bm90IGEgY3Vyc29y")
+
+    @override_settings(MEMBER_SEARCH_PAGE_SIZE=1)
+    def test_view(self):
+        agent = User.objects.create_user("agent", "agent@example.com", "pass")
+        UserProfile.objects.create(user=agent)
+        agent.user_permissions.add(Permission.objects.get(codename='change_identityassuranceleveldocumentation'))
+        self.client.force_login(agent)
+        url = "/search/organization/members/acme/"
+        response = self.client.post(url, {"last_name": "smi"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([up.user.username for up in response.context['search_results']], ["mary"])
+        self.assertNotIn('next_query', response.context)
+
+        response = self.client.post(url, {"last_name": "s"})
+        # Only the cursor is in the link, the criteria stay in the session.
+        self.assertEqual(list(QueryDict(response.context['next_query'])), ["cursor"])
+        response = self.client.get(url + "?" + response.context['next_query'])
+        self.assertEqual([up.user.username for up in response.context['search_results']], ["john"])
+        self.assertEqual(self.client.get(url + "?cursor=bad").status_code, 404)
+
+        self.client.logout()
+        self.client.force_login(agent)
+        self.assertRedirects(self.client.get(url + "?cursor=bad"), url)
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from luhn import verify
+from ..models import Organization, UserProfile
+from ..subject_generator import SubjectAllocator, member_subjects, organization_subjects
+
+User = get_user_model()
+
+
+class SubjectAllocatorTest(TestCase):
+
+    def setUp(self):
+        member_subjects._reserved.clear()
+        organization_subjects._reserved.clear()
+
+    def tearDown(self):
+        member_subjects._reserved.clear()
+        organization_subjects._reserved.clear()
+
+    def test_block_is_reserved_with_one_query(self):
+        allocator = SubjectAllocator('accounts.UserProfile', block_size=50)
+        with self.assertNumQueries(1):
+            subject = allocator.allocate()
+        with self.assertNumQueries(0):
+            subjects = [allocator.allocate() for i in range(49)]
+        self.assertEqual(len(set(subjects + [subject])), 50)
+        self.assertTrue(subject.startswith("1"))
+        self.assertTrue(verify(subject))
+
+    def test_allocate_many(self):
+        allocator = SubjectAllocator('accounts.Organization', starts_with="2")
+        with self.assertNumQueries(3):
+            subjects = allocator.allocate_many(2000)
+        self.assertEqual(len(set(subjects)), 2000)
+
+    def test_picked_numbers_are_included(self):
+        self.assertEqual(member_subjects.allocate("42")[:3], "142")
+
+    def test_taken_subject_is_replaced_on_save(self):
+        user = User.objects.create_user("first", password="pass")
+        taken = UserProfile.objects.create(user=user).subject
+        member_subjects._reserved.appendleft(taken)
+        profile = UserProfile.objects.create(user=User.objects.create_user("second", password="pass"))
+        self.assertNotEqual(profile.subject, taken)
+        self.assertEqual(UserProfile.objects.filter(subject=taken).count(), 1)
+
+    def test_taken_organization_subject_is_replaced_on_save(self):
+        taken = Organization.objects.create(name="First").subject
+        organization_subjects._reserved.appendleft(taken)
+        organization = Organization.objects.create(name="Second")
+        self.assertNotEqual(organization.subject, taken)
+        self.assertTrue(organization.subject.startswith("2"))
@@ -1,31 +1,12 @@
-from django.conf import settings
-import boto3
-import logging
-from twilio.rest import Client
-
-logger = logging.getLogger('verifymyidentity_.%s' % __name__)
+from apps.mfa.backends.sms.transports import get_sms_transport
+from apps.notifications.outbox import queue_text
 
 
 def send_text(message, number):
-    if settings.SMS_STRATEGY == "AWS-SNS":
-        sns = boto3.client('sns', region_name='us-east-1')
-        number = "%s" % (number)
-        sns.publish(
-            PhoneNumber=number,
-            Message=message,
-            MessageAttributes={
-                'AWS.SNS.SMS.SenderID': {
-                    'DataType': 'String',
-                    'StringValue': 'MySenderID'
-                }
-            }
-        )
-
-    elif settings.SMS_STRATEGY == "TWILIO":
+    """Queue a text message. It is sent once the current transaction commits."""
+    return queue_text(message, number)
 
-        client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_TOKEN)
-        tmsg = client.messages.create(to=str(number), from_=settings.TWILIO_FROM_NUMBER, body=message)
-        logger.info("Message sent to %s by Twilio. %s" % (number, tmsg.sid))
 
-    else:
-        logger.error("Text Message not sent. No SMS_STRATEGY defined.")
+def deliver_text(message, number):
+    """Send a text message now, through settings.SMS_STRATEGY."""
+    get_sms_transport().send(message, str(number))
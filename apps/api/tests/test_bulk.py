@@ -0,0 +1,205 @@
+import json
+from unittest import mock
+from .base import BaseTestCase
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.auth.models import Permission
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from apps.accounts.models import Address, UserProfile
+from apps.ial.models import IdentityAssuranceLevelDocumentation
+
+User = get_user_model()
+
+
+def user_item(username, **fields):
+    item = {
+        "preferred_username": username,
+        "given_name": "James",
+        "family_name": "Kirk",
+        "gender": "male",
+        "password": "tree garden jump fox",
+        "birthdate": "1952-01-03",
+        "nickname": "Jim",
+    }
+    item.update(fields)
+    return item
+
+
+def address_item(number, **fields):
+    item = {
+        "street_address": "%d State St." % (number),
+        "locality": "Schenectady",
+        "region": "NY",
+        "postal_code": "12307",
+        "country": "US",
+    }
+    item.update(fields)
+    return item
+
+
+class BulkTestCase(BaseTestCase):
+
+    def get_permissions(self):
+        return Permission.objects.filter(
+            content_type__in=(
+                ContentType.objects.get_by_natural_key('accounts', 'userprofile'),
+                ContentType.objects.get_by_natural_key('accounts', 'address'),
+                ContentType.objects.get_by_natural_key('ial', 'identityassuranceleveldocumentation'),),
+        ).all()
+
+    def bulk(self, method, path, items, content_type="application/json"):
+        if content_type == "application/x-ndjson":
+            body = "\n".join(json.dumps(item) for item in items)
+        else:
+            body = json.dumps(items)
+        response = getattr(Client(), method)(
+            "/api/v1/%s" % (path), body, content_type=content_type,
+            Authorization="Bearer {}".format(self.token.token))
+        self.assertEqual(200, response.status_code, response.content)
+        return response.json()['results']
+
+    def create_users(self, *usernames):
+        results = self.bulk('post', 'user/bulk/', [user_item(username) for username in usernames])
+        return [result['data']['sub'] for result in results]
+
+    def test_create_users(self):
+        results = self.bulk('post', 'user/bulk/', [
+            user_item("james", email="James@Example.com"),
+            user_item("spock", gender="vulcan"),
+            user_item("JAMES"),
+            user_item("bob"),
+            user_item("leonard"),
+        ])
+        self.assertEqual([201, 400, 400, 400, 201], [result['status'] for result in results])
+        self.assertIn('gender', results[1]['errors'])
+        self.assertIn('preferred_username', results[2]['errors'])
+        self.assertIn('preferred_username', results[3]['errors'])
+        self.assertDictContainsSubset({
+            "preferred_username": "james",
+            "given_name": "James",
+            "family_name": "Kirk",
+            "email": "james@example.com",
+            "birthdate": "1952-01-03",
+            "ial": "1",
+        }, results[0]['data'])
+
+        profile = UserProfile.objects.get(subject=results[4]['data']['sub'])
+        self.assertEqual(profile.user.username, "leonard")
+        self.assertTrue(profile.user.check_password("tree garden jump fox"))
+        self.assertEqual(profile.user.email, "%s@localhost" % (profile.subject))
+        self.assertEqual(profile.search_last_name, "KIRK")
+
+    def test_update_users_ndjson(self):
+        james, leonard = self.create_users("james", "leonard")
+        results = self.bulk('patch', 'user/bulk/', [
+            {"sub": james, "family_name": "Tiberius", "password": "a new password"},
+            {"sub": "0", "family_name": "Nobody"},
+            {"sub": leonard, "birthdate": "1920-01-20", "preferred_username": "james"},
+            {"sub": leonard, "nickname": "Bones"},
+            {"sub": james, "nickname": "Jim"},
+        ], content_type="application/x-ndjson")
+        # An invalid item still keeps later items from updating the same user.
+        self.assertEqual([200, 404, 400, 400, 400], [result['status'] for result in results])
+        self.assertEqual("Tiberius", results[0]['data']['family_name'])
+
+        profile = UserProfile.objects.get(subject=james)
+        self.assertEqual(profile.user.last_name, "Tiberius")
+        self.assertEqual(profile.search_last_name, "TIBERIUS")
+        self.assertTrue(profile.user.check_password("a new password"))
+        self.assertEqual(UserProfile.objects.get(subject=leonard).nickname, "Jim")
+
+    def test_create_and_update_identifiers(self):
+        james, leonard = self.create_users("james", "leonard")
+        results = self.bulk('post', 'id-assurance/bulk/', [
+            {"sub": james, "classification": "ONE-SUPERIOR-OR-STRONG-PLUS", "exp": "2099-01-01"},
+            {"sub": leonard, "classification": "ONE-SUPERIOR-OR-STRONG-PLUS", "note": "On file."},
+            {"sub": "0", "classification": "ONE-SUPERIOR-OR-STRONG-PLUS"},
+            {"sub": leonard, "classification": "NOT-A-CLASSIFICATION"},
+        ])
+        self.assertEqual([201, 201, 404, 400], [result['status'] for result in results])
+        self.assertDictContainsSubset({
+            "sub": james,
+            "classification": "ONE-SUPERIOR-OR-STRONG-PLUS",
+            "exp": "2099-01-01",
+            "verifier_subject": self.token.user.userprofile.subject,
+        }, results[0]['data'])
+        # The IAL follows the new documentation.
+        self.assertEqual(UserProfile.objects.get(subject=james).ial_level, 2)
+        doc = IdentityAssuranceLevelDocumentation.objects.get(uuid=results[1]['data']['uuid'])
+        self.assertTrue(doc.id_verify_description)
+
+        # Updates on a user's route only reach that user's documentation.
+        results = self.bulk('patch', 'user/%s/id-assurance/bulk/' % (leonard), [
+            {"uuid": results[1]['data']['uuid'], "exp": "2000-01-01"},
+            {"uuid": results[0]['data']['uuid'], "exp": "2000-01-01"},
+        ])
+        self.assertEqual([200, 404], [result['status'] for result in results])
+        self.assertEqual(UserProfile.objects.get(subject=leonard).ial_level, 1)
+        self.assertEqual(UserProfile.objects.get(subject=james).ial_level, 2)
+
+    def test_create_and_update_addresses(self):
+        james, leonard = self.create_users("james", "leonard")
+        results = self.bulk('post', 'user/%s/address/bulk/' % (james), [address_item(1), address_item(2)])
+        self.assertEqual([201, 201], [result['status'] for result in results])
+        results = self.bulk('post', 'address/bulk/', [
+            address_item(3, sub=leonard), address_item(4), address_item(5, sub=james, region=None)])
+        self.assertEqual([201, 404, 400], [result['status'] for result in results])
+        self.assertEqual(leonard, results[0]['data']['sub'])
+        self.assertEqual(2, Address.objects.filter(user__userprofile__subject=james).count())
+
+        results = self.bulk('patch', 'address/bulk/', [
+            {"uuid": results[0]['data']['uuid'], "locality": "Albany"}, {"uuid": "missing"}])
+        self.assertEqual([200, 404], [result['status'] for result in results])
+        self.assertEqual("Albany", Address.objects.get(user__userprofile__subject=leonard).city)
+
+    def test_queries_per_request(self):
+        subjects = self.create_users(*["user%d" % (i) for i in range(9)])
+
+        def count_queries(path, items):
+            with CaptureQueriesContext(connection) as queries:
+                results = self.bulk('post', path, items)
+            self.assertEqual([201] * len(items), [result['status'] for result in results])
+            return len(queries)
+
+        for path, item in (('address/bulk/', address_item),
+                           ('id-assurance/bulk/', lambda i, sub: {
+                               "sub": sub, "classification": "ONE-SUPERIOR-OR-STRONG-PLUS"})):
+            with self.subTest(path):
+                self.assertEqual(
+                    count_queries(path, [item(i, sub=subject) for i, subject in enumerate(subjects[1:3])]),
+                    count_queries(path, [item(i, sub=subject) for i, subject in enumerate(subjects[3:])]))
+
+    @mock.patch('vmi.settings.API_USER_BULK_MAX_ITEMS', 2)
+    def test_user_item_cap(self):
+        response = Client().post("/api/v1/user/bulk/", json.dumps([user_item("user%d" % (i)) for i in range(3)]),
+                                 content_type="application/json",
+                                 Authorization="Bearer {}".format(self.token.token))
+        self.assertEqual(400, response.status_code, response.content)
+        self.assertEqual(len(self.create_users("kirk", "spock")), 2)
+
+    def test_passwords_are_hashed_before_the_transaction(self):
+        depths = {}
+
+        def make_password(password):
+            depths['hashed'] = len(connection.savepoint_ids)
+            return "hashed"
+
+        bulk_create = User.objects.bulk_create
+
+        def bulk_create_users(users):
+            depths['written'] = len(connection.savepoint_ids)
+            return bulk_create(users)
+
+        with mock.patch('apps.api.views.user.make_password', make_password), \
+                mock.patch.object(User.objects, 'bulk_create', bulk_create_users):
+            self.create_users("kirk")
+        self.assertLess(depths['hashed'], depths['written'])
+        self.assertEqual(User.objects.get(username="kirk").password, "hashed")
+
+    def test_not_a_list(self):
+        response = Client().post("/api/v1/user/bulk/", {"preferred_username": "james"},
+                                 content_type="application/json",
+                                 Authorization="Bearer {}".format(self.token.token))
+        self.assertEqual(400, response.status_code, response.content)
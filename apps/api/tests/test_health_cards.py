@@ -0,0 +1,64 @@
+import shutil
+import tempfile
+from unittest import mock
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.test import Client, override_settings
+from apps.healthcards.models import SmartHealthCard, SmartHealthJWKS
+from .base import BaseTestCase
+
+
+class HealthCardIssueTestCase(BaseTestCase):
+
+    def get_permissions(self):
+        return Permission.objects.filter(
+            content_type=ContentType.objects.get_by_natural_key('healthcards', 'smarthealthcard'),
+        ).all()
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        SmartHealthJWKS.objects.create(nickname="test")
+
+    def issue(self, cards):
+        return Client().post(
+            "/api/v1/health-cards/issue",
+            {"cards": cards},
+            content_type="application/json",
+            Authorization="Bearer {}".format(self.token.token),
+        )
+
+    def test_issue(self):
+        sub = self.token.user.userprofile.subject
+        cards = [{"sub": sub, "payload": {"vc": {}}, "name": "COVID-19"},
+                 {"sub": "nobody", "payload": {"vc": {}}}]
+        response = self.issue(cards)
+        self.assertEqual(response.status_code, 200, response.content)
+        report = response.json()
+        self.assertEqual((report["created"], report["unchanged"]), (1, 0))
+        self.assertEqual(report["row_errors"], [{"row": 2, "error": "No member with the subject nobody."}])
+        self.assertTrue(SmartHealthCard.objects.get(user=self.token.user).shc_jws)
+
+        report = self.issue(cards[:1]).json()
+        self.assertEqual((report["created"], report["unchanged"]), (0, 1))
+
+    @override_settings(SHC_ISSUE_API_MAX_CARDS=1)
+    def test_too_many_cards(self):
+        response = self.issue([{"sub": "a", "payload": {}}, {"sub": "b", "payload": {}}])
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(SHC_ISSUE_PROCESSES=2)
+    def test_signed_without_a_process_pool(self):
+        sub = self.token.user.userprofile.subject
+        with mock.patch('apps.healthcards.issuance.ProcessPoolExecutor') as pool:
+            response = self.issue([{"sub": sub, "payload": {"vc": {}}}])
+        self.assertEqual(response.json()["created"], 1)
+        pool.assert_not_called()
+
+    def test_permission_required(self):
+        self.token.user.user_permissions.clear()
+        self.assertEqual(self.issue([]).status_code, 403)
@@ -0,0 +1,76 @@
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client
+from apps.accounts.models import Organization
+from .base import BaseTestCase
+
+
+class MemberImportTestCase(BaseTestCase):
+
+    def get_permissions(self):
+        return Permission.objects.filter(
+            content_type=ContentType.objects.get_by_natural_key('accounts', 'memberimport'),
+        ).all()
+
+    def setUp(self):
+        super().setUp()
+        self.organization = Organization.objects.create(
+            name="API Org", slug="api-org", point_of_contact=self.token.user)
+        self.organization.users.add(self.token.user)
+
+    def test_import_and_report(self):
+        client = Client()
+        upload = SimpleUploadedFile("members.csv", (
+            b"username,first_name,last_name,email\n"
+            b"kirk,James,Kirk,kirk@example.com\n"
+            b"bob,Bob,Taken,\n"))
+        response = client.post(
+            "/api/v1/member-import/",
+            {"organization": "api-org", "file": upload},
+            Authorization="Bearer {}".format(self.token.token),
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        report = response.json()
+        self.assertEqual((report["status"], report["created_count"], report["error_count"]), ("DONE", 1, 1))
+        self.assertEqual(report["row_errors"][0]["row"], 2)
+        self.assertTrue(self.organization.members.filter(username="kirk").exists())
+
+        response = client.get(
+            "/api/v1/member-import/{}/".format(report["id"]),
+            Authorization="Bearer {}".format(self.token.token),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["rows_read"], 2)
+
+    def test_import_requires_permission(self):
+        self.token.user.user_permissions.clear()
+        response = Client().post(
+            "/api/v1/member-import/",
+            {"organization": "api-org", "file": SimpleUploadedFile("members.csv", b"username\n")},
+            Authorization="Bearer {}".format(self.token.token),
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_import_requires_agent(self):
+        Organization.objects.create(name="Other Org", slug="other-org", point_of_contact=self.token.user)
+        response = Client().post(
+            "/api/v1/member-import/",
+            {"organization": "other-org", "file": SimpleUploadedFile("members.csv", b"username\nkirk\n")},
+            Authorization="Bearer {}".format(self.token.token),
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("organization", response.json())
+
+        response = Client().post(
+            "/api/v1/member-import/",
+            {"organization": "api-org", "file": SimpleUploadedFile("members.csv", b"username\nkirk\n")},
+            Authorization="Bearer {}".format(self.token.token),
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.organization.users.remove(self.token.user)
+        response = Client().get(
+            "/api/v1/member-import/{}/".format(response.json()["id"]),
+            Authorization="Bearer {}".format(self.token.token),
+        )
+        self.assertEqual(response.status_code, 404)
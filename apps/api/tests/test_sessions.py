@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from apps.accounts.models import UserSession
+from .base import BaseTestCase
+
+User = get_user_model()
+
+
+class SessionTestCase(BaseTestCase):
+
+    def login(self, user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def test_sessions_are_indexed_by_user(self):
+        self.login(self.token.user)
+        self.login(self.token.user)
+        other = User.objects.create_user("other", password="pass")
+        self.login(other)
+        self.assertEqual(UserSession.objects.filter(user=self.token.user).count(), 2)
+        self.assertEqual(UserSession.objects.filter(user=other).count(), 1)
+
+    def test_remote_logout_deletes_only_the_users_sessions(self):
+        browser = self.login(self.token.user)
+        other = User.objects.create_user("other", password="pass")
+        self.login(other)
+        with CaptureQueriesContext(connection) as context:
+            response = Client().get("/api/v1/remote-logout",
+                                    Authorization="Bearer {}".format(self.token.token))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["message"], "%s sessions removed. Remote logout." % (self.token.user))
+        self.assertEqual(response.json()["sessions_removed"], 1)
+        self.assertFalse(UserSession.objects.filter(user=self.token.user).exists())
+        self.assertTrue(UserSession.objects.filter(user=other).exists())
+        deletes = [q for q in context.captured_queries if q["sql"].startswith("DELETE")]
+        self.assertEqual(len(deletes), 1)
+        self.assertNotIn("_auth_user_id", str(browser.session.items()))
+
+    def test_list_sessions(self):
+        self.login(self.token.user)
+        response = Client().get("/api/v1/sessions", Authorization="Bearer {}".format(self.token.token))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["sessions"]), 1)
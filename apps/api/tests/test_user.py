@@ -1,13 +1,18 @@
 from datetime import date
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from oauth2_provider.models import get_application_model, get_access_token_model
-from apps.accounts.models import UserProfile
+from apps.accounts.models import Address, IndividualIdentifier, Organization, UserProfile
+from apps.ial.models import IdentityAssuranceLevelDocumentation
+from apps.oidc.claims import get_claims_provider
 from .base import BaseTestCase
 
 User = get_user_model()
 Application = get_application_model()
 AccessToken = get_access_token_model()
+ClaimsProvider = get_claims_provider()
 
 
 class UserTestCase(BaseTestCase):
@@ -230,3 +235,58 @@ class UserTestCase(BaseTestCase):
                 Authorization="Bearer {}".format(self.token.token),
             )
             self.assertEqual(len(response.json()), 0)
+
+    def create_members(self, organization, start, stop):
+        for i in range(start, stop):
+            user = User.objects.create(first_name='Member', last_name='%d' % (i), username='member%d' % (i))
+            UserProfile.objects.create(user=user, birth_date=date(1970, 1, 1))
+            Address.objects.create(user=user, street_1='%d Main St' % (i), city='Albany', state='NY')
+            IndividualIdentifier.objects.create(user=user, type='PATIENT_ID_FHIR', value='P%d' % (i))
+            IdentityAssuranceLevelDocumentation.objects.create(
+                subject_user=user, evidence='IAL2-GENERIC', evidence_type='id_document')
+            organization.members.add(user)
+
+    def test_list_users_paginated(self):
+        client = Client()
+        point_of_contact = User.objects.create(username='poc')
+        UserProfile.objects.create(user=point_of_contact)
+        organization = Organization.objects.create(name='Example', point_of_contact=point_of_contact)
+        self.create_members(organization, 0, 3)
+
+        response = client.get("/api/v1/user/?page_size=2",
+                              Authorization="Bearer {}".format(self.token.token))
+        self.assertEqual(response.status_code, 200, response.content)
+        page = response.json()
+        self.assertEqual(len(page['results']), 2)
+        seen = [user['preferred_username'] for user in page['results']]
+        while page['next']:
+            page = client.get(page['next'], Authorization="Bearer {}".format(self.token.token)).json()
+            seen.extend(user['preferred_username'] for user in page['results'])
+        self.assertEqual(seen, list(UserProfile.objects.order_by('pk').values_list('user__username', flat=True)))
+
+        # Each row has the claims a single user's claim set has.
+        profile = UserProfile.objects.get(user__username='member1')
+        expected = ClaimsProvider(user=profile.user).get_claims()
+        response = client.get("/api/v1/user/?first_or_last_name=1&page_size=10",
+                              Authorization="Bearer {}".format(self.token.token))
+        claims = response.json()['results'][0]
+        for name in ('sub', 'address', 'document', 'verified_claims', 'member_to_organization'):
+            self.assertEqual(claims[name], expected[name], name)
+        self.assertEqual(claims['member_to_organization'][0]['point_of_contact']['sub'],
+                         point_of_contact.userprofile.subject)
+
+    def test_list_users_queries_per_page(self):
+        client = Client()
+        organization = Organization.objects.create(name='Example')
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get("/api/v1/user/?page_size=100",
+                                      Authorization="Bearer {}".format(self.token.token))
+            self.assertEqual(response.status_code, 200, response.content)
+            return len(response.json()['results']), len(queries)
+
+        self.create_members(organization, 0, 1)
+        rows, queries = count_queries()
+        self.create_members(organization, 1, 7)
+        self.assertEqual(count_queries(), (rows + 6, queries))
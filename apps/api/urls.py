@@ -4,12 +4,16 @@ from .views import (
     UserViewSet,
     IdentifierViewSet,
     AddressViewSet,
-    logout_user
+    MemberImportViewSet,
+    HealthCardIssueView,
+    logout_user,
+    user_sessions,
 
 )
 
 router = routers.SimpleRouter()
 router.register(r'user', UserViewSet)
+router.register(r'member-import', MemberImportViewSet)
 
 owned_by_user_router = routers.NestedSimpleRouter(
     router, r'user', lookup='user')
@@ -17,10 +21,19 @@ owned_by_user_router.register(
     r'id-assurance', IdentifierViewSet, basename='identifier')
 owned_by_user_router.register(r'address', AddressViewSet, basename='address')
 
+# Bulk writes for many users' objects, each item naming its user with "sub".
+bulk_actions = {'post': 'bulk', 'patch': 'bulk'}
+
 v1 = [
     path('', include(router.urls)),
     path('', include(owned_by_user_router.urls)),
+    path('id-assurance/bulk/', IdentifierViewSet.as_view(
+        bulk_actions, **IdentifierViewSet.bulk.kwargs), name="identifier-bulk-all"),
+    path('address/bulk/', AddressViewSet.as_view(
+        bulk_actions, **AddressViewSet.bulk.kwargs), name="address-bulk-all"),
     path('remote-logout', logout_user, name="remote_logout"),
+    path('sessions', user_sessions, name="user_sessions"),
+    path('health-cards/issue', HealthCardIssueView.as_view(), name="health_card_issue"),
 ]
 
 urlpatterns = [
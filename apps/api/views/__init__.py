@@ -1,4 +1,7 @@
 from .user import UserViewSet  # noqa
 from .user import logout_user  # noqa
+from .user import user_sessions  # noqa
 from .identifier import IdentifierViewSet  # noqa
 from .address import AddressViewSet  # noqa
+from .member_import import MemberImportViewSet  # noqa
+from .health_cards import HealthCardIssueView  # noqa
@@ -1,11 +1,13 @@
 from apps.accounts.models import (
     Address,
 )
+from apps.oidc.signals import invalidate_source_snapshots
 
 from rest_framework import serializers, viewsets, permissions
 from oauth2_provider.contrib.rest_framework import authentication
 from django.contrib.auth import get_user_model
 from django.http import Http404
+from .bulk import BulkWriteMixin, get_by_uuid, get_profiles
 User = get_user_model()
 
 # {
@@ -31,9 +33,18 @@ class AddressSerializer(serializers.ModelSerializer):
         write_only_fields = ('user', )
 
 
-class AddressViewSet(viewsets.ModelViewSet):
+class BulkAddressSerializer(AddressSerializer):
+    # The user is found for all the items at once, not per item.
+    sub = serializers.CharField(source='user.userprofile.subject', read_only=True)
+
+    class Meta(AddressSerializer.Meta):
+        fields = ('uuid', 'sub', 'street_address', 'locality', 'region', 'postal_code', 'country', 'formatted', )
+
+
+class AddressViewSet(BulkWriteMixin, viewsets.ModelViewSet):
     lookup_field = 'uuid'
     serializer_class = AddressSerializer
+    bulk_serializer_class = BulkAddressSerializer
     authentication_classes = [authentication.OAuth2Authentication]
     permission_classes = [permissions.DjangoModelPermissions]
 
@@ -41,6 +52,9 @@ class AddressViewSet(viewsets.ModelViewSet):
     queryset = Address.objects.all()
 
     def get_queryset(self):
+        if 'user_subject' not in self.kwargs:
+            # The bulk route, whose items name their subjects.
+            return Address.objects.all()
         return Address.objects.filter(
             user__userprofile__subject=self.kwargs['user_subject']
         ).all()
@@ -56,3 +70,31 @@ class AddressViewSet(viewsets.ModelViewSet):
     def update(self, request, *args, **kwargs):
         kwargs['partial'] = True
         return super().update(request, *args, **kwargs)
+
+    def get_bulk_targets(self, items, partial):
+        if partial:
+            return get_by_uuid(self.get_queryset().select_related('user__userprofile'), items, "address")
+        return get_profiles(self.get_item_subject(item) for item in items)
+
+    def bulk_create_objects(self, valid):
+        addresses = [Address(user=profile.user, **data) for index, profile, data in valid]
+        Address.objects.bulk_create(addresses)
+        # bulk_create does not set the primary keys on every database.
+        pks = dict(Address.objects.filter(uuid__in=[a.uuid for a in addresses]).values_list('uuid', 'pk'))
+        for address in addresses:
+            address.pk = pks[address.uuid]
+        invalidate_source_snapshots(Address, [a.pk for a in addresses])
+        return addresses
+
+    def bulk_update_objects(self, valid):
+        fields = set()
+        addresses = []
+        for index, address, data in valid:
+            for attr, value in data.items():
+                setattr(address, attr, value)
+            fields.update(data)
+            addresses.append(address)
+        if fields:
+            Address.objects.bulk_update(addresses, sorted(fields))
+        invalidate_source_snapshots(Address, [a.pk for a in addresses])
+        return addresses
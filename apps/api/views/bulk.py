@@ -0,0 +1,148 @@
+"""
+Bulk writes for the API viewsets.
+
+A BulkWriteMixin viewset takes many objects at <route>/bulk/: POST creates
+them and PATCH updates them. The body is a JSON array, or JSON lines sent
+as application/x-ndjson. Every item is validated first, the users and
+objects the items name are found with one query each, and the valid items
+are written with bulk_create()/bulk_update() in one transaction. The
+response has a result per item, in order: its HTTP status and its data or
+errors. Invalid items are reported without stopping the valid ones.
+"""
+import json
+import uuid
+from django.conf import settings
+from django.db import transaction
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotFound, ParseError, ValidationError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.response import Response
+from apps.accounts.models import UserProfile
+
+
+class NDJSONParser(BaseParser):
+    """JSON lines, one object per line, parsed into a list."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            return [json.loads(line) for line in stream.read().decode(encoding).splitlines()
+                    if line.strip()]
+        except ValueError as exc:
+            raise ParseError('JSON lines parse error - %s' % (exc))
+
+
+def not_found(name):
+    return NotFound("No %s found." % (name))
+
+
+def get_profiles(subjects):
+    """The profile, with its user, of each of ``subjects``, or NotFound."""
+    subjects = [s if isinstance(s, str) else None for s in subjects]
+    profiles = {p.subject: p for p in UserProfile.objects.select_related('user').filter(
+        subject__in={s for s in subjects if s})}
+    return [profiles.get(s) or not_found("user") for s in subjects]
+
+
+def get_by_uuid(queryset, items, name):
+    """The object of ``queryset`` each item names with its "uuid", or NotFound."""
+    uuids = []
+    for item in items:
+        try:
+            uuids.append(str(uuid.UUID(item.get('uuid'))))
+        except (AttributeError, TypeError, ValueError):
+            uuids.append(None)
+    objects = {str(obj.uuid): obj for obj in queryset.filter(uuid__in={u for u in uuids if u})}
+    return [objects.get(u) or not_found(name) for u in uuids]
+
+
+class BulkWriteMixin(object):
+    """
+    The bulk action. Viewsets implement get_bulk_targets(), which finds what
+    each item creates under or updates, bulk_create_objects() and
+    bulk_update_objects(), and may override check_bulk_items() for checks
+    spanning items, prepare_bulk_items() for work done before the write
+    transaction opens, get_bulk_max_items() and render_bulk() for the data
+    returned.
+    """
+    bulk_serializer_class = None
+
+    def get_bulk_serializer(self, *args, **kwargs):
+        kwargs['context'] = self.get_serializer_context()
+        return self.bulk_serializer_class(*args, **kwargs)
+
+    def get_bulk_max_items(self):
+        return settings.API_BULK_MAX_ITEMS
+
+    def get_bulk_items(self, data):
+        if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+            raise ValidationError("Send a JSON array of objects, or JSON lines.")
+        max_items = self.get_bulk_max_items()
+        if len(data) > max_items:
+            raise ValidationError("Send at most %d objects at a time." % (max_items))
+        return data
+
+    def get_item_subject(self, item):
+        """The subject of the user an item belongs to: the route's, else the item's "sub"."""
+        return self.kwargs.get('user_subject') or item.get('sub')
+
+    def get_bulk_targets(self, items, partial):
+        """
+        For each item, the object it updates (``partial``) or the one it is
+        created under, or an APIException when there is none.
+        """
+        raise NotImplementedError
+
+    def check_bulk_items(self, valid, results):
+        """Checks spanning the ``valid`` (index, target, data); returns those passing."""
+        return valid
+
+    def prepare_bulk_items(self, valid, partial):
+        """The ``valid`` items, after any slow work that needn't hold the write transaction open."""
+        return valid
+
+    def bulk_create_objects(self, valid):
+        raise NotImplementedError
+
+    def bulk_update_objects(self, valid):
+        raise NotImplementedError
+
+    def render_bulk(self, objects):
+        return self.get_bulk_serializer(objects, many=True).data
+
+    @action(detail=False, methods=['post', 'patch'], url_path='bulk',
+            parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request, *args, **kwargs):
+        items = self.get_bulk_items(request.data)
+        partial = request.method == 'PATCH'
+        results = [None] * len(items)
+        valid = []
+        named = set()
+        for index, (item, target) in enumerate(zip(items, self.get_bulk_targets(items, partial))):
+            if isinstance(target, APIException):
+                results[index] = {'status': target.status_code, 'errors': {'detail': target.detail}}
+                continue
+            if partial and target.pk in named:
+                results[index] = {'status': status.HTTP_400_BAD_REQUEST,
+                                  'errors': {'detail': "Updated by an earlier item."}}
+                continue
+            if partial:
+                named.add(target.pk)
+            serializer = self.get_bulk_serializer(target if partial else None, data=item, partial=partial)
+            if not serializer.is_valid():
+                results[index] = {'status': status.HTTP_400_BAD_REQUEST, 'errors': serializer.errors}
+                continue
+            valid.append((index, target, serializer.validated_data))
+        valid = self.prepare_bulk_items(self.check_bulk_items(valid, results), partial)
+        if valid:
+            with transaction.atomic():
+                if partial:
+                    objects = self.bulk_update_objects(valid)
+                else:
+                    objects = self.bulk_create_objects(valid)
+            item_status = status.HTTP_200_OK if partial else status.HTTP_201_CREATED
+            for (index, target, data), rendered in zip(valid, self.render_bulk(objects)):
+                results[index] = {'status': item_status, 'data': rendered}
+        return Response({'results': results})
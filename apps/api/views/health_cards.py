@@ -0,0 +1,56 @@
+from django.conf import settings
+from rest_framework import permissions, serializers
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from oauth2_provider.contrib.rest_framework import authentication
+from apps.healthcards.issuance import issue_cards
+from apps.healthcards.models import SmartHealthJWKS
+
+
+class HealthCardIssuePermissions(permissions.BasePermission):
+
+    def has_permission(self, request, view):
+        return request.user.has_perms(['healthcards.add_smarthealthcard',
+                                       'healthcards.change_smarthealthcard'])
+
+
+class HealthCardRowSerializer(serializers.Serializer):
+    sub = serializers.CharField(max_length=64)
+    payload = serializers.DictField(help_text="The card's FHIR payload.")
+    name = serializers.CharField(max_length=512, required=False, allow_blank=True)
+    description = serializers.CharField(max_length=2048, required=False, allow_blank=True)
+
+
+class HealthCardIssueSerializer(serializers.Serializer):
+    cards = HealthCardRowSerializer(many=True)
+
+    def validate_cards(self, value):
+        if len(value) > settings.SHC_ISSUE_API_MAX_CARDS:
+            raise serializers.ValidationError(
+                "At most %d cards per request." % (settings.SHC_ISSUE_API_MAX_CARDS))
+        if not SmartHealthJWKS.objects.exists():
+            raise serializers.ValidationError("No SMART Health Card signing keys are set up.")
+        return value
+
+
+class HealthCardIssueView(APIView):
+    """
+    Issue or reissue up to SHC_ISSUE_API_MAX_CARDS SMART Health Cards.
+    Unchanged cards are skipped.
+    """
+    authentication_classes = [authentication.OAuth2Authentication]
+    permission_classes = [HealthCardIssuePermissions]
+
+    def post(self, request, format=None):
+        serializer = HealthCardIssueSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # Signed in this worker: a process pool per request would fork the web server.
+        result = issue_cards(serializer.validated_data['cards'], processes=0)
+        return Response({
+            "created": result.created,
+            "updated": result.updated,
+            "unchanged": result.unchanged,
+            "seconds": result.seconds,
+            "cards_per_second": result.cards_per_second,
+            "row_errors": [{"row": row, "error": error} for row, error in result.errors],
+        })
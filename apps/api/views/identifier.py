@@ -1,9 +1,13 @@
+from apps.accounts.models import UserProfile
 from apps.ial.models import IdentityAssuranceLevelDocumentation
+from apps.oidc.signals import invalidate_source_snapshots
 from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers, viewsets, permissions
 from oauth2_provider.contrib.rest_framework import authentication
 from django.contrib.auth import get_user_model
 from django.http import Http404
+from .bulk import BulkWriteMixin, get_by_uuid, get_profiles
 User = get_user_model()
 
 # {
@@ -28,9 +32,18 @@ class IdentifierSerializer(serializers.ModelSerializer):
         read_only_fields = ('verifier_subject', )
 
 
-class IdentifierViewSet(viewsets.ModelViewSet):
+class BulkIdentifierSerializer(IdentifierSerializer):
+    # The subject's user is found for all the items at once, not per item.
+    sub = serializers.CharField(source="subject_user.userprofile.subject", read_only=True)
+
+    class Meta(IdentifierSerializer.Meta):
+        read_only_fields = ('verifier_subject', 'subject_user', 'verifying_user')
+
+
+class IdentifierViewSet(BulkWriteMixin, viewsets.ModelViewSet):
     lookup_field = 'uuid'
     serializer_class = IdentifierSerializer
+    bulk_serializer_class = BulkIdentifierSerializer
     authentication_classes = [authentication.OAuth2Authentication]
     permission_classes = [permissions.DjangoModelPermissions]
 
@@ -38,6 +51,9 @@ class IdentifierViewSet(viewsets.ModelViewSet):
     queryset = IdentityAssuranceLevelDocumentation.objects.all()
 
     def get_queryset(self):
+        if 'user_subject' not in self.kwargs:
+            # The bulk route, whose items name their subjects.
+            return IdentityAssuranceLevelDocumentation.objects.all()
         return IdentityAssuranceLevelDocumentation.objects.filter(
             subject_user__userprofile__subject=self.kwargs['user_subject']
         ).all()
@@ -54,3 +70,48 @@ class IdentifierViewSet(viewsets.ModelViewSet):
     def update(self, request, *args, **kwargs):
         kwargs['partial'] = True
         return super().update(request, *args, **kwargs)
+
+    def get_bulk_targets(self, items, partial):
+        if partial:
+            return get_by_uuid(self.get_queryset().select_related('subject_user__userprofile'),
+                               items, "identity assurance")
+        return get_profiles(self.get_item_subject(item) for item in items)
+
+    def set_descriptions(self, docs):
+        for doc in docs:
+            # As IdentityAssuranceLevelDocumentation.save() does.
+            if not doc.id_verify_description:
+                doc.id_verify_description = doc.short_description
+        return docs
+
+    def bulk_create_objects(self, valid):
+        docs = self.set_descriptions([
+            IdentityAssuranceLevelDocumentation(subject_user=profile.user, verifying_user=self.request.user, **data)
+            for index, profile, data in valid])
+        IdentityAssuranceLevelDocumentation.objects.bulk_create(docs)
+        # bulk_create does not set the primary keys on every database.
+        pks = dict(IdentityAssuranceLevelDocumentation.objects.filter(
+            uuid__in=[doc.uuid for doc in docs]).values_list('uuid', 'pk'))
+        for doc in docs:
+            doc.pk = pks[doc.uuid]
+        self.bulk_objects_saved(docs)
+        return docs
+
+    def bulk_update_objects(self, valid):
+        fields = {'verifying_user', 'id_verify_description', 'updated_at'}
+        docs = []
+        for index, doc, data in valid:
+            for attr, value in data.items():
+                setattr(doc, attr, value)
+            fields.update(data)
+            doc.verifying_user = self.request.user
+            doc.updated_at = timezone.now()
+            docs.append(doc)
+        IdentityAssuranceLevelDocumentation.objects.bulk_update(self.set_descriptions(docs), sorted(fields))
+        self.bulk_objects_saved(docs)
+        return docs
+
+    def bulk_objects_saved(self, docs):
+        # The signals bulk writes don't send keep the IAL and claims current.
+        UserProfile.update_ial({doc.subject_user_id for doc in docs})
+        invalidate_source_snapshots(IdentityAssuranceLevelDocumentation, [doc.pk for doc in docs])
@@ -0,0 +1,56 @@
+from rest_framework import mixins, permissions, serializers, viewsets
+from oauth2_provider.contrib.rest_framework import authentication
+from apps.accounts.member_import import import_members, open_text
+from apps.accounts.models import MemberImport, Organization
+
+
+class MemberImportPermissions(permissions.DjangoModelPermissions):
+    # Import reports list members and their errors.
+    perms_map = dict(permissions.DjangoModelPermissions.perms_map,
+                     GET=['%(app_label)s.view_%(model_name)s'])
+
+
+class AgentOrganizationField(serializers.SlugRelatedField):
+    """An organization the requesting user is an agent of."""
+
+    def get_queryset(self):
+        return Organization.objects.filter(users=self.context['request'].user)
+
+
+class MemberImportSerializer(serializers.ModelSerializer):
+    organization = AgentOrganizationField(slug_field='slug')
+    file = serializers.FileField(write_only=True,
+                                 help_text="A CSV file with a header row, or JSON lines.")
+    format = serializers.ChoiceField(choices=('csv', 'jsonl'), default='csv', write_only=True)
+    rows_per_second = serializers.FloatField(read_only=True)
+    row_errors = serializers.SerializerMethodField()
+
+    class Meta:
+        model = MemberImport
+        fields = ('id', 'organization', 'file', 'format', 'source', 'status', 'rows_read',
+                  'created_count', 'error_count', 'seconds', 'rows_per_second', 'row_errors',
+                  'created_at')
+        read_only_fields = ('source', 'status', 'rows_read', 'created_count', 'error_count',
+                            'seconds', 'created_at')
+
+    def get_row_errors(self, instance):
+        return [{'row': e.row, 'errors': e.errors} for e in instance.errors.all()]
+
+    def create(self, validated_data):
+        upload = validated_data['file']
+        return import_members(validated_data['organization'], open_text(upload.file),
+                              format=validated_data['format'], source=upload.name,
+                              created_by=self.context['request'].user)
+
+
+class MemberImportViewSet(mixins.CreateModelMixin,
+                          mixins.RetrieveModelMixin,
+                          viewsets.GenericViewSet):
+    queryset = MemberImport.objects.all()
+    serializer_class = MemberImportSerializer
+    authentication_classes = [authentication.OAuth2Authentication]
+    permission_classes = [MemberImportPermissions]
+
+    def get_queryset(self):
+        # The imports into the organizations the user is an agent of.
+        return self.queryset.filter(organization__users=self.request.user)
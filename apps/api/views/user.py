@@ -1,20 +1,28 @@
 from django_filters import rest_framework as filters
-from rest_framework import serializers, viewsets, permissions
+from rest_framework import pagination, serializers, viewsets, permissions
 from rest_framework.exceptions import ValidationError
 from oauth2_provider.contrib.rest_framework import authentication
 from django.http import JsonResponse
 import logging
-from django.contrib.sessions.models import Session
 from oauth2_provider.decorators import protected_resource
 from django.views.decorators.http import require_GET
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
 from apps.accounts.models import (
     UserProfile,
     SEX_CHOICES,
 )
+from apps.accounts.member_import import chunked
+from apps.accounts.sessions import delete_user_sessions, get_user_sessions
+from apps.accounts.subject_generator import member_subjects
 from apps.oidc.claims import get_claims_provider
+from apps.oidc.signals import invalidate_source_snapshots
+from apps.reports.counts import users_changed
 from vmi import settings
+from .bulk import BulkWriteMixin, get_profiles
 
 logger = logging.getLogger('verifymyidentity_.%s' % __name__)
 
@@ -38,6 +46,18 @@ class UserFilter(filters.FilterSet):
         fields = ['first_or_last_name']
 
 
+class UserListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        # The claims of API_USER_PAGE_SIZE users at a time, each batch from one
+        # load of the users and the relations the claim providers read.
+        profiles = data.all() if hasattr(data, 'all') else data
+        claims = []
+        for chunk in chunked(profiles, settings.API_USER_PAGE_SIZE):
+            claims.extend(ClaimsProvider.get_claims_of_users([profile.user for profile in chunk]))
+        return claims
+
+
 class UserSerializer(serializers.Serializer):
     preferred_username = serializers.CharField(
         max_length=255, source='user.username')
@@ -117,11 +137,38 @@ class UserSerializer(serializers.Serializer):
         cp = ClaimsProvider(user=instance.user)
         return cp.get_claims()
 
+    class Meta:
+        list_serializer_class = UserListSerializer
+
+
+class BulkUserSerializer(UserSerializer):
+    # Pictures are uploaded one user at a time.
+    picture = None
 
-class UserViewSet(viewsets.ModelViewSet):
+
+class UserPagination(pagination.CursorPagination):
+    """
+    Pages of users for clients that ask for them with ``page_size`` or
+    ``cursor``; otherwise the list is returned whole, as before. The cursor
+    keeps every page as cheap as the first however many users there are.
+    """
+    ordering = 'pk'
+    page_size = settings.API_USER_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_USER_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not {self.cursor_query_param, self.page_size_query_param} & set(request.query_params):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class UserViewSet(BulkWriteMixin, viewsets.ModelViewSet):
     lookup_field = "subject"
-    queryset = UserProfile.objects.all()
+    queryset = UserProfile.objects.select_related('user')
     serializer_class = UserSerializer
+    bulk_serializer_class = BulkUserSerializer
+    pagination_class = UserPagination
     filterset_class = UserFilter
     authentication_classes = [authentication.OAuth2Authentication]
     permission_classes = [permissions.DjangoModelPermissions]
@@ -130,25 +177,128 @@ class UserViewSet(viewsets.ModelViewSet):
         kwargs['partial'] = True
         return super().update(request, *args, **kwargs)
 
+    def get_bulk_targets(self, items, partial):
+        if not partial:
+            return [None] * len(items)
+        return get_profiles(item.get('sub') for item in items)
+
+    def check_bulk_items(self, valid, results):
+        """Reject usernames taken by another user or an earlier item, in one query."""
+        usernames = {index: data['user']['username'].lower().strip()
+                     for index, profile, data in valid if 'username' in data.get('user', {})}
+        owners = dict(User.objects.annotate(value=Lower('username')).filter(
+            value__in=set(usernames.values())).values_list('value', 'pk')) if usernames else {}
+        passed = []
+        for index, profile, data in valid:
+            username = usernames.get(index)
+            # The item's user, or the item itself while the user is not created.
+            owner = profile.user_id if profile is not None else 'item %d' % (index)
+            if username in owners and owners[username] != owner:
+                results[index] = {'status': 400, 'errors': {'preferred_username': [
+                    'Could not create user with that username. Please choose another.']}}
+                continue
+            if username is not None:
+                owners[username] = owner
+            passed.append((index, profile, data))
+        return passed
+
+    def get_bulk_max_items(self):
+        return settings.API_USER_BULK_MAX_ITEMS
+
+    def prepare_bulk_items(self, valid, partial):
+        """Hash the passwords before the write transaction opens, they take the longest."""
+        prepared = []
+        for index, profile, data in valid:
+            user_data = data.get('user', {})
+            # Updates leave the password alone when none is given.
+            if user_data.get('password') or (not partial and 'password' in user_data):
+                data = dict(data, user=dict(user_data, password=make_password(user_data['password'])))
+            prepared.append((index, profile, data))
+        return prepared
+
+    def bulk_create_objects(self, valid):
+        # As UserSerializer.create() does for each user.
+        hostname = settings.HOSTNAME_URL.split('//')[-1].split('/')[0].split(':')[0]
+        subjects = member_subjects.allocate_many(len(valid))
+        users = []
+        for (index, target, data), subject in zip(valid, subjects):
+            user_data = data['user']
+            users.append(User(username=user_data['username'].lower().strip(),
+                              first_name=user_data['first_name'].upper().strip(),
+                              last_name=user_data['last_name'].upper().strip(),
+                              email=(user_data.get('email') or '').lower().strip() or '@'.join([subject, hostname]),
+                              # Hashed by prepare_bulk_items().
+                              password=user_data['password']))
+        User.objects.bulk_create(users)
+        # bulk_create does not set the primary keys on every database.
+        pks = dict(User.objects.filter(username__in=[user.username for user in users]).values_list('username', 'pk'))
+        profiles = []
+        for (index, target, data), subject, user in zip(valid, subjects, users):
+            user.pk = pks[user.username]
+            profile = UserProfile(user=user, subject=subject,
+                                  **{attr: value for attr, value in data.items() if attr != 'user'})
+            # bulk_create skips UserProfile.save, which sets them.
+            profile.set_search_fields()
+            profiles.append(profile)
+        UserProfile.objects.bulk_create(profiles)
+        users_changed([user.pk for user in users])
+        return profiles
+
+    def bulk_update_objects(self, valid):
+        user_fields = set()
+        profile_fields = {'search_first_name', 'search_last_name', 'search_email', 'search_phone', 'updated_at'}
+        profiles = []
+        for index, profile, data in valid:
+            data = dict(data)
+            user_data = dict(data.pop('user', {}))
+            # As UserSerializer.update() does for each user, with the
+            # password hashed by prepare_bulk_items().
+            if user_data.get('password'):
+                profile.user.password = user_data.pop('password')
+                user_fields.add('password')
+            for attr, value in user_data.items():
+                setattr(profile.user, attr, value)
+            user_fields.update(user_data)
+            for attr, value in data.items():
+                setattr(profile, attr, value)
+            profile_fields.update(data)
+            profile.set_search_fields()
+            profile.updated_at = timezone.now()
+            profiles.append(profile)
+        if user_fields:
+            User.objects.bulk_update([profile.user for profile in profiles], sorted(user_fields))
+        UserProfile.objects.bulk_update(profiles, sorted(profile_fields))
+        # The signals bulk writes don't send keep the claim snapshots current.
+        invalidate_source_snapshots(User, [profile.user_id for profile in profiles])
+        invalidate_source_snapshots(UserProfile, [profile.pk for profile in profiles])
+        return profiles
+
+    def render_bulk(self, profiles):
+        return ClaimsProvider.get_claims_of_users([profile.user for profile in profiles])
+
 
 @require_GET
 @protected_resource()
 def logout_user(request):
     # A remote API call for logging out the user
     user = request.resource_owner
-    delete_all_sessions_for_user(user)
+    count = delete_all_sessions_for_user(user)
     data = {"status": "ok",
-            "message": "%s sessions removed. Remote logout." % (user)}
+            "message": "%s sessions removed. Remote logout." % (user),
+            "sessions_removed": count}
     logger.info("%s logged out remotely.", user)
     return JsonResponse(data)
 
 
+@require_GET
+@protected_resource()
+def user_sessions(request):
+    # The active sessions of the user, most recently used first.
+    sessions = get_user_sessions(request.resource_owner).order_by('-updated_at')
+    data = {"sessions": [{"updated_at": s.updated_at.isoformat(),
+                          "expire_date": s.expire_date.isoformat()} for s in sessions]}
+    return JsonResponse(data)
+
+
 def delete_all_sessions_for_user(user):
-    user_sessions = []
-    all_sessions = Session.objects.all()
-    for session in all_sessions:
-        session_data = session.get_decoded()
-        if str(user.pk) == str(session_data.get('_auth_user_id')):
-            user_sessions.append(session.pk)
-    Session.objects.filter(pk__in=user_sessions).delete()
-    return user_sessions
+    return delete_user_sessions(user)
@@ -1,5 +1,4 @@
 from apps.oidc.claims import BaseProvider
-from ..accounts.models import PersonToPersonRelationship
 import logging
 
 
@@ -8,11 +7,13 @@ logger = logging.getLogger('verifymyidentity.%s' % __name__)
 
 class PersonToPersonClaimProvider(BaseProvider):
     # For family relationships between people (members/patients)
+    scope = 'person_to_person'
+    prefetch_related = ('persontoperson_delegate__subject__userprofile', )
 
     def claim_person_to_person(self):
         response = []
         try:
-            p2p = PersonToPersonRelationship.objects.filter(delegate=self.user)
+            p2p = self.user.persontoperson_delegate.all()
             for p in p2p:
                 response.append(p.structured_response())
             return response
@@ -1,12 +1,16 @@
 from apps.oidc.claims import BaseProvider
-from .auth import has_fido_device
 
 
 class AuthenticatorAssuranceProvider(BaseProvider):
+    prefetch_related = ('attestedcredentialdata_set', )
+
+    def has_device(self):
+        # Read through the relation so the prefetched claim context is reused.
+        return bool(self.user.attestedcredentialdata_set.all())
 
     def claim_amr(self):
         try:
-            if has_fido_device(self.user):
+            if self.has_device():
                 return ["pwd", "hwk", ]
         except Exception:
             return None
@@ -18,7 +22,7 @@ class AuthenticatorAssuranceProvider(BaseProvider):
             # that is currently enforced. This may not
             # hold up if changes are made to the authentication
             # flow of the system.
-            if has_fido_device(self.user):
+            if self.has_device():
                 return "2"
         except Exception:
             return None
@@ -33,7 +37,7 @@ class AuthenticatorAssuranceProvider(BaseProvider):
             # that is currently enforced. This may not
             # hold up if changes are made to the authentication
             # flow of the system.
-            if has_fido_device(self.user):
+            if self.has_device():
                 vot = self.claims.get("vot", False)
                 if vot:
                     parts = vot.split(".")
@@ -0,0 +1,199 @@
+"""
+Batch issuance of SMART Health Cards.
+
+A row names the card holder by PSI subject and carries the card's FHIR
+payload. The issuer loads the signing key once, signs and renders the
+QR codes of each batch in a process pool, uploads the content-addressed
+images from a thread pool shared by the process and writes the batch with one bulk insert and
+one bulk update. A row whose payload equals the stored card's is skipped.
+"""
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from libs import qrcodes
+from libs.qrcodes import render_png
+from ..accounts.models import UserProfile
+from ..accounts.member_import import chunked
+from .models import SmartHealthCard, SmartHealthJWKS
+from .signing import init_worker, qr_segments, sign_and_render
+
+logger = logging.getLogger('verifymyidentity_.%s' % __name__)
+
+
+class IssuanceResult(object):
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        # (row number, message)
+        self.errors = []
+        self.seconds = 0.0
+
+    @property
+    def cards_per_second(self):
+        if not self.seconds:
+            return None
+        return round((self.created + self.updated) / self.seconds, 1)
+
+    def __str__(self):
+        return "%d created, %d updated, %d unchanged, %d errors, %s cards/s" % (
+            self.created, self.updated, self.unchanged, len(self.errors), self.cards_per_second)
+
+
+_uploads = None
+_uploads_lock = threading.Lock()
+
+
+def get_upload_executor():
+    """The threads uploading QR code images, started once per process."""
+    global _uploads
+    with _uploads_lock:
+        if _uploads is None:
+            _uploads = ThreadPoolExecutor(max_workers=settings.SHC_ISSUE_UPLOAD_THREADS,
+                                          thread_name_prefix="shc-uploads")
+    return _uploads
+
+
+def stored_payload(card):
+    """The payload ``card`` was issued with, or None when it has none."""
+    try:
+        return json.loads(card.payload)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_row(row):
+    """The subject, card name, description and payload of a row."""
+    payload = row['payload']
+    if isinstance(payload, str):
+        payload = json.loads(payload)
+    if not isinstance(payload, dict):
+        raise ValueError("The payload is not a JSON object.")
+    return str(row['sub']), row.get('name') or '', row.get('description'), payload
+
+
+class CardIssuer(object):
+
+    def __init__(self, processes=None, batch_size=None):
+        self.processes = settings.SHC_ISSUE_PROCESSES if processes is None else processes
+        self.batch_size = batch_size or settings.SHC_ISSUE_BATCH_SIZE
+        jwks = SmartHealthJWKS.get_signing_jwks()
+        self.private_keys = jwks.private_keys
+        self.signing_key = jwks.get_signing_key()
+
+    def issue(self, rows):
+        """Issue the cards of ``rows``. Returns an IssuanceResult."""
+        result = IssuanceResult()
+        start = time.monotonic()
+        uploads = get_upload_executor()
+        pool = None
+        if self.processes:
+            # Spawned, not forked: the workers import no Django models.
+            pool = ProcessPoolExecutor(max_workers=self.processes,
+                                       mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=init_worker, initargs=(self.private_keys,))
+        try:
+            first_row = 1
+            for batch in chunked(rows, self.batch_size):
+                self.issue_batch(batch, first_row, result, pool, uploads)
+                first_row += len(batch)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        result.errors.sort()
+        result.seconds = time.monotonic() - start
+        logger.info("SMART Health Cards: %s", result)
+        return result
+
+    def sign(self, payload_texts, pool):
+        if pool is None:
+            return [sign_and_render(text, self.signing_key) for text in payload_texts]
+        chunksize = max(1, len(payload_texts) // (self.processes * 4))
+        return list(pool.map(sign_and_render, payload_texts, chunksize=chunksize))
+
+    def render(self, segments_list, pool):
+        if pool is None:
+            return [render_png(segments) for segments in segments_list]
+        return list(pool.map(render_png, segments_list))
+
+    def store_psi_qrcodes(self, profiles, pool, uploads):
+        """The PSI QR code image of each user id, rendering the missing ones in the pool."""
+        paths = {user_id: qrcodes.get_path(up.psi_qr_segments) for user_id, up in profiles.items()}
+        stored = dict(zip(paths, uploads.map(default_storage.exists, paths.values())))
+        missing = [user_id for user_id in paths if not stored[user_id]]
+        images = zip([profiles[user_id].psi_qr_segments for user_id in missing],
+                     self.render([profiles[user_id].psi_qr_segments for user_id in missing], pool))
+        for user_id, name in zip(missing, uploads.map(lambda image: qrcodes.store(*image), images)):
+            paths[user_id] = name
+        return paths
+
+    def issue_batch(self, batch, first_row, result, pool, uploads):
+        parsed = {}
+        for number, row in enumerate(batch, first_row):
+            try:
+                parsed[number] = parse_row(row)
+            except (KeyError, TypeError, ValueError) as error:
+                result.errors.append((number, "Invalid row: %s" % (error)))
+        profiles = {up.subject: up for up in UserProfile.objects.filter(
+            subject__in={p[0] for p in parsed.values()}).only('user_id', 'subject')}
+        existing = {}
+        for card in SmartHealthCard.objects.filter(
+                user_id__in=[up.user_id for up in profiles.values()]).order_by('pk'):
+            existing[(card.user_id, card.name or '')] = card
+
+        issue = []
+        seen = set()
+        for number, (sub, name, description, payload) in sorted(parsed.items()):
+            profile = profiles.get(sub)
+            if profile is None:
+                result.errors.append((number, "No member with the subject %s." % (sub)))
+                continue
+            key = (profile.user_id, name)
+            if key in seen:
+                result.errors.append((number, "An earlier row issues this card."))
+                continue
+            seen.add(key)
+            card = existing.get(key)
+            if card is not None and card.shc_jws and stored_payload(card) == payload:
+                result.unchanged += 1
+                continue
+            if card is None:
+                card = SmartHealthCard(user_id=profile.user_id, name=name or None)
+            if description is not None:
+                card.description = description
+            card.payload = json.dumps(payload)
+            issue.append((card, profile))
+        if not issue:
+            return
+
+        signed = self.sign([card.payload for card, profile in issue], pool)
+        names = list(uploads.map(lambda image: qrcodes.store(*image),
+                                 [(qr_segments(jws), png) for jws, png in signed]))
+        psi_names = self.store_psi_qrcodes({profile.user_id: profile for card, profile in issue},
+                                           pool, uploads)
+        now = timezone.now()
+        for (card, profile), (jws, png), name in zip(issue, signed, names):
+            card.shc_jws = jws
+            card.shc_qrcode = name
+            card.qrcode = psi_names[profile.user_id]
+            card.updated = now
+        new = [card for card, profile in issue if card.pk is None]
+        changed = [card for card, profile in issue if card.pk is not None]
+        with transaction.atomic():
+            SmartHealthCard.objects.bulk_create(new)
+            SmartHealthCard.objects.bulk_update(
+                changed, ['payload', 'shc_jws', 'shc_qrcode', 'qrcode', 'description', 'updated'])
+        result.created += len(new)
+        result.updated += len(changed)
+
+
+def issue_cards(rows, **kwargs):
+    return CardIssuer(**kwargs).issue(rows)
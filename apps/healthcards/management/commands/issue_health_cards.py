@@ -0,0 +1,27 @@
+import json
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ...issuance import issue_cards
+
+
+class Command(BaseCommand):
+    help = ('Issue SMART Health Cards from a JSON lines file of '
+            '{"sub": ..., "payload": {...}, "name": ..., "description": ...} rows. '
+            'Rows whose payload is unchanged are skipped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The JSON lines file.')
+        parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                            help='Signing processes. 0 signs in this process.')
+        parser.add_argument('--batch-size', type=int, default=settings.SHC_ISSUE_BATCH_SIZE,
+                            help='Cards written at a time.')
+
+    def handle(self, *args, **options):
+        with open(options['path']) as f:
+            rows = (json.loads(line) for line in f if line.strip())
+            result = issue_cards(rows, processes=options['processes'],
+                                 batch_size=options['batch_size'])
+        for row, error in result.errors:
+            self.stderr.write("Row %d: %s" % (row, error))
+        self.stdout.write("%s in %.2fs." % (result, result.seconds))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from libs import qrcodes
+from apps.accounts.models import UserProfile
+from ...models import SmartHealthCard
+
+
+def missing(field_name):
+    return Q(**{field_name: ''}) | Q(**{field_name + '__isnull': True})
+
+
+class Command(BaseCommand):
+    help = ('Render and store the QR codes not stored yet, e.g. after a restart '
+            'dropped queued renders. Identical QR codes are stored once.')
+
+    def handle(self, *args, **options):
+        count = 0
+        for up in UserProfile.objects.filter(
+                missing('subject_qrcode'), public_safety_profile="PUBLIC").iterator():
+            qrcodes.render('accounts.UserProfile', up.pk, 'subject_qrcode', up.psi_qr_segments)
+            count += 1
+        cards = SmartHealthCard.objects.select_related('user__userprofile').filter(user__isnull=False)
+        for shc in cards.filter(missing('qrcode')).iterator():
+            qrcodes.render('healthcards.SmartHealthCard', shc.pk, 'qrcode', shc.user.userprofile.psi_qr_segments)
+            count += 1
+        for shc in cards.filter(missing('shc_qrcode')).exclude(shc_jws='').iterator():
+            qrcodes.render('healthcards.SmartHealthCard', shc.pk, 'shc_qrcode', shc.shc_qr_segments)
+            count += 1
+        self.stdout.write("Rendered %d QR codes." % (count))
@@ -2,17 +2,13 @@ import logging
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import Group
-from django.conf import settings
 from django.db.models import CASCADE
 import json
 from django.contrib.auth import get_user_model
 from shc.generate_random_jwks import (generate_signing_key, generate_encryption_key, generate_keyset)
-from shc.utils import (encode_to_numeric, SMART_HEALTH_CARD_PREFIX, encode_vc)
-import qrcode
-import uuid
 from django.urls import reverse
-from io import BytesIO
-from django.core.files import File
+from libs import qrcodes
+from .signing import SigningKey, qr_segments, signed_payload
 from ..accounts.models import Organization
 from collections import OrderedDict
 
@@ -67,6 +63,14 @@ class SmartHealthJWKS(models.Model):
     def as_jwks(self):
         return json.loads(self.public_keys)
 
+    @classmethod
+    def get_signing_jwks(cls):
+        """The key set SMART Health Cards are signed with."""
+        return cls.objects.order_by('pk')[0]
+
+    def get_signing_key(self):
+        return SigningKey.from_jwks(self.private_keys)
+
 
 class SmartHealthCard(models.Model):
     user = models.ForeignKey(User, on_delete=CASCADE, blank=True, null=True)
@@ -113,44 +117,37 @@ class SmartHealthCard(models.Model):
                                                                            r['resource']['lotNumber'])
         return result
 
+    @property
+    def shc_qr_segments(self):
+        return qr_segments(self.shc_jws)
+
+    @property
+    def qrcode_url(self):
+        # Served on demand until the stored image is ready.
+        if self.qrcode:
+            return self.qrcode.url
+        return reverse('psi_qrcode', args=[str(self.user.userprofile.sub)])
+
+    @property
+    def shc_qrcode_url(self):
+        if self.shc_qrcode:
+            return self.shc_qrcode.url
+        return reverse('shc_qrcode', args=[self.user.userprofile.sub, qrcodes.get_digest(self.shc_qr_segments)])
+
     def save(self, commit=True, *args,  **kwargs):
-        # Create a URL
-        url = "%s%s" % (settings.HOSTNAME_URL, reverse('shc_psi', args=[str(self.user.userprofile.sub)]))
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=6,
-            border=0)
-        qr.add_data(url)
-        qr.make(fit=True)
-        img = qr.make_image()
-        buffer = BytesIO()
-        img.save(buffer)
-        filename = 'psi-%s-%s.png' % (self.user.userprofile.sub, uuid.uuid4())
-        self.qrcode.save(filename, File(buffer), save=False)
-
-        # If the data is prsent, but the QR code does not exist.
-        if self.payload and not self.shc_qrcode:
-            # print("Generate the SMC!")
-            shc_jwks = SmartHealthJWKS.objects.all()[0]
-            private_keys = json.loads(shc_jwks.private_keys)
-            # print(encode_vc(self.payload, private_keys['keys'][0], shc_jwks.kid))
-            numeric_encoded_payload = encode_to_numeric(
-                encode_vc(json.loads(self.payload), private_keys['keys'][0], private_keys['keys'][0]['kid']))
-
-            # print(numeric_encoded_payload)
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=6,
-                border=0)
-            qr.add_data(SMART_HEALTH_CARD_PREFIX)
-            qr.add_data(numeric_encoded_payload)
-            qr.make(fit=True)
-            img = qr.make_image(fill_color="black", back_color="white")
-            buffer = BytesIO()
-            img.save(buffer)
-            filename = 'shc-%s-%s.png' % (self.user.userprofile.sub, uuid.uuid4())
-            self.shc_qrcode.save(filename, File(buffer), save=False)
+        # Sign the card again only when its payload is not the one signed;
+        # the QR code is rendered from the saved JWS.
+        if self.payload:
+            payload = json.loads(self.payload)
+            if not self.shc_jws or signed_payload(self.shc_jws) != payload:
+                signing_key = SmartHealthJWKS.get_signing_jwks().get_signing_key()
+                self.shc_jws = signing_key.sign(payload)
         if commit:
+            if not kwargs.get('force_insert'):
+                kwargs['update_fields'] = qrcodes.save_fields(
+                    self, ('qrcode', 'shc_qrcode'), kwargs.get('update_fields'))
             super().save(*args, **kwargs)
+            # Unchanged content is neither rendered nor uploaded again.
+            qrcodes.render_later(self, 'qrcode', self.user.userprofile.psi_qr_segments)
+            if self.shc_jws:
+                qrcodes.render_later(self, 'shc_qrcode', self.shc_qr_segments)
@@ -0,0 +1,55 @@
+"""
+Signing and QR rendering of SMART Health Cards, free of Django models so
+the functions can run in the worker processes of a batch issuance.
+"""
+import json
+import zlib
+from jose import jwk, jws as jose_jws
+from jose.exceptions import JOSEError
+from shc.utils import SMART_HEALTH_CARD_PREFIX, encode_to_numeric, encode_vc, inflate
+from libs.qrcodes import render_png
+
+ALGORITHM = 'ES256'
+
+
+class SigningKey(object):
+    """A private signing key, parsed once and used for many cards."""
+
+    def __init__(self, key_dict):
+        self.kid = key_dict['kid']
+        self.key = jwk.construct(key_dict, ALGORITHM)
+
+    @classmethod
+    def from_jwks(cls, private_keys):
+        """The first key of a JWKS, as stored in SmartHealthJWKS.private_keys."""
+        return cls(json.loads(private_keys)['keys'][0])
+
+    def sign(self, payload):
+        return encode_vc(payload, self.key, self.kid)
+
+
+def signed_payload(jws):
+    """The payload ``jws`` was signed over, or None when it cannot be read."""
+    try:
+        return json.loads(inflate(jose_jws.get_unverified_claims(jws)))
+    except (JOSEError, ValueError, zlib.error):
+        return None
+
+
+def qr_segments(jws):
+    """The SMART Health Card QR code: the prefix, then the numeric encoded JWS."""
+    return [SMART_HEALTH_CARD_PREFIX, encode_to_numeric(jws)]
+
+
+_worker_key = None
+
+
+def init_worker(private_keys):
+    global _worker_key
+    _worker_key = SigningKey.from_jwks(private_keys)
+
+
+def sign_and_render(payload_text, key=None):
+    """The JWS of a card's payload and the PNG of its QR code."""
+    jws = (key or _worker_key).sign(json.loads(payload_text))
+    return jws, render_png(qr_segments(jws))
@@ -1,3 +1,239 @@
-from django.test import TestCase # NOQA
+import io
+import json
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from libs import qrcodes
+from ..accounts.models import UserProfile
+from .issuance import issue_cards
+from .models import SmartHealthCard, SmartHealthJWKS
+from .signing import signed_payload
 
-# Create your tests here.
+User = get_user_model()
+
+
+class QRCodeTestCase(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, QR_CODE_RENDER_THREADS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user("fred", "fred@example.com", "pass")
+        self.profile = UserProfile.objects.create(user=self.user, public_safety_profile="PUBLIC")
+        SmartHealthJWKS.objects.create(nickname="test")
+
+    def test_psi_qrcode_is_content_addressed(self):
+        path = qrcodes.get_path(self.profile.psi_qr_segments)
+        self.assertEqual(self.profile.subject_qrcode.name, path)
+        self.assertEqual(UserProfile.objects.get(pk=self.profile.pk).subject_qrcode.name, path)
+        self.assertTrue(default_storage.exists(path))
+        with mock.patch.object(qrcodes, 'render_png') as render_png:
+            self.profile.save()
+            # Another card of the same person holds the same PSI QR code.
+            shc = SmartHealthCard.objects.create(user=self.user)
+        render_png.assert_not_called()
+        self.assertEqual(shc.qrcode.name, path)
+
+    def test_shc_qrcode_is_signed_and_rendered_once(self):
+        shc = SmartHealthCard.objects.create(user=self.user, payload=json.dumps({"vc": {}}))
+        jws = shc.shc_jws
+        self.assertEqual(jws.count('.'), 2)
+        self.assertEqual(shc.shc_qrcode.name, qrcodes.get_path(shc.shc_qr_segments))
+        with mock.patch.object(qrcodes, 'render_png') as render_png:
+            shc.description = "Updated"
+            shc.save()
+        render_png.assert_not_called()
+        self.assertEqual(SmartHealthCard.objects.get(pk=shc.pk).shc_jws, jws)
+
+    def test_changed_payload_is_signed_again(self):
+        shc = SmartHealthCard.objects.create(user=self.user, payload=json.dumps({"vc": {}}))
+        jws = shc.shc_jws
+        shc = SmartHealthCard.objects.get(pk=shc.pk)
+        shc.payload = json.dumps({"vc": {"dose": 2}})
+        shc.save()
+        self.assertNotEqual(shc.shc_jws, jws)
+        self.assertEqual(signed_payload(shc.shc_jws), {"vc": {"dose": 2}})
+        shc.refresh_from_db()
+        self.assertEqual(shc.shc_qrcode.name, qrcodes.get_path(shc.shc_qr_segments))
+
+    def test_psi_qrcode_rendered_when_its_source_changes(self):
+        profile = UserProfile.objects.get(pk=self.profile.pk)
+        with mock.patch.object(qrcodes, 'render_later') as render_later:
+            profile.mobile_phone_number = "+15555555555"
+            profile.save()
+            profile.public_safety_profile = "PRIVATE"
+            profile.save()
+            render_later.assert_not_called()
+            profile.public_safety_profile = "PUBLIC"
+            profile.save()
+        render_later.assert_called_once_with(profile, 'subject_qrcode', profile.psi_qr_segments)
+
+    def test_stale_save_keeps_the_rendered_qrcode(self):
+        shc = SmartHealthCard.objects.create(user=self.user, payload=json.dumps({"vc": {}}))
+        stale = SmartHealthCard.objects.get(pk=shc.pk)
+        SmartHealthCard.objects.filter(pk=shc.pk).update(shc_qrcode=None)
+        stale.shc_qrcode = None
+        qrcodes.render('healthcards.SmartHealthCard', shc.pk, 'shc_qrcode', shc.shc_qr_segments)
+        with mock.patch.object(qrcodes, 'render_later'):
+            stale.description = "Updated"
+            stale.save()
+        shc.refresh_from_db()
+        self.assertEqual(shc.description, "Updated")
+        self.assertEqual(shc.shc_qrcode.name, qrcodes.get_path(shc.shc_qr_segments))
+
+    def test_store_keeps_the_content_addressed_name(self):
+        segments = ["shc:/0123"]
+        path = qrcodes.get_path(segments)
+        self.assertEqual(qrcodes.store(segments), path)
+        # Another process uploaded the image after store() checked for it.
+        exists = default_storage.exists
+        checked = []
+
+        def exists_once_missing(name):
+            checked.append(name)
+            return len(checked) > 1 and exists(name)
+
+        with mock.patch.object(default_storage, 'exists', side_effect=exists_once_missing):
+            self.assertEqual(qrcodes.store(segments), path)
+        self.assertEqual(len([name for name in default_storage.listdir(qrcodes.QR_CODE_DIR)[1]
+                              if name.startswith(qrcodes.get_digest(segments))]), 1)
+
+    @override_settings(QR_CODE_RENDER_THREADS=2)
+    def test_qrcode_served_on_demand_until_stored(self):
+        shc = SmartHealthCard.objects.create(user=self.user, payload=json.dumps({"vc": {}}))
+        # The render waits for the transaction to commit.
+        self.assertFalse(shc.shc_qrcode)
+        self.assertEqual(shc.shc_qrcode_url, "/smart-health-cards/%s/%s/qrcode.png" % (
+            self.profile.subject, qrcodes.get_digest(shc.shc_qr_segments)))
+        response = self.client.get(shc.shc_qrcode_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(response.content, qrcodes.render_png(shc.shc_qr_segments))
+
+        self.assertEqual(shc.qrcode_url, "/smart-health-cards/psi/%s/qrcode.png" % (self.profile.subject))
+        self.assertEqual(self.client.get(shc.qrcode_url).status_code, 200)
+
+        out = io.StringIO()
+        call_command('render_qr_codes', stdout=out)
+        self.assertIn("Rendered 2 QR codes.", out.getvalue())
+        shc.refresh_from_db()
+        self.assertTrue(default_storage.exists(shc.shc_qrcode.name))
+
+    def test_private_qrcode_not_found(self):
+        self.profile.public_safety_profile = "PRIVATE"
+        self.profile.save()
+        self.assertEqual(self.client.get("/smart-health-cards/psi/%s/qrcode.png" % (
+            self.profile.subject)).status_code, 404)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get("/smart-health-cards/psi/%s/qrcode.png" % (
+            self.profile.subject)).status_code, 200)
+
+    @override_settings(QR_CODE_RENDER_THREADS=2)
+    def test_shc_qrcode_needs_its_digest(self):
+        shc = SmartHealthCard.objects.create(user=self.user, payload=json.dumps({"vc": {}}))
+        self.assertEqual(self.client.get(shc.shc_qrcode_url).status_code, 200)
+        self.assertEqual(self.client.get("/smart-health-cards/%s/%s/qrcode.png" % (
+            self.profile.subject, "0" * 64)).status_code, 404)
+        # The card's primary key no longer names it.
+        self.assertNotEqual(self.client.get("/smart-health-cards/%d/qrcode.png" % (shc.pk)).status_code, 200)
+        self.profile.public_safety_profile = "PRIVATE"
+        self.profile.save()
+        self.assertEqual(self.client.get(shc.shc_qrcode_url).status_code, 404)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(shc.shc_qrcode_url).status_code, 200)
+
+
+def card_payload(dose):
+    return {"vc": {"type": ["https://smarthealth.cards#health-card"], "dose": dose}}
+
+
+class IssuanceTestCase(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, QR_CODE_RENDER_THREADS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        SmartHealthJWKS.objects.create(nickname="test")
+        self.profiles = []
+        for i in range(10):
+            user = User.objects.create_user("member%d" % (i), "member%d@example.com" % (i), "pass")
+            self.profiles.append(UserProfile.objects.create(user=user))
+
+    def rows(self, count, dose=1):
+        return [{"sub": up.subject, "payload": card_payload(dose)} for up in self.profiles[:count]]
+
+    def test_issue_and_skip_unchanged(self):
+        result = issue_cards(self.rows(3), processes=0)
+        self.assertEqual((result.created, result.updated, result.unchanged, result.errors), (3, 0, 0, []))
+        card = SmartHealthCard.objects.get(user=self.profiles[0].user)
+        self.assertEqual(json.loads(card.payload), card_payload(1))
+        self.assertEqual(card.shc_qrcode.name, qrcodes.get_path(card.shc_qr_segments))
+        self.assertTrue(default_storage.exists(card.shc_qrcode.name))
+        self.assertEqual(card.qrcode.name, qrcodes.get_path(self.profiles[0].psi_qr_segments))
+
+        with mock.patch('apps.healthcards.issuance.sign_and_render') as sign_and_render:
+            result = issue_cards(self.rows(3), processes=0)
+        sign_and_render.assert_not_called()
+        self.assertEqual((result.created, result.updated, result.unchanged), (0, 0, 3))
+
+        rows = self.rows(2, dose=2)
+        result = issue_cards(rows, processes=0)
+        self.assertEqual((result.created, result.updated, result.unchanged), (0, 2, 0))
+        card.refresh_from_db()
+        self.assertEqual(json.loads(card.payload), card_payload(2))
+        self.assertEqual(SmartHealthCard.objects.count(), 3)
+
+    def test_card_without_payload_is_issued_fresh(self):
+        SmartHealthCard.objects.create(user=self.profiles[0].user, shc_jws="a.b.c")
+        result = issue_cards(self.rows(2), processes=0)
+        self.assertEqual((result.created, result.updated, result.errors), (1, 1, []))
+        card = SmartHealthCard.objects.get(user=self.profiles[0].user)
+        self.assertEqual(json.loads(card.payload), card_payload(1))
+        self.assertNotEqual(card.shc_jws, "a.b.c")
+
+    def test_upload_threads_are_shared(self):
+        with mock.patch('apps.healthcards.issuance.ThreadPoolExecutor', wraps=ThreadPoolExecutor) as executor, \
+                mock.patch('apps.healthcards.issuance._uploads', None):
+            issue_cards(self.rows(1), processes=0)
+            issue_cards(self.rows(2, dose=2), processes=0)
+        self.assertEqual(executor.call_count, 1)
+
+    def test_row_errors(self):
+        rows = self.rows(1) + [
+            {"sub": "nobody", "payload": card_payload(1)},
+            {"sub": self.profiles[1].subject, "payload": "[1, 2]"},
+            {"payload": card_payload(1)},
+            self.rows(1)[0],
+        ]
+        result = issue_cards(rows, processes=0)
+        self.assertEqual(result.created, 1)
+        self.assertEqual([row for row, error in result.errors], [2, 3, 4, 5])
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        with CaptureQueriesContext(connection) as small:
+            issue_cards(self.rows(2), processes=0)
+        SmartHealthCard.objects.all().delete()
+        with CaptureQueriesContext(connection) as large:
+            issue_cards(self.rows(10), processes=0)
+        self.assertEqual(len(small), len(large))
+
+    def test_process_pool_and_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl") as f:
+            f.write("".join(json.dumps(row) + "\n" for row in self.rows(4)))
+            f.flush()
+            out = io.StringIO()
+            call_command('issue_health_cards', f.name, '--processes', '2', stdout=out)
+        self.assertIn("4 created", out.getvalue())
+        for card in SmartHealthCard.objects.all():
+            self.assertTrue(default_storage.exists(card.shc_qrcode.name))
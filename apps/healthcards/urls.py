@@ -1,5 +1,5 @@
 from django.conf.urls import url
-from .views import display_user_index, shc_psi
+from .views import display_user_index, psi_qrcode, shc_psi, shc_qrcode
 
 
 __author__ = "Alan Viars"
@@ -7,7 +7,9 @@ __author__ = "Alan Viars"
 
 urlpatterns = [
 
+    url(r'^psi/(?P<sub>[^/]+)/qrcode.png$', psi_qrcode, name='psi_qrcode'),
     url(r'^psi/(?P<sub>[^/]+)',  shc_psi, name='shc_psi'),
+    url(r'^(?P<sub>[^/]+)/(?P<digest>[0-9a-f]{64})/qrcode.png$', shc_qrcode, name='shc_qrcode'),
 
 
     # Home page
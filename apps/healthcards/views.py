@@ -1,5 +1,5 @@
 from django.shortcuts import render, get_object_or_404, get_list_or_404
-from django.http import HttpResponseNotFound
+from django.http import HttpResponse, HttpResponseNotFound
 from django.contrib.auth import get_user_model
 import logging
 from .models import SmartHealthCard, SmartHealthJWKS
@@ -8,6 +8,8 @@ from django.views.decorators.http import require_GET
 from django.contrib.auth.decorators import login_required
 from ..accounts.models import UserProfile
 from django.conf import settings
+from django.utils.cache import patch_cache_control
+from libs import qrcodes
 # from django.views.decorators.cache import never_cache
 from ratelimit.decorators import ratelimit
 
@@ -43,3 +45,34 @@ def shc_psi(request, sub):
                       context={"smart_health_cards": smart_health_cards,
                                "profile": up})
     return HttpResponseNotFound('Subject %s is not found or it is set to private mode.' % (sub))
+
+
+def qrcode_response(segments):
+    response = HttpResponse(qrcodes.get_png(segments), content_type="image/png")
+    patch_cache_control(response, max_age=settings.QR_CODE_CACHE_SECONDS)
+    return response
+
+
+@require_GET
+def psi_qrcode(request, sub):
+    """The PSI QR code, rendered on demand while its stored image is not ready."""
+    up = get_object_or_404(UserProfile, subject=sub)
+    if up.public_safety_profile == "PUBLIC" or up.user == request.user:
+        return qrcode_response(up.psi_qr_segments)
+    return HttpResponseNotFound('Subject %s is not found or it is set to private mode.' % (sub))
+
+
+@require_GET
+def shc_qrcode(request, sub, digest):
+    """
+    A SMART Health Card QR code, rendered on demand while its stored image is
+    not ready. The card is named by the digest of its QR code, which only
+    those shown the card know, rather than by an enumerable primary key.
+    """
+    up = get_object_or_404(UserProfile.objects.select_related('user'), subject=sub)
+    if up.public_safety_profile == "PUBLIC" or up.user == request.user:
+        for shc in SmartHealthCard.objects.filter(user=up.user).exclude(shc_jws='').only('shc_jws'):
+            segments = shc.shc_qr_segments
+            if qrcodes.get_digest(segments) == digest:
+                return qrcode_response(segments)
+    return HttpResponseNotFound('SMART Health Card is not found.')
@@ -1,5 +1,6 @@
-from django.shortcuts import render, get_object_or_404
+from django.shortcuts import redirect, render, get_object_or_404
 from django.http import Http404
+from django.utils.http import urlencode
 from django.utils.translation import ugettext_lazy as _
 from django.conf import settings
 from django.contrib import messages
@@ -127,26 +128,37 @@ def user_search(request, org_slug=""):
     if not org_slug:
         # TODO User needs global permission to perform this kind of search.
         org = None
+        name = _('Search members')
     else:
         org = get_object_or_404(Organization, slug=org_slug)
-
-    name = _('Search members of %s' % (org.name))
+        name = _('Search members of %s' % (org.name))
     context = {'name': name}
 
+    # The criteria are posted and kept in the session, so names, birth dates
+    # and phone numbers stay out of URLs. The next pages only pass a cursor.
+    session_key = 'user_search:%s' % (org_slug)
+    cursor = None
     if request.method == 'POST':
-        form = UserSearchForm(request.POST)
+        data = request.POST.copy()
+        data.pop('csrfmiddlewaretoken', None)
+        request.session[session_key] = data.dict()
+    elif 'cursor' in request.GET:
+        data = request.session.get(session_key)
+        if data is None:
+            return redirect(request.path)
+        cursor = request.GET['cursor']
+    else:
+        data = None
+    if data:
+        form = UserSearchForm(data)
         if form.is_valid():
-            search_results = form.save()
-            if org_slug:
-                org = get_object_or_404(Organization, slug=org_slug)
-                redacted_results = []
-                all_members = org.members.all()
-                for r in search_results:
-                    if r.user in all_members:
-                        redacted_results.append(r)
-                search_results = redacted_results
-
-            context['search_results'] = search_results
+            try:
+                page = form.save(organization=org, cursor=cursor)
+            except ValueError:
+                raise Http404()
+            if page.has_next:
+                context['next_query'] = urlencode({'cursor': page.next_cursor})
+            context['search_results'] = page
             context['organization'] = org
             return render(request, 'user-search-results.html', context)
 
@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 
 class IalConfig(AppConfig):
-    name = 'ial'
+    name = 'apps.ial'
+
+    def ready(self):
+        from . import signals  # noqa
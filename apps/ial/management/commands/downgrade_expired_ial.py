@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from ...models import IdentityAssuranceLevelDocumentation
+from ....accounts.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = ('Set profiles whose identity evidence has expired back to IAL1. '
+            'Run it daily, from cron or with --interval 86400.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recompute', action='store_true',
+                            help='Recompute the IAL of every user with documentation first.')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Seconds between runs, repeating until stopped. 0 runs once.')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Profiles downgraded per transaction.')
+
+    def handle(self, *args, **options):
+        if options['recompute']:
+            user_ids = IdentityAssuranceLevelDocumentation.objects.values_list(
+                'subject_user_id', flat=True).distinct()
+            UserProfile.update_ial(user_ids)
+        try:
+            while True:
+                count = UserProfile.downgrade_expired_ial(batch_size=options['batch_size'])
+                self.stdout.write("Downgraded %d profiles to IAL1." % (count))
+                if not options['interval']:
+                    break
+                close_old_connections()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
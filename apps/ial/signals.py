@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+
+
+def update_subject_ial(sender, instance, **kwargs):
+    """Keep UserProfile.ial_level in step with the user's documentation."""
+    from ..accounts.models import UserProfile
+    UserProfile.update_ial([instance.subject_user_id])
+
+
+post_save.connect(update_subject_ial, sender='ial.IdentityAssuranceLevelDocumentation')
+post_delete.connect(update_subject_ial, sender='ial.IdentityAssuranceLevelDocumentation')
@@ -1,9 +1,12 @@
+from datetime import date, timedelta
+from unittest import mock
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.test.client import Client
 from django.urls import reverse
 from ..accounts.models import UserProfile
 from django.contrib.auth.models import Permission
+from ..oidc.settings import oidc_settings
 from .models import IdentityAssuranceLevelDocumentation
 
 
@@ -119,3 +122,71 @@ class IALDocumentationDeleteTestCase(TestCase):
         response = self.client.get(self.url, follow=True)
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'removed')
+
+
+class StoredIALTestCase(TestCase):
+    """
+    UserProfile.ial_level follows the documentation and expires.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('ial_user', password='barker')
+        UserProfile.objects.create(user=self.user)
+
+    def get_profile(self):
+        return UserProfile.objects.get(user=self.user)
+
+    def test_level_follows_documentation(self):
+        self.assertEqual(self.get_profile().ial, "1")
+        iald = IdentityAssuranceLevelDocumentation.objects.create(
+            subject_user=self.user, evidence="ONE-SUPERIOR-OR-STRONG-PLUS",
+            expires_at=date.today() + timedelta(days=30))
+        profile = self.get_profile()
+        self.assertEqual(profile.ial_level, 2)
+        self.assertEqual(profile.ial_expires_at, iald.expires_at)
+        self.assertEqual(profile.vot, "P2.C1")
+        self.assertEqual(UserProfile.objects.filter(ial_level=2).count(), 1)
+        iald.delete()
+        self.assertEqual(self.get_profile().ial_level, 1)
+
+    def test_evidence_without_expiry_wins(self):
+        IdentityAssuranceLevelDocumentation.objects.create(
+            subject_user=self.user, evidence="ONE-SUPERIOR-OR-STRONG-PLUS",
+            expires_at=date.today() + timedelta(days=30))
+        IdentityAssuranceLevelDocumentation.objects.create(
+            subject_user=self.user, evidence="ONE-SUPERIOR-OR-STRONG-PLUS")
+        self.assertIsNone(self.get_profile().ial_expires_at)
+
+    def test_profile_created_after_documentation(self):
+        user = get_user_model().objects.create_user('late_profile', password='barker')
+        IdentityAssuranceLevelDocumentation.objects.create(
+            subject_user=user, evidence="ONE-SUPERIOR-OR-STRONG-PLUS")
+        self.assertEqual(UserProfile.objects.create(user=user).ial_level, 2)
+
+    def test_expired_evidence_is_downgraded(self):
+        expires_at = date.today() + timedelta(days=1)
+        IdentityAssuranceLevelDocumentation.objects.create(
+            subject_user=self.user, evidence="ONE-SUPERIOR-OR-STRONG-PLUS", expires_at=expires_at)
+        self.assertEqual(UserProfile.downgrade_expired_ial(), 0)
+        with mock.patch('apps.accounts.models.date') as mock_date:
+            mock_date.today.return_value = expires_at + timedelta(days=1)
+            self.assertEqual(self.get_profile().ial, "1")
+        # One select and one update, in a transaction (here a savepoint), per
+        # batch, and the report counts' refresh of the batch's users: a
+        # savepoint, four selects and the update of their user facts. The
+        # count rows themselves are updated once the transaction commits.
+        with mock.patch.object(oidc_settings, 'OIDC_CLAIM_SNAPSHOTS', False), self.assertNumQueries(11):
+            self.assertEqual(UserProfile.downgrade_expired_ial(expires_at + timedelta(days=1)), 1)
+        profile = self.get_profile()
+        self.assertEqual(profile.ial_level, 1)
+        self.assertIsNone(profile.ial_expires_at)
+
+    def test_expired_evidence_is_downgraded_in_batches(self):
+        expires_at = date.today() + timedelta(days=1)
+        for i in range(3):
+            user = get_user_model().objects.create_user('ial_user_%d' % (i), password='barker')
+            IdentityAssuranceLevelDocumentation.objects.create(
+                subject_user=user, evidence="ONE-SUPERIOR-OR-STRONG-PLUS", expires_at=expires_at)
+            UserProfile.objects.create(user=user)
+        self.assertEqual(UserProfile.downgrade_expired_ial(expires_at + timedelta(days=1), batch_size=2), 3)
+        self.assertFalse(UserProfile.objects.filter(ial_level=2).exists())
@@ -1,11 +1,15 @@
 from apps.oidc.claims import BaseProvider
-from .backend import has_sms_device
 
 # Copyright Videntity Systems Inc.
 __author__ = "Alan Viars"
 
 
 class AuthenticatorAssuranceProvider(BaseProvider):
+    prefetch_related = ('smsdevice_set', )
+
+    def has_device(self):
+        # Read through the relation so the prefetched claim context is reused.
+        return bool(self.user.smsdevice_set.all())
 
     def claim_aal(self):
         try:
@@ -14,7 +18,7 @@ class AuthenticatorAssuranceProvider(BaseProvider):
             # that is currently enforced. This may not
             # hold up if changes are made to the authentication
             # flow of the system.
-            if has_sms_device(self.user):
+            if self.has_device():
                 return "2"
         except Exception:
             return None
@@ -26,7 +30,7 @@ class AuthenticatorAssuranceProvider(BaseProvider):
             # that is currently enforced. This may not
             # hold up if changes are made to the authentication
             # flow of the system.
-            if has_sms_device(self.user):
+            if self.has_device():
                 return ["pwd", "sms", ]
         except Exception:
             return None
@@ -40,7 +44,7 @@ class AuthenticatorAssuranceProvider(BaseProvider):
             # that is currently enforced. This may not
             # hold up if changes are made to the authentication
             # flow of the system.
-            if has_sms_device(self.user):
+            if self.has_device():
                 vot = self.claims.get("vot", False)
                 if vot:
                     parts = vot.split(".")
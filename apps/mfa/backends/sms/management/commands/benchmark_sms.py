@@ -0,0 +1,66 @@
+import time
+import boto3
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from apps.notifications.outbox import queue_many, text_notification
+from apps.notifications.worker import DeliveryWorker
+from ...transports import get_sms_transport, reset_sms_transports
+
+
+def message(i):
+    return "Your code is : %04d" % (i), "+1555555%04d" % (i)
+
+
+def send(count, new_client=False):
+    start = time.perf_counter()
+    for i in range(count):
+        if new_client:
+            # Mimics the old path: a fresh SNS client for every message.
+            boto3.client('sns', region_name=settings.AWS_DEFAULT_REGION)
+        get_sms_transport().send(*message(i))
+    return count / (time.perf_counter() - start)
+
+
+def deliver(count, concurrency):
+    # The outbox as deliver_notifications sends it. The rows are rolled back.
+    with transaction.atomic():
+        queue_many([text_notification(*message(i)) for i in range(count)])
+        worker = DeliveryWorker(concurrency={'email': 1, 'sms': concurrency})
+        start = time.perf_counter()
+        try:
+            worker.deliver_pending()
+        finally:
+            worker.shutdown()
+        seconds = time.perf_counter() - start
+        transaction.set_rollback(True)
+    return count / seconds
+
+
+class Command(BaseCommand):
+    help = ('Measure text message throughput with a client per message, with the '
+            'shared transport, and through the outbox worker. The in-memory transport '
+            'stands in for the provider, waiting --latency seconds per message as a '
+            'network round trip would.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=200)
+        parser.add_argument('--latency', type=float, default=0.05,
+                            help='Seconds per message (SMS_FAKE_LATENCY).')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        concurrency = settings.NOTIFICATION_CHANNEL_CONCURRENCY['sms']
+        reset_sms_transports()
+        try:
+            with override_settings(SMS_STRATEGY="MEMORY", SMS_FAKE_LATENCY=options['latency']):
+                per_message = send(count, new_client=True)
+                shared = send(count)
+                outbox = deliver(count, concurrency)
+        finally:
+            reset_sms_transports()
+        self.stdout.write("%.0f ms per message" % (options['latency'] * 1000))
+        self.stdout.write("Client per message:  %.1f messages/sec" % (per_message))
+        self.stdout.write("Shared client:       %.1f messages/sec" % (shared))
+        self.stdout.write("Outbox, %d threads:   %.1f messages/sec" % (concurrency, outbox))
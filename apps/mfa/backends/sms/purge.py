@@ -0,0 +1,5 @@
+from .models import SMSCode
+
+
+def expired_sms_codes(now):
+    return SMSCode.objects.filter(expires__lt=now)
@@ -0,0 +1,60 @@
+import threading
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from apps.accounts.texts import deliver_text
+from apps.notifications.worker import deliver_pending
+from .models import SMSCode, SMSDevice
+from .transports import (
+    MemoryTransport,
+    SNSTransport,
+    TwilioTransport,
+    get_sms_transport,
+    reset_sms_transports,
+)
+
+UserModel = get_user_model()
+
+
+@override_settings(SMS_STRATEGY="MEMORY")
+class SMSTransportTests(TestCase):
+
+    def setUp(self):
+        reset_sms_transports()
+        self.addCleanup(reset_sms_transports)
+
+    def test_transport_is_shared(self):
+        transport = get_sms_transport()
+        self.assertIsInstance(transport, MemoryTransport)
+        self.assertIs(get_sms_transport(), transport)
+        deliver_text("Hello", "+15555555555")
+        self.assertEqual(transport.sent, [("Hello", "+15555555555")])
+
+    def test_sns_client_is_reused(self):
+        with mock.patch('boto3.client') as client:
+            transport = SNSTransport()
+            transport.send("a", "+15555555551")
+            transport.send("b", "+15555555552")
+        client.assert_called_once()
+        self.assertEqual(client.return_value.publish.call_count, 2)
+
+    def test_twilio_client_per_thread(self):
+        with mock.patch('apps.mfa.backends.sms.transports.Client') as client:
+            transport = TwilioTransport()
+            transport.send("a", "+15555555551")
+            transport.send("b", "+15555555552")
+            self.assertEqual(client.call_count, 1)
+            thread = threading.Thread(target=transport.send, args=("c", "+15555555553"))
+            thread.start()
+            thread.join()
+            self.assertEqual(client.call_count, 2)
+        self.assertEqual(client.return_value.messages.create.call_count, 3)
+
+    def test_sms_code_is_delivered_by_the_outbox(self):
+        user = UserModel.objects.create_user("dev_user", "dev@example.com", "123456")
+        device = SMSDevice.objects.create(user=user, phone_number="+15555555555")
+        code = SMSCode.objects.create(device=device)
+        self.assertEqual(get_sms_transport().sent, [])
+        deliver_pending()
+        self.assertEqual(len(get_sms_transport().sent), 1)
+        self.assertIn(code.code, get_sms_transport().sent[0][0])
@@ -0,0 +1,118 @@
+"""
+Long-lived SMS provider clients, one per settings.SMS_STRATEGY.
+
+Building a boto3 or Twilio client resolves credentials and opens a new TLS
+connection; the transports here are built once per process and keep their
+HTTP connections pooled. They are safe to share between threads: boto3
+clients are thread-safe, and each thread gets its own Twilio client.
+"""
+import logging
+import threading
+import time
+import boto3
+from botocore.config import Config
+from django.conf import settings
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+
+logger = logging.getLogger('verifymyidentity_.%s' % __name__)
+
+
+class SMSTransport(object):
+
+    def send(self, message, number):
+        raise NotImplementedError
+
+
+class SNSTransport(SMSTransport):
+
+    def __init__(self):
+        self.client = boto3.client(
+            'sns', region_name=settings.AWS_DEFAULT_REGION,
+            config=Config(max_pool_connections=settings.SMS_MAX_POOL_CONNECTIONS,
+                          connect_timeout=settings.SMS_TIMEOUT,
+                          read_timeout=settings.SMS_TIMEOUT))
+
+    def send(self, message, number):
+        self.client.publish(
+            PhoneNumber=number,
+            Message=message,
+            MessageAttributes={
+                'AWS.SNS.SMS.SenderID': {
+                    'DataType': 'String',
+                    'StringValue': 'MySenderID'
+                }
+            }
+        )
+        logger.info("Message sent to %s by AWS SNS." % (number))
+
+
+class TwilioTransport(SMSTransport):
+
+    def __init__(self):
+        self.local = threading.local()
+
+    @property
+    def client(self):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            http_client = TwilioHttpClient(pool_connections=True, timeout=settings.SMS_TIMEOUT)
+            client = self.local.client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_TOKEN,
+                                                http_client=http_client)
+        return client
+
+    def send(self, message, number):
+        tmsg = self.client.messages.create(to=number, from_=settings.TWILIO_FROM_NUMBER, body=message)
+        logger.info("Message sent to %s by Twilio. %s" % (number, tmsg.sid))
+
+
+class MemoryTransport(SMSTransport):
+    """
+    Keeps the messages in ``sent`` instead of sending them, after waiting
+    settings.SMS_FAKE_LATENCY seconds, to test and benchmark without a network.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent = []
+
+    def send(self, message, number):
+        if settings.SMS_FAKE_LATENCY:
+            time.sleep(settings.SMS_FAKE_LATENCY)
+        with self.lock:
+            self.sent.append((message, number))
+
+
+class NullTransport(SMSTransport):
+
+    def send(self, message, number):
+        logger.error("Text Message not sent. No SMS_STRATEGY defined.")
+
+
+SMS_TRANSPORTS = {
+    "AWS-SNS": SNSTransport,
+    "TWILIO": TwilioTransport,
+    "MEMORY": MemoryTransport,
+}
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_sms_transport(strategy=None):
+    """The shared transport of ``strategy``, settings.SMS_STRATEGY by default."""
+    if strategy is None:
+        strategy = settings.SMS_STRATEGY
+    transport = _transports.get(strategy)
+    if transport is None:
+        with _transports_lock:
+            transport = _transports.get(strategy)
+            if transport is None:
+                transport = _transports[strategy] = SMS_TRANSPORTS.get(strategy, NullTransport)()
+    return transport
+
+
+def reset_sms_transports():
+    """Drop the shared transports, e.g. after the SMS settings changed."""
+    with _transports_lock:
+        _transports.clear()
@@ -0,0 +1,12 @@
+from django.contrib import admin
+from .models import Notification
+
+
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('channel', 'recipient', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('channel', 'status')
+    search_fields = ['recipient']
+    readonly_fields = ('created_at', 'sent_at')
+
+
+admin.site.register(Notification, NotificationAdmin)
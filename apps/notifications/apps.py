@@ -0,0 +1,6 @@
+from django.apps import AppConfig
+
+
+class NotificationsConfig(AppConfig):
+    name = 'apps.notifications'
+    verbose_name = "Notification Outbox"
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ...worker import DeliveryWorker
+
+
+class Command(BaseCommand):
+    help = ('Send the queued emails and text messages, retrying failed sends '
+            'with backoff.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Send what is due now and exit.')
+        parser.add_argument('--interval', type=float, default=settings.NOTIFICATION_WORKER_INTERVAL or 2,
+                            help='Seconds between polls of an idle outbox.')
+        parser.add_argument('--batch-size', type=int, default=settings.NOTIFICATION_BATCH_SIZE,
+                            help='Notifications claimed at a time.')
+
+    def handle(self, *args, **options):
+        worker = DeliveryWorker(batch_size=options['batch_size'])
+        try:
+            if options['once']:
+                self.stdout.write("Sent %d notifications." % worker.deliver_pending())
+            else:
+                worker.run(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            worker.shutdown()
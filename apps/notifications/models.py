@@ -0,0 +1,44 @@
+import json
+from django.db import models
+from django.utils import timezone
+
+
+class Notification(models.Model):
+    """
+    An email or text message waiting in the outbox. It is written in the
+    transaction of the change it announces and sent by the delivery worker
+    (manage.py deliver_notifications) once that transaction commits.
+    """
+    EMAIL = 'email'
+    SMS = 'sms'
+    CHANNEL_CHOICES = ((EMAIL, 'Email'),
+                       (SMS, 'Text Message (SMS)'))
+
+    PENDING = 'PENDING'
+    SENT = 'SENT'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = ((PENDING, 'Pending'),
+                      (SENT, 'Sent'),
+                      (FAILED, 'Failed'))
+
+    channel = models.CharField(max_length=16, choices=CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=255, blank=True, default='')
+    # The JSON encoded message, as built by apps.notifications.outbox.
+    payload = models.TextField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Set while a worker is sending it; a crashed worker's claim runs out.
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return "%s to %s (%s)" % (self.channel, self.recipient, self.status)
+
+    def get_payload(self):
+        return json.loads(self.payload)
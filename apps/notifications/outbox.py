@@ -0,0 +1,55 @@
+"""
+Queue emails and text messages instead of sending them in the request.
+
+The notifications are rows of the current transaction: they are only seen
+by the delivery worker if the change they announce commits, and they are
+not lost when the mail or SMS provider is down.
+"""
+import json
+from .models import Notification
+
+
+def email_payload(message):
+    """The payload of a Django EmailMessage or EmailMultiAlternatives."""
+    return {
+        "subject": message.subject,
+        "body": message.body,
+        "from_email": message.from_email,
+        "to": list(message.to),
+        "cc": list(message.cc),
+        "bcc": list(message.bcc),
+        "reply_to": list(message.reply_to),
+        "alternatives": [list(a) for a in getattr(message, 'alternatives', ())],
+    }
+
+
+def text_payload(message, number):
+    return {"message": message, "number": str(number)}
+
+
+def email_notification(message):
+    return Notification(channel=Notification.EMAIL, recipient=", ".join(message.to)[:255],
+                        payload=json.dumps(email_payload(message)))
+
+
+def text_notification(message, number):
+    return Notification(channel=Notification.SMS, recipient=str(number),
+                        payload=json.dumps(text_payload(message, number)))
+
+
+def queue_email(message):
+    """Queue an EmailMessage in place of ``message.send()``."""
+    notification = email_notification(message)
+    notification.save()
+    return notification
+
+
+def queue_text(message, number):
+    notification = text_notification(message, number)
+    notification.save()
+    return notification
+
+
+def queue_many(notifications):
+    """Queue unsaved email_notification() and text_notification() rows at once."""
+    return Notification.objects.bulk_create(notifications)
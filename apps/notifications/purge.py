@@ -0,0 +1,11 @@
+from datetime import timedelta
+from django.conf import settings
+from .models import Notification
+
+
+def delivered_notifications(now):
+    # Sent and given up notifications, kept a while for inspection.
+    days = settings.NOTIFICATION_RETENTION_DAYS
+    return Notification.objects.filter(
+        status__in=(Notification.SENT, Notification.FAILED),
+        created_at__lt=now - timedelta(days=days))
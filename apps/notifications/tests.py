@@ -0,0 +1,131 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from apps.accounts.models import ActivationKey, PhoneVerifyCode, UserProfile
+from . import transports
+from .models import Notification
+from .outbox import queue_text
+from .worker import DeliveryWorker, deliver_pending, retry_delay
+
+User = get_user_model()
+
+LOOPBACK = {
+    'email': 'apps.notifications.transports.EmailTransport',
+    'sms': 'apps.notifications.transports.LoopbackTransport',
+}
+
+
+class FailingTransport(transports.Transport):
+
+    def send(self, payload):
+        raise IOError("provider unavailable")
+
+
+class SlowTransport(transports.Transport):
+    """Records the most sends in flight at once."""
+    lock = threading.Lock()
+    in_flight = 0
+    most_in_flight = 0
+
+    def send(self, payload):
+        cls = SlowTransport
+        with cls.lock:
+            cls.in_flight += 1
+            cls.most_in_flight = max(cls.most_in_flight, cls.in_flight)
+        time.sleep(0.02)
+        with cls.lock:
+            cls.in_flight -= 1
+
+
+@override_settings(NOTIFICATION_TRANSPORTS=LOOPBACK)
+class OutboxTestCase(TestCase):
+
+    def setUp(self):
+        transports.outbox.clear()
+        self.user = User.objects.create_user("fred", "fred@example.com", "pass")
+        UserProfile.objects.create(user=self.user, mobile_phone_number="+15555555555")
+
+    def test_activation_email_is_queued_and_delivered(self):
+        ActivationKey.objects.create(user=self.user)
+        self.assertEqual(len(mail.outbox), 0)
+        notification = Notification.objects.get()
+        self.assertEqual((notification.channel, notification.recipient), ("email", "fred@example.com"))
+        self.assertEqual(deliver_pending(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], "text/html")
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), (Notification.SENT, 1))
+        self.assertEqual(deliver_pending(), 0)
+
+    def test_text_is_queued_and_delivered(self):
+        code = PhoneVerifyCode.objects.create(user=self.user)
+        deliver_pending()
+        self.assertEqual(transports.outbox, [
+            ("sms", {"message": "Your verification code for %s is : %s" % (
+                settings.ORGANIZATION_NAME, code.code), "number": "+15555555555"})])
+
+    def test_rolled_back_changes_queue_nothing(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                ActivationKey.objects.create(user=self.user)
+                raise RuntimeError()
+        self.assertFalse(Notification.objects.exists())
+
+    @override_settings(NOTIFICATION_TRANSPORTS=dict(LOOPBACK, sms='apps.notifications.tests.FailingTransport'),
+                       NOTIFICATION_MAX_ATTEMPTS=2, NOTIFICATION_RETRY_DELAY=30)
+    def test_failed_sends_are_retried_with_backoff(self):
+        notification = queue_text("Hello", "+15555555555")
+        before = timezone.now()
+        self.assertEqual(deliver_pending(), 0)
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), (Notification.PENDING, 1))
+        self.assertIn("provider unavailable", notification.last_error)
+        self.assertGreaterEqual(notification.next_attempt_at, before + timedelta(seconds=30))
+        # Not due yet.
+        self.assertEqual(DeliveryWorker().deliver_batch().claimed, 0)
+
+        Notification.objects.update(next_attempt_at=timezone.now())
+        result = DeliveryWorker().deliver_batch()
+        self.assertEqual((result.claimed, result.failed), (1, 1))
+        self.assertEqual(Notification.objects.get().status, Notification.FAILED)
+
+    @override_settings(NOTIFICATION_RETRY_DELAY=30, NOTIFICATION_RETRY_MAX_DELAY=100)
+    def test_retry_delay(self):
+        self.assertEqual([retry_delay(n) for n in (1, 2, 3, 4)], [30, 60, 100, 100])
+
+    def test_claimed_notifications_are_skipped(self):
+        queue_text("Hello", "+15555555555")
+        Notification.objects.update(locked_until=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(deliver_pending(), 0)
+        Notification.objects.update(locked_until=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(deliver_pending(), 1)
+
+    @override_settings(NOTIFICATION_TRANSPORTS=dict(LOOPBACK, sms='apps.notifications.tests.SlowTransport'))
+    def test_channel_concurrency_limit(self):
+        for i in range(8):
+            queue_text("Hello %d" % (i), "+1555555555%d" % (i))
+        SlowTransport.most_in_flight = 0
+        self.assertEqual(deliver_pending(concurrency={'sms': 2}), 8)
+        self.assertEqual(SlowTransport.most_in_flight, 2)
+
+    def test_file_transport(self):
+        with tempfile.TemporaryDirectory() as path:
+            with override_settings(NOTIFICATION_FILE_PATH=path,
+                                   NOTIFICATION_TRANSPORTS=dict(
+                                       LOOPBACK, sms='apps.notifications.transports.FileTransport')):
+                queue_text("Hello", "+15555555555")
+                call_command('deliver_notifications', '--once', stdout=io.StringIO())
+                with open(os.path.join(path, "sms.jsonl")) as f:
+                    self.assertEqual([json.loads(line) for line in f],
+                                     [{"message": "Hello", "number": "+15555555555"}])
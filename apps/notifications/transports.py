@@ -0,0 +1,78 @@
+"""
+Transports deliver one queued notification payload. They run in the delivery
+worker's threads and must not touch the database.
+
+settings.NOTIFICATION_TRANSPORTS maps each channel to the dotted path of
+its transport class. FileTransport and LoopbackTransport stand in for the
+mail and SMS providers in development and tests.
+"""
+import json
+import os
+import threading
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.utils.module_loading import import_string
+from apps.accounts.texts import deliver_text
+
+
+class Transport(object):
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    def send(self, payload):
+        raise NotImplementedError
+
+
+class EmailTransport(Transport):
+    """Sends through settings.EMAIL_BACKEND."""
+
+    def send(self, payload):
+        message = EmailMultiAlternatives(
+            subject=payload["subject"], body=payload["body"],
+            from_email=payload["from_email"], to=payload["to"],
+            cc=payload.get("cc"), bcc=payload.get("bcc"),
+            reply_to=payload.get("reply_to"))
+        for content, mimetype in payload.get("alternatives", ()):
+            message.attach_alternative(content, mimetype)
+        message.send()
+
+
+class SMSTransport(Transport):
+    """Sends through settings.SMS_STRATEGY."""
+
+    def send(self, payload):
+        deliver_text(payload["message"], payload["number"])
+
+
+class FileTransport(Transport):
+    """Appends each payload as a JSON line to NOTIFICATION_FILE_PATH/<channel>.jsonl."""
+
+    _lock = threading.Lock()
+
+    def __init__(self, channel):
+        super().__init__(channel)
+        self.path = os.path.join(settings.NOTIFICATION_FILE_PATH, "%s.jsonl" % channel)
+
+    def send(self, payload):
+        line = json.dumps(payload, sort_keys=True) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(line)
+
+
+# (channel, payload) of every notification sent by a LoopbackTransport,
+# in the order sent, like django.core.mail.outbox.
+outbox = []
+
+
+class LoopbackTransport(Transport):
+    """Keeps the payloads in ``outbox``."""
+
+    def send(self, payload):
+        outbox.append((self.channel, payload))
+
+
+def get_transport(channel):
+    return import_string(settings.NOTIFICATION_TRANSPORTS[channel])(channel)
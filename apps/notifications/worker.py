@@ -0,0 +1,185 @@
+"""
+Delivers the outbox.
+
+The worker claims a batch of due notifications, sends them from one thread
+pool per channel (settings.NOTIFICATION_CHANNEL_CONCURRENCY caps the
+connections held to each provider) and records the outcomes. A failed send
+is retried with exponential backoff up to NOTIFICATION_MAX_ATTEMPTS times.
+Only the calling thread touches the database.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Notification
+from .transports import get_transport
+
+logger = logging.getLogger('verifymyidentity_.%s' % __name__)
+
+
+class DeliveryResult(object):
+
+    def __init__(self, claimed=0, sent=0, retried=0, failed=0, seconds=0.0):
+        self.claimed = claimed
+        self.sent = sent
+        self.retried = retried
+        self.failed = failed
+        self.seconds = seconds
+
+    def __str__(self):
+        return "%d sent, %d to retry, %d failed, %.2fs" % (
+            self.sent, self.retried, self.failed, self.seconds)
+
+
+def retry_delay(attempts):
+    """Seconds before the next attempt: doubled after each failed attempt."""
+    delay = settings.NOTIFICATION_RETRY_DELAY * 2 ** max(attempts - 1, 0)
+    return min(delay, settings.NOTIFICATION_RETRY_MAX_DELAY)
+
+
+class DeliveryWorker(object):
+
+    def __init__(self, batch_size=None, concurrency=None):
+        self.batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+        concurrency = dict(settings.NOTIFICATION_CHANNEL_CONCURRENCY, **(concurrency or {}))
+        self.transports = {channel: get_transport(channel) for channel in concurrency}
+        self.executors = {
+            channel: ThreadPoolExecutor(max_workers=limit,
+                                        thread_name_prefix="notifications-%s" % channel)
+            for channel, limit in concurrency.items()}
+
+    def claim(self, now):
+        """
+        Lease up to ``batch_size`` due notifications to this worker. Rows
+        leased by another worker are skipped, not waited for.
+        """
+        lease = timedelta(seconds=settings.NOTIFICATION_LEASE_SECONDS)
+        with transaction.atomic():
+            pks = list(Notification.objects.select_for_update(skip_locked=True).filter(
+                Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+                status=Notification.PENDING,
+                channel__in=list(self.executors),
+                next_attempt_at__lte=now,
+            ).order_by('next_attempt_at', 'pk').values_list('pk', flat=True)[:self.batch_size])
+            Notification.objects.filter(pk__in=pks).update(
+                locked_until=now + lease, attempts=F('attempts') + 1)
+        return list(Notification.objects.filter(pk__in=pks).order_by('pk'))
+
+    def send(self, notification):
+        self.transports[notification.channel].send(notification.get_payload())
+
+    def deliver_batch(self):
+        """Send one claimed batch. Returns a DeliveryResult."""
+        start = time.monotonic()
+        notifications = self.claim(timezone.now())
+        futures = [(n, self.executors[n.channel].submit(self.send, n)) for n in notifications]
+        sent = []
+        errors = []
+        for notification, future in futures:
+            try:
+                future.result()
+            except Exception as error:
+                logger.warning("Sending %s failed: %r", notification, error)
+                errors.append((notification, error))
+            else:
+                sent.append(notification)
+        result = self.record(sent, errors, timezone.now())
+        result.claimed = len(notifications)
+        result.seconds = time.monotonic() - start
+        if notifications:
+            logger.info("Notifications: %s", result)
+        return result
+
+    def record(self, sent, errors, now):
+        Notification.objects.filter(pk__in=[n.pk for n in sent]).update(
+            status=Notification.SENT, sent_at=now, locked_until=None, last_error='')
+        result = DeliveryResult(sent=len(sent))
+        for notification, error in errors:
+            if notification.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                changes = {'status': Notification.FAILED}
+                result.failed += 1
+            else:
+                changes = {'next_attempt_at': now + timedelta(seconds=retry_delay(notification.attempts))}
+                result.retried += 1
+            Notification.objects.filter(pk=notification.pk).update(
+                locked_until=None, last_error=repr(error), **changes)
+        return result
+
+    def deliver_pending(self):
+        """Send every notification due now. Returns the number sent."""
+        sent = 0
+        while True:
+            result = self.deliver_batch()
+            sent += result.sent
+            if result.claimed < self.batch_size:
+                return sent
+
+    def run(self, interval, stopped=None):
+        """Deliver until ``stopped`` is set, polling every ``interval`` seconds when idle."""
+        stopped = stopped or threading.Event()
+        while not stopped.is_set():
+            try:
+                busy = self.deliver_batch().claimed == self.batch_size
+            except Exception:
+                logger.exception("Notification delivery failed")
+                busy = False
+            finally:
+                close_old_connections()
+            if not busy:
+                stopped.wait(interval)
+
+    def shutdown(self):
+        for executor in self.executors.values():
+            executor.shutdown()
+
+
+def deliver_pending(**kwargs):
+    worker = DeliveryWorker(**kwargs)
+    try:
+        return worker.deliver_pending()
+    finally:
+        worker.shutdown()
+
+
+class DeliveryThread(threading.Thread):
+    """Runs a DeliveryWorker in a daemon thread of a web process."""
+
+    daemon = True
+
+    def __init__(self, interval):
+        super().__init__(name="notification-delivery")
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        worker = DeliveryWorker()
+        try:
+            worker.run(self.interval, self.stopped)
+        finally:
+            worker.shutdown()
+
+    def stop(self):
+        self.stopped.set()
+
+
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def start_delivery_thread(interval=None):
+    """Start the in-process worker once, if NOTIFICATION_WORKER_INTERVAL is set."""
+    global _thread
+    if interval is None:
+        interval = settings.NOTIFICATION_WORKER_INTERVAL
+    if not interval:
+        return None
+    with _thread_lock:
+        if _thread is None:
+            _thread = DeliveryThread(interval)
+            _thread.start()
+    return _thread
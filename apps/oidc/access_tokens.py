@@ -0,0 +1,194 @@
+"""
+Opt-in JWT access tokens (``OIDC_JWT_ACCESS_TOKENS``).
+
+The token endpoint signs the access token with the OIDC key ring and saves
+the usual AccessToken row with the JWT's ``jti`` as its token, so refresh,
+revocation, the authorized tokens list and the purge keep working. Resource
+requests validate the signature, expiry and revocation list locally and
+only touch the database when the user or client is actually read.
+"""
+import datetime
+import threading
+import time
+import jwt
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from oauthlib.common import generate_token
+from oauth2_provider.models import get_application_model
+from .jwt import get_jwt_builder
+from .models import RevokedAccessToken
+from .settings import oidc_settings
+
+JWTBuilder = get_jwt_builder()
+# RFC 9068 token type, so an id_token is never accepted as an access token.
+ACCESS_TOKEN_TYPE = "at+jwt"
+
+
+def jwt_access_tokens_enabled():
+    return oidc_settings.OIDC_JWT_ACCESS_TOKENS
+
+
+def is_jwt(token):
+    return bool(token) and token.count('.') == 2 and token.startswith('eyJ')
+
+
+def get_token_subject(user):
+    """
+    The ``sub`` of ``user``'s access tokens, as in their id_token: the
+    profile's subject, or the primary key of users without a profile.
+    """
+    if user is None:
+        return None
+    try:
+        return user.userprofile.subject
+    except ObjectDoesNotExist:
+        return str(user.pk)
+
+
+def encode_access_token(jti, subject, client_id, scope, expires):
+    claims = {
+        "iss": oidc_settings.OIDC_ISSUER,
+        "jti": jti,
+        "client_id": client_id,
+        "scope": scope,
+        "iat": int(time.time()),
+        "exp": int(expires.timestamp()),
+    }
+    if subject is not None:
+        claims["sub"] = subject
+    return JWTBuilder().encode(claims, headers={"typ": ACCESS_TOKEN_TYPE})
+
+
+def generate_access_token(request):
+    """Token generator for the oauthlib BearerToken."""
+    user = getattr(request, 'user', None)
+    expires = timezone.now() + datetime.timedelta(seconds=request.expires_in)
+    return encode_access_token(
+        generate_token(),
+        get_token_subject(user if getattr(user, 'pk', None) is not None else None),
+        request.client.client_id,
+        " ".join(request.scopes or ()),
+        expires)
+
+
+def reencode_access_token(access_token):
+    """The JWT of a saved AccessToken, e.g. when it is reused."""
+    return encode_access_token(
+        access_token.token,
+        get_token_subject(access_token.user),
+        access_token.application.client_id,
+        access_token.scope,
+        access_token.expires)
+
+
+def get_token_id(token):
+    """
+    The value stored in AccessToken.token: the jti of a valid JWT access
+    token, else the token itself, which matches no row when it is a JWT.
+    """
+    if not is_jwt(token):
+        return token
+    claims = decode_access_token(token)
+    if claims is None:
+        return token
+    return claims.get('jti', token)
+
+
+def decode_access_token(token):
+    """The claims of a valid, unrevoked JWT access token, or None."""
+    try:
+        if jwt.get_unverified_header(token).get('typ') != ACCESS_TOKEN_TYPE:
+            return None
+        claims = JWTBuilder().decode(token, issuer=oidc_settings.OIDC_ISSUER)
+    except jwt.InvalidTokenError:
+        return None
+    if revocation_list.is_revoked(claims.get('jti')):
+        return None
+    return claims
+
+
+class RevocationList(object):
+    """
+    The jti of every revoked, unexpired JWT access token, reloaded from the
+    database at most every ``OIDC_REVOCATION_LIST_CHECK_INTERVAL`` seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked = frozenset()
+        self._loaded_at = None
+
+    def is_revoked(self, jti):
+        self.refresh()
+        return jti in self._revoked
+
+    def refresh(self):
+        interval = oidc_settings.OIDC_REVOCATION_LIST_CHECK_INTERVAL
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < interval:
+            return
+        with self._lock:
+            self._revoked = frozenset(RevokedAccessToken.objects.filter(
+                expires__gt=timezone.now()).values_list('jti', flat=True))
+            self._loaded_at = time.monotonic()
+
+    def revoke(self, jti, expires):
+        RevokedAccessToken.objects.update_or_create(jti=jti, defaults={'expires': expires})
+        with self._lock:
+            self._revoked = self._revoked | {jti}
+
+    def reload(self):
+        with self._lock:
+            self._loaded_at = None
+
+
+revocation_list = RevocationList()
+
+
+def access_token_deleted(sender, instance, **kwargs):
+    """
+    AccessToken.revoke() and refresh token rotation delete the row, so the
+    JWT it was issued as is revoked until it expires.
+    """
+    if jwt_access_tokens_enabled() and instance.expires > timezone.now():
+        revocation_list.revoke(instance.token, instance.expires)
+
+
+class JWTAccessToken(object):
+    """A validated JWT access token, standing in for the AccessToken row."""
+
+    def __init__(self, token, claims):
+        self.token = token
+        self.claims = claims
+        self.jti = claims.get('jti')
+        self.scope = claims.get('scope', "")
+        self.expires = datetime.datetime.fromtimestamp(claims['exp'], tz=datetime.timezone.utc)
+        self.user = SimpleLazyObject(self.get_user) if 'sub' in claims else None
+        self.application = SimpleLazyObject(self.get_application)
+
+    def get_user(self):
+        # See get_token_subject().
+        sub = self.claims['sub']
+        lookup = Q(userprofile__subject=sub)
+        if sub.isdigit():
+            lookup |= Q(pk=sub, userprofile=None)
+        return get_user_model().objects.get(lookup)
+
+    def get_application(self):
+        return get_application_model().objects.get(client_id=self.claims['client_id'])
+
+    def is_expired(self):
+        return timezone.now() >= self.expires
+
+    def allow_scopes(self, scopes):
+        if not scopes:
+            return True
+        return set(scopes).issubset(set(self.scope.split()))
+
+    def is_valid(self, scopes=None):
+        return not self.is_expired() and self.allow_scopes(scopes)
+
+    def revoke(self):
+        revocation_list.revoke(self.jti, self.expires)
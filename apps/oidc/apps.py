@@ -0,0 +1,21 @@
+from django.apps import AppConfig
+
+
+class OIDCConfig(AppConfig):
+    name = 'apps.oidc'
+    verbose_name = "OpenID Connect"
+
+    def ready(self):
+        from .claims import get_claim_registry
+        from .settings import oidc_settings
+        # Compile the claim providers before the first request needs them.
+        get_claim_registry()
+        if oidc_settings.OIDC_CLAIM_SNAPSHOTS:
+            from .signals import connect_claim_snapshot_signals
+            connect_claim_snapshot_signals()
+        from django.db.models.signals import post_delete
+        from oauth2_provider.models import get_access_token_model
+        from .access_tokens import access_token_deleted
+        # Revoking the row revokes the JWT access token issued for it.
+        post_delete.connect(access_token_deleted, sender=get_access_token_model(),
+                            dispatch_uid='oidc_access_token_deleted')
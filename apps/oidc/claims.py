@@ -1,4 +1,8 @@
+import json
 import time
+from collections import OrderedDict
+from django.contrib.auth import get_user_model
+from .models import ClaimSnapshot
 from .settings import oidc_settings
 
 
@@ -10,64 +14,304 @@ def get_claim_providers():
     return oidc_settings.OIDC_CLAIM_PROVIDERS
 
 
+def get_requested_claims(claims, member):
+    """
+    The claim names asked for in the ``member`` ("id_token" or "userinfo")
+    of an OIDC ``claims`` request parameter, or None when it asks for none.
+    """
+    if not claims:
+        return None
+    if not isinstance(claims, dict):
+        try:
+            claims = json.loads(claims)
+        except ValueError:
+            return None
+    if not isinstance(claims, dict) or not isinstance(claims.get(member), dict):
+        return None
+    return list(claims[member])
+
+
+class ClaimContext(object):
+    """
+    Everything the claim providers read about one user, loaded up front.
+
+    Providers declare the relations they read in ``select_related`` and
+    ``prefetch_related``. The user is re-fetched once with all of them, so a
+    full claim set costs a fixed number of queries however many addresses,
+    identifiers or documents the user has. A user already loaded by
+    load_users() is used as it is.
+    """
+
+    def __init__(self, user=None, token=None, request=None, providers=(), loaded=False):
+        self.token = token
+        self.request = request
+        self.user = user if loaded else self.load_user(user, providers)
+
+    @classmethod
+    def get_queryset(cls, providers):
+        select_related = set()
+        prefetch_related = set()
+        for p in providers:
+            select_related.update(p.select_related)
+            prefetch_related.update(p.prefetch_related)
+        return get_user_model().objects.select_related(
+            *sorted(select_related)).prefetch_related(*sorted(prefetch_related))
+
+    @classmethod
+    def load_user(cls, user, providers):
+        if getattr(user, 'pk', None) is None:
+            return user
+        try:
+            return cls.get_queryset(providers).get(pk=user.pk)
+        except get_user_model().DoesNotExist:
+            return user
+
+    @classmethod
+    def load_users(cls, users, providers):
+        """
+        ``users`` re-fetched together, in the same order, so each relation
+        the providers read costs one query for all of them.
+        """
+        loaded = cls.get_queryset(providers).in_bulk(
+            [u.pk for u in users if getattr(u, 'pk', None) is not None])
+        return [loaded.get(getattr(u, 'pk', None), u) for u in users]
+
+
+class ClaimRegistry(object):
+    """
+    The claim providers compiled once.
+
+    Maps each claim name to the providers computing it, in override order:
+    a later provider's value replaces an earlier one unless it is None.
+    The plans used for full claim sets and for snapshots are precomputed.
+    """
+
+    def __init__(self, providers):
+        self.providers = tuple(providers)
+        self.claims = OrderedDict()
+        # (provider, [(name, scope), ...]) in evaluation order.
+        self.scoped_claims = []
+        for p in self.providers:
+            entries = []
+            for name in p.get_supported_claims():
+                self.claims.setdefault(name, []).append(p)
+                entries.append((name, p.get_claim_scope(name)))
+            self.scoped_claims.append((p, entries))
+        self.claims_supported = list(self.claims)
+        # The scopes granting claims beyond the "openid" ones.
+        self.claim_scopes = {scope for p, entries in self.scoped_claims
+                             for n, scope in entries} - {"openid"}
+        self.plan = [(p, [n for n, scope in entries])
+                     for p, entries in self.scoped_claims if entries]
+        self.snapshot_plan = [(p, [n for n in names if n not in p.volatile_claims])
+                              for p, names in self.plan]
+
+    def get_plan(self, scopes, requested_claims=None):
+        """
+        The plan of the "openid" claims and the claims ``scopes`` grant.
+        ``requested_claims`` narrows the granted claims to those named.
+        """
+        plan = []
+        for p, entries in self.scoped_claims:
+            names = [n for n, scope in entries if scope == "openid" or (
+                scope in scopes and (requested_claims is None or n in requested_claims))]
+            if names:
+                plan.append((p, names))
+        return plan
+
+
+_claim_registry = None
+
+
+def get_claim_registry():
+    """The ClaimRegistry of OIDC_CLAIM_PROVIDERS, compiled on first use."""
+    global _claim_registry
+    providers = tuple(get_claim_providers())
+    registry = _claim_registry
+    if registry is None or registry.providers != providers:
+        registry = _claim_registry = ClaimRegistry(providers)
+    return registry
+
+
 class ClaimProvider(object):
-    def __init__(self, user=None, token=None, request=None, **kwargs):
+    """
+    Computes the claims of a user.
+
+    When ``scopes`` is given, only the claims granted by those scopes (plus
+    the always present "openid" claims) are computed. ``scopes=None``
+    computes every claim. ``requested_claims``, the names from an OIDC
+    ``claims`` request, limits the granted claims to those it names.
+    """
+
+    def __init__(self, user=None, token=None, request=None, scopes=None, requested_claims=None,
+                 loaded=False, **kwargs):
         self.user = user
         self.token = token
         self.request = request
+        self.scopes = scopes
+        self.requested_claims = None if requested_claims is None else set(requested_claims)
+        # The user comes from ClaimContext.load_users().
+        self.loaded = loaded
+
+    def get_claim_plan(self):
+        """The providers to run, each with the claim names to compute."""
+        registry = get_claim_registry()
+        if self.scopes is None:
+            if self.requested_claims is None:
+                return registry.plan
+            scopes = registry.claim_scopes
+        else:
+            scopes = set(self.scopes)
+            if oidc_settings.OIDC_OPENID_SCOPE_ALL_CLAIMS and not registry.claim_scopes & scopes:
+                scopes |= registry.claim_scopes
+        return registry.get_plan(scopes, self.requested_claims)
+
+    def get_claim_context(self, providers):
+        return ClaimContext(user=self.user,
+                            token=self.token,
+                            request=self.request,
+                            providers=providers,
+                            loaded=self.loaded)
+
+    @classmethod
+    def get_claims_of_users(cls, users, **kwargs):
+        """
+        The claims of each of ``users``, in order, computed from one
+        ClaimContext load for all of them. The snapshots are not read: with
+        the relations loaded, computing the claims costs no query.
+        """
+        users = list(users)
+        plan = cls(**kwargs).get_claim_plan()
+        loaded = ClaimContext.load_users(users, [p for p, names in plan])
+        return [cls(user=user, loaded=True, **kwargs).compute_claims(plan) for user in loaded]
 
     @classmethod
     def get_supported_claims(cls):
-        providers = get_claim_providers()
-        claims = []
-        for p in providers:
-            claims += p.get_supported_claims()
-        return claims
+        return get_claim_registry().claims_supported
 
-    def get_claims(self):
-        providers = get_claim_providers()
+    def compute_claims(self, plan=None, expiries=None):
+        """
+        The claims of ``plan``. The expiry of each provider's claims is
+        appended to ``expiries`` when it is given.
+        """
+        if plan is None:
+            plan = self.get_claim_plan()
+        context = self.get_claim_context([p for p, names in plan])
         claims = {}
-        for p in providers:
-            claims = {
-                **claims,
-                **p(user=self.user,
-                    token=self.token,
-                    request=self.request,
-                    claims=claims).get_claims()
-            }
+        for p, names in plan:
+            provider = p(user=context.user,
+                         token=self.token,
+                         request=self.request,
+                         claims=claims,
+                         context=context)
+            provider.add_claims(claims, names)
+            if expiries is not None:
+                expiries.append(provider.get_claims_expiry())
+        return claims
+
+    def use_snapshot(self):
+        return oidc_settings.OIDC_CLAIM_SNAPSHOTS and getattr(self.user, 'pk', None) is not None
+
+    def build_snapshot(self):
+        """
+        Every claim of the user except the per request ones, and the last
+        day they are valid for (None when they don't depend on the date).
+        """
+        expiries = []
+        claims = self.compute_claims(get_claim_registry().snapshot_plan, expiries)
+        return claims, min((e for e in expiries if e is not None), default=None)
+
+    def get_snapshot_claims(self):
+        snapshot = ClaimSnapshot.get_claims(self.user, self.build_snapshot)
+        plan = self.get_claim_plan()
+        wanted = set()
+        for p, names in plan:
+            wanted.update(names)
+        claims = {k: v for k, v in snapshot.items() if k in wanted}
+        for p, names in plan:
+            volatile = [n for n in names if n in p.volatile_claims]
+            if volatile:
+                p(user=self.user,
+                  token=self.token,
+                  request=self.request,
+                  claims=claims).add_claims(claims, volatile)
         return claims
 
+    def get_claims(self):
+        if self.use_snapshot():
+            return self.get_snapshot_claims()
+        return self.compute_claims()
+
 
 class BaseProvider(object):
+    # Relations of the user read by this provider's claims. They are loaded
+    # for all providers at once by the ClaimContext.
+    select_related = ()
+    prefetch_related = ()
+    # The scope that grants this provider's claims. scope_by_claim overrides it
+    # per claim name. "openid" claims are part of every claim set.
+    scope = "openid"
+    scope_by_claim = {}
+    # Claims that depend on the request rather than the user. They are left
+    # out of the ClaimSnapshot and computed for every request.
+    volatile_claims = ()
 
-    def __init__(self, user=None, token=None, request=None, claims=None, **kwargs):
+    def __init__(self, user=None, token=None, request=None, claims=None, context=None, **kwargs):
         self.user = user
         self.token = token
         self.request = request
-        self.claims = claims or {}
+        self.claims = claims if claims is not None else {}
+        self.context = context
+
+    @classmethod
+    def get_claim_methods(cls):
+        """The ``claim_<name>`` methods by claim name, collected once per class."""
+        methods = cls.__dict__.get('_claim_methods')
+        if methods is None:
+            methods = OrderedDict()
+            for name in dir(cls):
+                if name.startswith('claim_'):
+                    methods[name.replace('claim_', "", 1)] = getattr(cls, name)
+            cls._claim_methods = methods
+        return methods
 
     @classmethod
     def get_supported_claims(cls):
-        claims = []
-        for name in dir(cls):
-            if name.startswith('claim_'):
-                key = name.replace('claim_', "", 1)
-                claims.append(key)
-        return claims
+        return list(cls.get_claim_methods())
 
-    def get_claims(self):
-        claims = {}
-        for name in dir(self):
-            if name.startswith('claim_'):
-                method = getattr(self, name)
-                val = method()
-                if val is not None:
-                    key = name.replace('claim_', "", 1)
-                    claims[key] = val
+    @classmethod
+    def get_claim_scope(cls, name):
+        return cls.scope_by_claim.get(name, cls.scope)
+
+    def add_claims(self, claims, names=None):
+        """
+        Computes ``names`` into ``claims``. A None value keeps the value of
+        an earlier provider.
+        """
+        methods = self.get_claim_methods()
+        if names is None:
+            names = methods
+        for key in names:
+            val = methods[key](self)
+            if val is not None:
+                claims[key] = val
         return claims
 
+    def get_claims(self, names=None):
+        return self.add_claims({}, names)
+
+    def get_claims_expiry(self):
+        """
+        The last day this provider's claims hold, for claims that change
+        with the date (e.g. when evidence expires), else None. A ClaimSnapshot
+        is rebuilt after the earliest expiry of its providers.
+        """
+        return None
+
 
 class UserClaimProvider(BaseProvider):
+    scope_by_claim = {'email': 'email'}
+    volatile_claims = ('aud', 'exp', 'iat', 'nonce', 'auth_time')
 
     def claim_email(self):
         return self.user.email
@@ -4,3 +4,4 @@ from oauth2_provider.forms import AllowForm
 
 class NonceAllowForm(AllowForm):
     nonce = forms.CharField(required=False, widget=forms.HiddenInput())
+    claims = forms.CharField(required=False, widget=forms.HiddenInput())
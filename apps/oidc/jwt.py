@@ -1,6 +1,6 @@
 import jwt
 from .settings import oidc_settings
-from .secrets import RSA256Keys
+from .secrets import RSA256Keys, get_key_ring
 
 
 def get_jwt_builder():
@@ -12,22 +12,27 @@ class DefaultBuilder(object):
     def get_jwks(cls):
         return RSA256Keys().get_public_jwk()
 
-    def encode(self, claims):
+    @classmethod
+    def get_key_ring(cls):
+        return get_key_ring()
+
+    def encode(self, claims, headers=None):
         # TODO update lib: https://jwt.io/
-        jwks = self.get_jwks()
-        kid = jwks.get('kid', "")
+        active = self.get_key_ring().active
 
         return jwt.encode(
             claims,
-            RSA256Keys().get_private_key(),
+            active.private_key,
             algorithm='RS256',
             headers={
-                'kid': kid,
+                'kid': active.kid,
+                **(headers or {}),
             })
 
     def decode(self, token, *args, **kwargs):
+        kid = jwt.get_unverified_header(token).get('kid')
         return jwt.decode(
             token,
-            RSA256Keys().get_public_key(),
+            RSA256Keys().get_verifying_key(kid),
             algorithms=['RS256', ],
             **kwargs)
@@ -0,0 +1,52 @@
+import io
+import time
+from contextlib import redirect_stdout
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from ...claims import get_claim_providers, get_claim_registry, get_claims_provider
+
+ClaimsProvider = get_claims_provider()
+
+
+def reflect_claims(provider, user):
+    # Mimics the uncompiled chain: dir() reflection and a dict copy per
+    # provider.
+    claims = {}
+    for p in get_claim_providers():
+        names = [n.replace('claim_', "", 1) for n in dir(p) if n.startswith('claim_')]
+        claims = {**claims, **p(user=user, claims=claims).get_claims(names)}
+    return claims
+
+
+def compiled_claims(provider, user):
+    return provider.compute_claims()
+
+
+def run(count, evaluate):
+    # An unsaved user: no queries, so only the provider chain is measured.
+    user = get_user_model()(username="benchmark", email="benchmark@example.com")
+    provider = ClaimsProvider(user=user)
+    # Some providers print their exceptions; keep them out of the timing.
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for i in range(count):
+            evaluate(provider, user)
+        return count / (time.perf_counter() - start)
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-token overhead of the claim provider chain.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        count = options['count']
+        registry = get_claim_registry()
+        self.stdout.write("%d providers, %d claims" % (
+            len(registry.providers), len(registry.claims_supported)))
+        reflected = run(count, reflect_claims)
+        compiled = run(count, compiled_claims)
+        self.stdout.write("Reflected: %.1f claim sets/sec" % (reflected))
+        self.stdout.write("Compiled:  %.1f claim sets/sec" % (compiled))
+        self.stdout.write("Speedup:   %.1fx" % (compiled / reflected))
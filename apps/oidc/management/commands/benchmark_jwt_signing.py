@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand
+from ...jwt import get_jwt_builder
+from ...secrets import reload_keys
+
+JWTBuilder = get_jwt_builder()
+
+
+def sign(count, cached=True):
+    claims = {"sub": "123456789012345", "aud": "benchmark", "iss": "benchmark"}
+    builder = JWTBuilder()
+    start = time.perf_counter()
+    for i in range(count):
+        if not cached:
+            # Mimics the uncached path: re-read and re-parse the keys.
+            reload_keys()
+        builder.encode(claims)
+    return count / (time.perf_counter() - start)
+
+
+class Command(BaseCommand):
+    help = 'Measure id_token signing throughput with and without the key cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = options['count']
+        # Warm up (and generate keys if needed).
+        sign(1)
+        uncached = sign(count, cached=False)
+        cached = sign(count)
+        reload_keys()
+        self.stdout.write("Uncached: %.1f tokens/sec" % (uncached))
+        self.stdout.write("Cached:   %.1f tokens/sec" % (cached))
+        self.stdout.write("Speedup:  %.1fx" % (cached / uncached))
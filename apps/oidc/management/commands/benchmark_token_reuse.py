@@ -0,0 +1,61 @@
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.timezone import timedelta
+from oauth2_provider.models import get_access_token_model, get_application_model
+from vmi.oauth2_validators import get_reusable_token
+
+AccessToken = get_access_token_model()
+Application = get_application_model()
+
+
+def scan_tokens(user, application, scopes):
+    # Mimics the previous lookup: every live token is loaded and checked in
+    # Python, with a query per candidate for its refresh token.
+    tokens = AccessToken.objects.filter(
+        user=user, application=application,
+    ).filter(expires__gt=timezone.now()).order_by('-expires')
+    if tokens.exists():
+        for access_token in tokens:
+            if access_token.allow_scopes(scopes):
+                hasattr(access_token, 'refresh_token')
+                return access_token
+    return None
+
+
+def run(count, lookup, user, application, scopes):
+    start = time.perf_counter()
+    for i in range(count):
+        lookup(user, application, scopes)
+    return (time.perf_counter() - start) * 1000 / count
+
+
+class Command(BaseCommand):
+    help = ('Measure the reusable access token lookup of the token endpoint '
+            'against a large token table. The tokens are rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', type=int, default=10000)
+        parser.add_argument('--count', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = get_user_model().objects.create_user("benchmark_token_reuse")
+            application = Application.objects.create(
+                name="Token reuse benchmark", user=user, redirect_uris="http://localhost",
+                client_type=Application.CLIENT_CONFIDENTIAL,
+                authorization_grant_type=Application.GRANT_AUTHORIZATION_CODE)
+            expires = timezone.now() + timedelta(hours=1)
+            AccessToken.objects.bulk_create(
+                AccessToken(user=user, application=application, scope="openid",
+                            token="benchmark-%d" % (i), expires=expires)
+                for i in range(options['tokens']))
+            # The worst case: no live token allows the requested scopes.
+            scopes = ["openid", "profile"]
+            for name, lookup in (("Scan", scan_tokens), ("Indexed", get_reusable_token)):
+                ms = run(options['count'], lookup, user, application, scopes)
+                self.stdout.write("%-8s %.2f ms/lookup with %d live tokens" % (
+                    name, ms, options['tokens']))
+            transaction.set_rollback(True)
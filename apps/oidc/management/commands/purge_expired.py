@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from libs.purge import purge
+
+
+class Command(BaseCommand):
+    help = ('Delete expired tokens and grants and spent one-time codes '
+            '(settings.PURGE_POLICIES) in batches.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.PURGE_BATCH_SIZE,
+                            help='Rows deleted per transaction.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the rows that would be deleted.')
+
+    def handle(self, *args, **options):
+        results = purge(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        for result in results:
+            self.stdout.write(str(result))
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write("%s %d rows." % (verb, sum(r.rows for r in results)))
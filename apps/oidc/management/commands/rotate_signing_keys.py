@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from ...secrets import RSA256Keys, get_key_ring
+from ...settings import oidc_settings
+
+
+class Command(BaseCommand):
+    help = """Rotate the OIDC signing keys. Meant to be run on a schedule (e.g. daily cron):
+              the next key is published first and promoted once the active key is
+              older than --max-age-days."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-days', type=int,
+                            default=oidc_settings.OIDC_KEY_ROTATION_DAYS)
+        parser.add_argument('--force', action='store_true',
+                            help="Rotate now, whatever the age of the active key.")
+
+    def handle(self, *args, **options):
+        keys = RSA256Keys()
+        if options['force'] or keys.rotation_due(options['max_age_days']):
+            keys.rotate()
+            self.stdout.write("Signing keys rotated.")
+        elif keys.publish_next_key():
+            self.stdout.write("Next signing key published.")
+        else:
+            self.stdout.write("Rotation not due.")
+
+        for key in get_key_ring().keys:
+            self.stdout.write("%s %s" % (key.status, key.kid))
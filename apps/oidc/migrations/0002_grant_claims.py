@@ -0,0 +1,18 @@
+# Generated by Django 2.2.20 on 2026-10-18 19:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oidc', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='grant',
+            name='claims',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.20 on 2026-10-18 19:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('oidc', '0002_grant_claims'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaimSnapshot',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='claim_snapshot', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('version', models.CharField(max_length=40)),
+                ('claims', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,45 @@
+"""
+Index oauth2_provider's access token table for the reusable token lookup.
+
+The table belongs to oauth2_provider, so this app can't add the index to
+the model's migration state: AddIndex only applies to this app's models.
+The index is created through the schema editor instead, which writes the
+right SQL for the database and the (swappable) token model's table, and
+remove_index() drops it again when this migration is unapplied.
+
+Caveat: migration state doesn't know about the index. An oauth2_provider
+migration that rebuilds the table, as SQLite does for most column
+changes, drops it without notice. After such an upgrade, recreate it
+with "manage.py migrate oidc 0003" followed by "manage.py migrate".
+"""
+from django.conf import settings
+from django.db import migrations, models
+
+# Serves the reusable access token lookup of the token endpoint:
+# user = ? AND application = ? AND expires > now ORDER BY expires DESC.
+INDEX = models.Index(fields=['user', 'application', 'expires'],
+                     name='oauth2_token_user_app_exp')
+
+
+def get_access_token_model(apps):
+    return apps.get_model(settings.OAUTH2_PROVIDER_ACCESS_TOKEN_MODEL)
+
+
+def add_index(apps, schema_editor):
+    schema_editor.add_index(get_access_token_model(apps), INDEX)
+
+
+def remove_index(apps, schema_editor):
+    schema_editor.remove_index(get_access_token_model(apps), INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.OAUTH2_PROVIDER_ACCESS_TOKEN_MODEL),
+        ('oidc', '0003_claimsnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_index, remove_index),
+    ]
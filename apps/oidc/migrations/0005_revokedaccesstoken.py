@@ -0,0 +1,20 @@
+# Generated by Django 2.2.20 on 2026-10-18 20:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oidc', '0004_accesstoken_reuse_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedAccessToken',
+            fields=[
+                ('jti', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('expires', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
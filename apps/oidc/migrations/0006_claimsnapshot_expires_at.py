@@ -0,0 +1,18 @@
+# Generated by Django 2.2.20 on 2026-10-18 21:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oidc', '0005_revokedaccesstoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='claimsnapshot',
+            name='expires_at',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
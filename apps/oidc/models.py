@@ -1,5 +1,10 @@
+import hashlib
+import json
+from datetime import date
 from oauth2_provider.models import AbstractGrant
+from django.conf import settings
 from django.db import models
+from .settings import oidc_settings
 
 
 class Grant(AbstractGrant):
@@ -8,6 +13,71 @@ class Grant(AbstractGrant):
         default=None,
         blank=True,
         null=True)
+    # The OIDC "claims" request parameter (JSON), kept like the nonce until
+    # the code is exchanged.
+    claims = models.TextField(blank=True, default='')
 
     class Meta(AbstractGrant.Meta):
         swappable = "OAUTH2_PROVIDER_GRANT_MODEL"
+
+
+def get_claim_snapshot_version():
+    """Changes with the claim providers, so stale snapshots are rebuilt."""
+    providers = ["%s.%s" % (p.__module__, p.__name__)
+                 for p in oidc_settings.OIDC_CLAIM_PROVIDERS]
+    version = [oidc_settings.OIDC_CLAIM_SNAPSHOT_VERSION] + providers
+    return hashlib.sha1(" ".join(version).encode()).hexdigest()
+
+
+class ClaimSnapshot(models.Model):
+    """
+    The full claim set of a user, computed once and read back with a single
+    primary key lookup until one of its inputs changes (see signals.py) or
+    the day ``expires_at`` has passed.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='claim_snapshot')
+    version = models.CharField(max_length=40)
+    claims = models.TextField()
+    # The last day the claims are valid for, when some depend on the date.
+    expires_at = models.DateField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return 'Claims of %s' % (self.user_id)
+
+    @classmethod
+    def get_claims(cls, user, build):
+        """
+        The snapshot of ``user``, built with ``build()`` when missing or
+        expired. ``build()`` returns the claims and their expiry date.
+        """
+        version = get_claim_snapshot_version()
+        claims = cls.objects.filter(
+            models.Q(expires_at=None) | models.Q(expires_at__gte=date.today()),
+            user_id=user.pk, version=version).values_list('claims', flat=True).first()
+        if claims is not None:
+            return json.loads(claims)
+        claims, expires_at = build()
+        cls.objects.update_or_create(
+            user_id=user.pk,
+            defaults={'version': version, 'claims': json.dumps(claims), 'expires_at': expires_at})
+        return claims
+
+    @classmethod
+    def invalidate(cls, **lookup):
+        cls.objects.filter(**lookup).delete()
+
+
+class RevokedAccessToken(models.Model):
+    """
+    A JWT access token revoked before its expiry. Rows are only needed
+    until ``expires``; resource servers keep the live ones in memory.
+    """
+    jti = models.CharField(max_length=255, primary_key=True)
+    expires = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti
@@ -0,0 +1,30 @@
+from datetime import timedelta
+from oauth2_provider.models import (
+    get_access_token_model,
+    get_grant_model,
+    get_refresh_token_model,
+)
+from oauth2_provider.settings import oauth2_settings
+from .models import RevokedAccessToken
+
+AccessToken = get_access_token_model()
+Grant = get_grant_model()
+RefreshToken = get_refresh_token_model()
+
+
+def revoked_refresh_tokens(now):
+    grace = timedelta(seconds=oauth2_settings.REFRESH_TOKEN_GRACE_PERIOD_SECONDS)
+    return RefreshToken.objects.filter(revoked__lt=now - grace)
+
+
+def expired_access_tokens(now):
+    # Tokens that can still be refreshed are kept with their refresh token.
+    return AccessToken.objects.filter(expires__lt=now, refresh_token__isnull=True)
+
+
+def expired_grants(now):
+    return Grant.objects.filter(expires__lt=now)
+
+
+def expired_revoked_access_tokens(now):
+    return RevokedAccessToken.objects.filter(expires__lt=now)
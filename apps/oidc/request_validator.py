@@ -1,3 +1,4 @@
+import json
 from datetime import timedelta
 from oauth2_provider.oauth2_validators import (
     OAuth2Validator,
@@ -7,7 +8,14 @@ from oauth2_provider.models import AbstractApplication, get_grant_model
 from oauth2_provider.settings import oauth2_settings
 from oauth2_provider.scopes import get_scopes_backend
 from django.utils import timezone
-from .claims import get_claims_provider
+from .access_tokens import (
+    JWTAccessToken,
+    decode_access_token,
+    get_token_id,
+    is_jwt,
+    jwt_access_tokens_enabled,
+)
+from .claims import get_claims_provider, get_requested_claims
 from .jwt import get_jwt_builder
 
 GRANT_TYPE_MAPPING["openid"] = (AbstractApplication.GRANT_AUTHORIZATION_CODE, )
@@ -50,10 +58,38 @@ class RequestValidator(OAuth2Validator):
         return False
 
     def get_id_token(self, token, token_handler, request):
-        cp = ClaimsProvider(user=request.user, token=token, request=request)
+        cp = ClaimsProvider(
+            user=request.user, token=token, request=request,
+            scopes=request.scopes,
+            requested_claims=get_requested_claims(
+                getattr(request, 'claims', None), "id_token"))
         claims = cp.get_claims()
         return JWTBuilder().encode(claims)
 
+    def validate_bearer_token(self, token, scopes, request):
+        if not (jwt_access_tokens_enabled() and is_jwt(token)):
+            return super().validate_bearer_token(token, scopes, request)
+        # Checked against the signature and the revocation list only.
+        claims = decode_access_token(token)
+        if claims is None:
+            return False
+        access_token = JWTAccessToken(token, claims)
+        if not access_token.is_valid(scopes):
+            return False
+        request.client = access_token.application
+        request.user = access_token.user
+        request.scopes = scopes
+        request.access_token = access_token
+        return True
+
+    def revoke_token(self, token, token_type_hint, request, *args, **kwargs):
+        return super().revoke_token(get_token_id(token), token_type_hint, request, *args, **kwargs)
+
+    def _create_access_token(self, expires, request, token, source_refresh_token=None):
+        # A JWT is longer than the token column; its jti identifies it.
+        token = dict(token, access_token=get_token_id(token["access_token"]))
+        return super()._create_access_token(expires, request, token, source_refresh_token)
+
     def save_bearer_token(self, token, request, *args, **kwargs):
         # Should also check that response_type was only "id_token"
         if request.response_type == "id_token":
@@ -67,6 +103,7 @@ class RequestValidator(OAuth2Validator):
                 request.scopes = grant.scope.split(" ")
                 request.user = grant.user
                 request.nonce = grant.nonce
+                request.claims = json.loads(grant.claims) if grant.claims else None
                 return True
             return False
 
@@ -89,10 +126,18 @@ class RequestValidator(OAuth2Validator):
             expires=expires,
             redirect_uri=request.redirect_uri,
             scope=" ".join(request.scopes),
-            nonce=getattr(request, 'nonce', None)
+            nonce=getattr(request, 'nonce', None),
+            claims=self.serialize_claims_request(getattr(request, 'claims', None)),
         )
         g.save()
 
+    def serialize_claims_request(self, claims):
+        if not claims:
+            return ''
+        if isinstance(claims, dict):
+            return json.dumps(claims)
+        return claims
+
     def validate_scopes(self,
                         client_id,
                         scopes, client,
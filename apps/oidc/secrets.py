@@ -1,65 +1,268 @@
+import hashlib
+import json
+import os
+import threading
+import time
 from Crypto.PublicKey import RSA
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from jwkest.jwk import RSAKey
 from .settings import oidc_settings
 
+ACTIVE = "active"
+NEXT = "next"
+RETIRED = "retired"
+
 
 def get_key_storage():
     return oidc_settings.OIDC_KEY_STORAGE()
 
 
+def _write_atomic(path, content):
+    tmp_path = "%s.tmp" % (path)
+    with open(tmp_path, "wb") as file_out:
+        file_out.write(content)
+    os.replace(tmp_path, path)
+
+
 class FileKeyStore(object):
+    # The active key pair of installs predating the key ring. Read until the
+    # key ring holds an active key.
     _private_key_file = "private.pem"
     _public_key_file = "public.pem"
+    # Holds the active, next and retired keys, replaced in a single write so
+    # a reader never sees the private key of one rotation with the public
+    # keys of another.
+    _key_ring_file = "keyring.json"
 
     def store_private(self, key_string):
-        file_out = open(self._private_key_file, "wb")
-        file_out.write(key_string)
+        _write_atomic(self._private_key_file, key_string)
 
     def store_public(self, key_string):
-        file_out = open(self._public_key_file, "wb")
-        file_out.write(key_string)
+        _write_atomic(self._public_key_file, key_string)
+
+    def store_key_ring(self, key_ring):
+        _write_atomic(self._key_ring_file,
+                      json.dumps(key_ring, indent=2).encode())
 
     @property
     def private(self):
-        return open(self._private_key_file).read()
+        with open(self._private_key_file) as file_in:
+            return file_in.read()
 
     @property
     def public(self):
-        return open(self._public_key_file).read()
+        with open(self._public_key_file) as file_in:
+            return file_in.read()
+
+    @property
+    def key_ring(self):
+        try:
+            with open(self._key_ring_file) as file_in:
+                return json.load(file_in)
+        except FileNotFoundError:
+            return {}
+
+    @property
+    def version(self):
+        """Changes whenever one of the key files is rewritten."""
+        version = []
+        for path in (self._key_ring_file, self._private_key_file, self._public_key_file):
+            try:
+                version.append(os.stat(path).st_mtime_ns)
+            except FileNotFoundError:
+                version.append(None)
+        return tuple(version)
+
+
+class ParsedKey(object):
+    """A key of the key ring, parsed once and shared by every request."""
+
+    def __init__(self, public_pem, private_pem=None, status=ACTIVE):
+        self.status = status
+        self.public_pem = public_pem
+        self.private_pem = private_pem
+        self.public_key = serialization.load_pem_public_key(
+            public_pem.encode(), backend=default_backend())
+        self.private_key = None
+        if private_pem and status == ACTIVE:
+            self.private_key = serialization.load_pem_private_key(
+                private_pem.encode(), password=None, backend=default_backend())
+        _rsajwk = RSAKey(use="sig", alg="RS256", key=RSA.import_key(public_pem))
+        _rsajwk.add_kid()
+        self.jwk = _rsajwk.serialize()
+        self.kid = self.jwk.get('kid', "")
+
+
+class KeyRing(object):
+    """
+    The active signing key plus the published next and retired keys.
+
+    The JWKS document is serialized once per key ring, so serving
+    ``/.well-known/certs`` is a plain bytes write.
+    """
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.active = keys[0]
+        self.by_kid = {k.kid: k for k in keys}
+        self.jwks = {"keys": [k.jwk for k in keys]}
+        self.jwks_body = json.dumps(
+            self.jwks, sort_keys=True, separators=(",", ":")).encode()
+        self.etag = hashlib.sha256(self.jwks_body).hexdigest()
+
+    def get(self, kid=None):
+        return self.by_kid.get(kid, self.active)
+
+
+class KeyCache(object):
+    """
+    Process-wide cache of the parsed key ring held by the key storage.
+
+    The storage ``version`` (file mtimes for ``FileKeyStore``) is checked at
+    most every ``OIDC_KEY_CACHE_CHECK_INTERVAL`` seconds, so rewriting the key
+    files is picked up without a restart. Storages without a ``version`` are
+    only re-read after ``reload()``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ring = None
+        self._version = None
+        self._checked_at = 0
+
+    def get(self):
+        ring = self._ring
+        if ring is not None and not self._check_due():
+            return ring
+        with self._lock:
+            storage = get_key_storage()
+            version = getattr(storage, 'version', None)
+            self._checked_at = time.monotonic()
+            if self._ring is None or version != self._version:
+                self._ring = self._load(storage)
+                # The version read before loading: a rewrite during the load
+                # leaves it behind, so the next check loads the keys again.
+                self._version = version
+            return self._ring
+
+    def reload(self):
+        with self._lock:
+            self._ring = None
+            self._version = None
+            self._checked_at = 0
+
+    def _check_due(self):
+        interval = oidc_settings.OIDC_KEY_CACHE_CHECK_INTERVAL
+        return time.monotonic() - self._checked_at >= interval
+
+    def _load(self, storage):
+        # Every key comes from one read of the key ring.
+        key_ring = getattr(storage, 'key_ring', {})
+        active = key_ring.get(ACTIVE)
+        if not active:
+            try:
+                active = {"private": storage.private, "public": storage.public}
+            except FileNotFoundError:
+                RSA256Keys().generate_keys(reload=False)
+                key_ring = storage.key_ring
+                active = key_ring[ACTIVE]
+        keys = [ParsedKey(active["public"], active["private"])]
+        if key_ring.get(NEXT):
+            keys.append(ParsedKey(key_ring[NEXT]["public"], status=NEXT))
+        for retired in key_ring.get(RETIRED, []):
+            keys.append(ParsedKey(retired["public"], status=RETIRED))
+        return KeyRing(keys)
+
+
+key_cache = KeyCache()
+
+
+def reload_keys():
+    """Drop the cached keys, e.g. after the key storage has been replaced."""
+    key_cache.reload()
+
+
+def get_key_ring():
+    return key_cache.get()
+
+
+def _now():
+    return timezone.now().isoformat()
 
 
 class RSA256Keys(object):
 
-    # TODO regenerate keys
-    def generate_keys(self):
+    def new_key(self):
         key = RSA.generate(2048)
-        private_key = key.export_key()
-        get_key_storage().store_private(private_key)
+        return {"private": key.export_key().decode(),
+                "public": key.publickey().export_key().decode()}
+
+    def generate_keys(self, reload=True):
+        """Replace the active key, keeping the next and retired keys."""
+        storage = get_key_storage()
+        key_ring = storage.key_ring
+        key_ring[ACTIVE] = self.new_key()
+        storage.store_key_ring(key_ring)
+        if reload:
+            reload_keys()
 
-        public_key = key.publickey().export_key()
-        get_key_storage().store_public(public_key)
+    def publish_next_key(self):
+        """Make sure a next key is published ahead of the next rotation."""
+        storage = get_key_storage()
+        key_ring = storage.key_ring
+        if key_ring.get(NEXT):
+            return False
+        key_ring[NEXT] = self.new_key()
+        key_ring.setdefault("active_since", _now())
+        storage.store_key_ring(key_ring)
+        reload_keys()
+        return True
+
+    def rotate(self):
+        """
+        Retire the active key, promote the next key and publish a new next key.
+
+        Retired public keys stay in the JWKS so tokens signed before the
+        rotation can still be verified.
+        """
+        storage = get_key_storage()
+        key_ring = storage.key_ring
+        active = key_cache.get().active
+        retired = [{"public": active.public_pem, "retired_at": _now()}]
+        retired += key_ring.get(RETIRED, [])
+
+        storage.store_key_ring({
+            ACTIVE: key_ring.get(NEXT) or self.new_key(),
+            "active_since": _now(),
+            NEXT: self.new_key(),
+            RETIRED: retired[:oidc_settings.OIDC_KEY_RING_RETIRED_KEYS],
+        })
+        reload_keys()
+
+    def rotation_due(self, max_age_days):
+        active_since = get_key_storage().key_ring.get("active_since")
+        if not active_since:
+            # Publish a next key before the first rotation.
+            return False
+        age = timezone.now() - parse_datetime(active_since)
+        return age.days >= max_age_days
 
     def get_public_key(self):
-        try:
-            return get_key_storage().public
-        except IOError:
-            self.generate_keys()
-            return get_key_storage().public
+        return key_cache.get().active.public_pem
 
     def get_public_jwk(self):
-        try:
-            _rsakey = get_key_storage().public
-        except FileNotFoundError:
-            self.generate_keys()
-            _rsakey = get_key_storage().public
-        _rsakey = RSA.import_key(_rsakey)
-        _rsajwk = RSAKey(use="sig", alg="RS256", key=_rsakey)
-        _rsajwk.add_kid()
-        return _rsajwk.serialize()
+        return key_cache.get().active.jwk
 
     def get_private_key(self):
-        try:
-            return get_key_storage().private
-        except FileNotFoundError:
-            self.generate_keys()
-            return get_key_storage().private
+        return key_cache.get().active.private_pem
+
+    def get_signing_key(self):
+        """The parsed active private key, ready to hand to ``jwt.encode``."""
+        return key_cache.get().active.private_key
+
+    def get_verifying_key(self, kid=None):
+        """The parsed public key for ``kid``, defaulting to the active key."""
+        return key_cache.get().get(kid).public_key
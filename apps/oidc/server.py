@@ -16,6 +16,8 @@ from oauthlib.oauth2 import (
         RevocationEndpoint,
         TokenEndpoint,
         )
+from oauthlib.oauth2.rfc6749.tokens import random_token_generator
+from .access_tokens import generate_access_token, jwt_access_tokens_enabled
 
 
 class Server(
@@ -51,6 +53,10 @@ class Server(
         openid_connect_auth = OpenIDConnectAuthCode(request_validator)
         openid_connect_implicit = OpenIDConnectImplicit(request_validator)
 
+        if token_generator is None and jwt_access_tokens_enabled():
+            token_generator = generate_access_token
+            # BearerToken would otherwise sign the refresh tokens too.
+            refresh_token_generator = refresh_token_generator or random_token_generator
         bearer = BearerToken(request_validator, token_generator,
                              token_expires_in, refresh_token_generator)
 
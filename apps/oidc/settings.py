@@ -10,6 +10,35 @@ DEFAULTS = {
     "OIDC_JWT_BUILDER": 'apps.oidc.jwt.DefaultBuilder',
     "OIDC_ISSUER": os.environ.get('OIDC_ISSUER', 'http://localhost'),
     "OIDC_KEY_STORAGE": 'apps.oidc.secrets.FileKeyStore',
+    # Seconds between checks of the key storage for rewritten keys.
+    "OIDC_KEY_CACHE_CHECK_INTERVAL": 5,
+    # Retired public keys kept in the JWKS after a rotation.
+    "OIDC_KEY_RING_RETIRED_KEYS": 2,
+    "OIDC_KEY_ROTATION_DAYS": 90,
+    # Cache-Control max-age for /.well-known/certs. Keep it well below the
+    # rotation period so relying parties see the next key before it is used.
+    "OIDC_JWKS_MAX_AGE": 3600,
+    # Cache-Control max-age for /.well-known/openid-configuration.
+    "OIDC_DISCOVERY_MAX_AGE": 86400,
+    # Keep each user's claims in a ClaimSnapshot row instead of recomputing
+    # them for every userinfo call and id_token.
+    "OIDC_CLAIM_SNAPSHOTS": False,
+    # Give tokens granted only "openid" (and scopes granting no claims)
+    # every claim, as legacy scope=openid clients received. Otherwise they
+    # get the "openid" claims alone.
+    "OIDC_OPENID_SCOPE_ALL_CLAIMS": False,
+    # Models the claims are computed from, each with the lookups from the
+    # user to an instance. Saving or deleting an instance drops the
+    # snapshots of the users it reaches.
+    "OIDC_CLAIM_SNAPSHOT_SOURCES": {},
+    # Bump to drop every snapshot, e.g. after a claim provider changed.
+    "OIDC_CLAIM_SNAPSHOT_VERSION": "1",
+    # Issue access tokens as signed JWTs that resource endpoints validate
+    # without a database lookup. The AccessToken row is still saved, keyed
+    # by the JWT's jti.
+    "OIDC_JWT_ACCESS_TOKENS": False,
+    # Seconds between reloads of the revoked JWT access tokens.
+    "OIDC_REVOCATION_LIST_CHECK_INTERVAL": 5,
 }
 
 IMPORT_STRINGS = (
@@ -0,0 +1,85 @@
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from .models import ClaimSnapshot
+from .settings import oidc_settings
+
+
+def invalidate_claim_snapshots(user_ids):
+    """
+    Drop the snapshots of ``user_ids`` now, and again once the transaction
+    commits so a snapshot built from the old rows meanwhile is not kept.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    ClaimSnapshot.invalidate(user_id__in=user_ids)
+    transaction.on_commit(
+        lambda: ClaimSnapshot.invalidate(user_id__in=user_ids))
+
+
+def get_snapshot_users(instance, lookups):
+    """The users with a snapshot whose claims read ``instance``."""
+    user_ids = set()
+    for lookup in lookups:
+        user_ids.update(ClaimSnapshot.objects.filter(
+            **{'user__%s' % (lookup): instance.pk}).values_list('user_id', flat=True))
+    return user_ids
+
+
+def invalidate_source_snapshots(model, pks):
+    """
+    Drop the snapshots reading the ``model`` rows ``pks``, for bulk updates
+    that send no signal.
+    """
+    lookups = oidc_settings.OIDC_CLAIM_SNAPSHOT_SOURCES.get(model._meta.label)
+    if not (oidc_settings.OIDC_CLAIM_SNAPSHOTS and lookups and pks):
+        return
+    user_ids = set()
+    for lookup in lookups:
+        user_ids.update(ClaimSnapshot.objects.filter(
+            **{'user__%s__in' % (lookup): pks}).values_list('user_id', flat=True))
+    invalidate_claim_snapshots(user_ids)
+
+
+def snapshot_source_changed(sender, instance, **kwargs):
+    if kwargs.get('created') and sender is get_user_model():
+        # No claims can read a user that did not exist yet.
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'last_login'}:
+        # auth_time is computed per request, logging in changes no claim.
+        return
+    lookups = oidc_settings.OIDC_CLAIM_SNAPSHOT_SOURCES[sender._meta.label]
+    invalidate_claim_snapshots(get_snapshot_users(instance, lookups))
+
+
+def snapshot_users_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """A many to many relation between a source and users was changed."""
+    if action in ('post_add', 'post_remove'):
+        user_ids = [instance.pk] if reverse else pk_set
+    elif action == 'pre_clear' and reverse:
+        user_ids = [instance.pk]
+    elif action == 'pre_clear':
+        lookups = oidc_settings.OIDC_CLAIM_SNAPSHOT_SOURCES[instance._meta.label]
+        user_ids = get_snapshot_users(instance, lookups)
+    else:
+        return
+    invalidate_claim_snapshots(user_ids)
+
+
+def connect_claim_snapshot_signals():
+    user_model = get_user_model()
+    for label in oidc_settings.OIDC_CLAIM_SNAPSHOT_SOURCES:
+        model = apps.get_model(label)
+        post_save.connect(snapshot_source_changed, sender=model,
+                          dispatch_uid='claim_snapshot_save_%s' % (label))
+        # Before the delete, while the lookups still reach the instance.
+        pre_delete.connect(snapshot_source_changed, sender=model,
+                           dispatch_uid='claim_snapshot_delete_%s' % (label))
+        for field in model._meta.many_to_many:
+            if field.remote_field.model is user_model:
+                m2m_changed.connect(
+                    snapshot_users_changed, sender=field.remote_field.through,
+                    dispatch_uid='claim_snapshot_m2m_%s_%s' % (label, field.name))
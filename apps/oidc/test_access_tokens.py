@@ -0,0 +1,143 @@
+import json
+import jwt
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from oauthlib.common import Request
+from oauth2_provider.models import get_access_token_model, get_application_model
+from .access_tokens import (
+    decode_access_token,
+    encode_access_token,
+    generate_access_token,
+    get_token_id,
+    get_token_subject,
+    revocation_list,
+)
+from apps.accounts.models import UserProfile
+from .jwt import get_jwt_builder
+from .models import RevokedAccessToken
+from .settings import oidc_settings
+
+AccessToken = get_access_token_model()
+Application = get_application_model()
+UserModel = get_user_model()
+JWTBuilder = get_jwt_builder()
+
+
+@mock.patch.object(oidc_settings, 'OIDC_JWT_ACCESS_TOKENS', True)
+class JWTAccessTokenTests(TestCase):
+
+    def setUp(self):
+        revocation_list.reload()
+        self.user = UserModel.objects.create_user("jwt_user", "jwt@example.com", "123456")
+        self.application = Application.objects.create(
+            name="JWT Application",
+            redirect_uris="http://localhost",
+            user=self.user,
+            client_type=Application.CLIENT_CONFIDENTIAL,
+            authorization_grant_type=Application.GRANT_AUTHORIZATION_CODE,
+        )
+
+    def tearDown(self):
+        revocation_list.reload()
+
+    def create_token(self, jti, scope="openid", seconds=3600):
+        row = AccessToken.objects.create(
+            user=self.user, application=self.application, token=jti, scope=scope,
+            expires=timezone.now() + timedelta(seconds=seconds))
+        return row, encode_access_token(jti, get_token_subject(self.user), self.application.client_id,
+                                        scope, row.expires)
+
+    def get_userinfo(self, token):
+        return self.client.get(reverse("oidc:userinfo"),
+                               HTTP_AUTHORIZATION="Bearer %s" % token)
+
+    def test_generated_token_is_saved_under_its_jti(self):
+        request = Request("http://localhost/o/token/")
+        request.client = self.application
+        request.user = self.user
+        request.scopes = ["openid", "profile"]
+        request.expires_in = 60
+        token = generate_access_token(request)
+        claims = decode_access_token(token)
+        self.assertEqual(claims["sub"], str(self.user.pk))
+        self.assertEqual(claims["scope"], "openid profile")
+        self.assertEqual(claims["client_id"], self.application.client_id)
+        self.assertEqual(get_token_id(token), claims["jti"])
+        self.assertEqual(get_token_id("opaque"), "opaque")
+
+    def test_subject_is_the_profile_subject(self):
+        UserProfile.objects.create(user=self.user)
+        self.user.refresh_from_db()
+        token = self.create_token("profiled")[1]
+        self.assertEqual(decode_access_token(token)["sub"], self.user.userprofile.subject)
+        response = self.get_userinfo(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode())["sub"], self.user.userprofile.subject)
+
+    def test_unsigned_token_is_not_resolved_to_its_jti(self):
+        row = self.create_token("forged")[0]
+        forged = jwt.encode({"jti": "forged", "iss": oidc_settings.OIDC_ISSUER,
+                             "exp": int(row.expires.timestamp())},
+                            "not the signing key of this issuer", algorithm="HS256", headers={"typ": "at+jwt"})
+        forged = forged.decode() if isinstance(forged, bytes) else forged
+        self.assertEqual(get_token_id(forged), forged)
+        bearer = self.create_token("introspector", scope="introspection")[1]
+        response = self.client.post(reverse("oauth2_provider:introspect"), {"token": forged},
+                                    HTTP_AUTHORIZATION="Bearer %s" % bearer)
+        self.assertFalse(json.loads(response.content.decode())["active"])
+        self.client.post(reverse("oauth2_provider:revoke-token"), {
+            "token": forged, "client_id": self.application.client_id,
+            "client_secret": self.application.client_secret})
+        self.assertTrue(AccessToken.objects.filter(token="forged").exists())
+        # Whereas the signed token is revoked.
+        self.client.post(reverse("oauth2_provider:revoke-token"), {
+            "token": self.create_token("signed")[1], "client_id": self.application.client_id,
+            "client_secret": self.application.client_secret})
+        self.assertFalse(AccessToken.objects.filter(token="signed").exists())
+
+    def test_token_is_validated_without_a_token_lookup(self):
+        token = self.create_token("valid")[1]
+        revocation_list.refresh()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_userinfo(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode())["sub"], self.user.pk)
+        for query in queries.captured_queries:
+            self.assertNotIn(AccessToken._meta.db_table, query["sql"])
+
+    def test_id_token_is_not_an_access_token(self):
+        id_token = JWTBuilder().encode({
+            "iss": oidc_settings.OIDC_ISSUER, "sub": self.user.pk,
+            "exp": int((timezone.now() + timedelta(hours=1)).timestamp())})
+        self.assertIsNone(decode_access_token(id_token))
+        self.assertEqual(self.get_userinfo(id_token).status_code, 401)
+
+    def test_revoked_row_revokes_the_token(self):
+        row, token = self.create_token("revoked")
+        self.assertEqual(self.get_userinfo(token).status_code, 200)
+        row.revoke()
+        self.assertTrue(RevokedAccessToken.objects.filter(jti="revoked").exists())
+        self.assertEqual(self.get_userinfo(token).status_code, 401)
+        # Other processes pick it up on their next reload.
+        revocation_list.reload()
+        self.assertEqual(self.get_userinfo(token).status_code, 401)
+
+    def test_expired_token_is_rejected(self):
+        self.assertEqual(self.get_userinfo(self.create_token("expired", seconds=-60)[1]).status_code, 401)
+
+    def test_introspection(self):
+        token = self.create_token("introspected", scope="openid profile")[1]
+        bearer = self.create_token("introspector", scope="introspection")[1]
+        response = self.client.post(reverse("oauth2_provider:introspect"), {"token": token},
+                                    HTTP_AUTHORIZATION="Bearer %s" % bearer)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content.decode())
+        self.assertTrue(data["active"])
+        self.assertEqual(data["scope"], "openid profile")
+        self.assertEqual(data["client_id"], self.application.client_id)
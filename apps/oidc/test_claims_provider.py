@@ -1,6 +1,13 @@
+from unittest import mock
 from django.test import TestCase
 from django.contrib.auth import get_user_model
-from .claims import get_claims_provider
+from .claims import (
+    BaseProvider,
+    get_claim_registry,
+    get_claims_provider,
+    get_requested_claims,
+)
+from .settings import oidc_settings
 
 UserModel = get_user_model()
 
@@ -21,3 +28,73 @@ class ClaimProviderTests(TestCase):
         cp = get_claims_provider()(user=self.test_user)
         claims = cp.get_claims()
         self.assertEqual(claims['email'], "test@example.com")
+
+    def test_get_requested_claims(self):
+        claims = '{"id_token": {"email": {"essential": true}}, "userinfo": {"phone_number": null}}'
+        self.assertEqual(get_requested_claims(claims, "id_token"), ["email"])
+        self.assertEqual(get_requested_claims(claims, "userinfo"), ["phone_number"])
+        self.assertEqual(get_requested_claims({"userinfo": {}}, "id_token"), None)
+        self.assertEqual(get_requested_claims("not json", "id_token"), None)
+        self.assertEqual(get_requested_claims(None, "id_token"), None)
+
+
+class FirstProvider(BaseProvider):
+
+    def claim_sub(self):
+        return "first"
+
+    def claim_vot(self):
+        return "P1.Cc"
+
+
+class SecondProvider(BaseProvider):
+    scope = "profile"
+
+    def claim_sub(self):
+        return None
+
+    def claim_vot(self):
+        vot = self.claims.get("vot")
+        return vot.replace("Cc", "C2") if vot else None
+
+    def claim_nickname(self):
+        return "second"
+
+
+@mock.patch.object(oidc_settings, "OIDC_CLAIM_SNAPSHOTS", False)
+@mock.patch.object(oidc_settings, "OIDC_CLAIM_PROVIDERS", [FirstProvider, SecondProvider])
+class ClaimRegistryTests(TestCase):
+
+    def test_registry(self):
+        registry = get_claim_registry()
+        self.assertEqual(registry.providers, (FirstProvider, SecondProvider))
+        self.assertEqual(registry.claims_supported, ["sub", "vot", "nickname"])
+        self.assertEqual(registry.claims["sub"], [FirstProvider, SecondProvider])
+        self.assertIs(get_claim_registry(), registry)
+
+    def test_override_order(self):
+        claims = get_claims_provider()().get_claims()
+        # None keeps the earlier value, later providers see earlier claims.
+        self.assertEqual(claims, {"sub": "first", "vot": "P1.C2", "nickname": "second"})
+
+    def test_scoped_plan(self):
+        self.assertEqual(get_claim_registry().claim_scopes, {"profile"})
+        for scopes in (["openid"], ["openid", "read"]):
+            claims = get_claims_provider()(scopes=scopes).get_claims()
+            self.assertEqual(claims, {"sub": "first", "vot": "P1.Cc"})
+
+    def test_openid_scope_all_claims(self):
+        with mock.patch.object(oidc_settings, "OIDC_OPENID_SCOPE_ALL_CLAIMS", True):
+            claims = get_claims_provider()(scopes=["openid"]).get_claims()
+        self.assertEqual(claims, {"sub": "first", "vot": "P1.C2", "nickname": "second"})
+
+    def test_requested_claims_plan(self):
+        provider = get_claims_provider()
+        # Only the requested claims among those granted, with the "openid" ones.
+        claims = provider(scopes=["openid", "profile"], requested_claims=["sub"]).get_claims()
+        self.assertEqual(claims, {"sub": "first", "vot": "P1.Cc"})
+        claims = provider(scopes=["openid", "profile"], requested_claims=["nickname"]).get_claims()
+        self.assertEqual(claims, {"sub": "first", "vot": "P1.Cc", "nickname": "second"})
+        # A request never adds a claim the scopes did not grant.
+        claims = provider(scopes=["openid"], requested_claims=["nickname"]).get_claims()
+        self.assertEqual(claims, {"sub": "first", "vot": "P1.Cc"})
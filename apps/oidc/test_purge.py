@@ -0,0 +1,80 @@
+from datetime import timedelta
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from oauth2_provider.models import (
+    get_access_token_model,
+    get_application_model,
+    get_grant_model,
+    get_refresh_token_model,
+)
+from apps.accounts.models import ValidPasswordResetKey
+from libs.purge import purge, purge_queryset
+from .purge import expired_access_tokens, expired_grants, revoked_refresh_tokens
+
+AccessToken = get_access_token_model()
+Application = get_application_model()
+Grant = get_grant_model()
+RefreshToken = get_refresh_token_model()
+UserModel = get_user_model()
+
+
+class PurgeTests(TestCase):
+
+    def setUp(self):
+        self.user = UserModel.objects.create_user("purge_user", "", "123456")
+        self.application = Application.objects.create(
+            name="Purge Application",
+            redirect_uris="http://localhost",
+            user=self.user,
+            client_type=Application.CLIENT_CONFIDENTIAL,
+            authorization_grant_type=Application.GRANT_AUTHORIZATION_CODE,
+        )
+        self.now = timezone.now()
+        for i in range(5):
+            self.create_token("expired-%d" % (i), -60)
+        self.live = self.create_token("live", 3600)
+        refreshable = self.create_token("refreshable", -60)
+        RefreshToken.objects.create(user=self.user, application=self.application,
+                                    token="refresh", access_token=refreshable)
+        RefreshToken.objects.create(user=self.user, application=self.application,
+                                    token="revoked", revoked=self.now - timedelta(days=1))
+        for i, seconds in enumerate((-60, 60)):
+            Grant.objects.create(user=self.user, application=self.application,
+                                 code="code-%d" % (i), redirect_uri="http://localhost",
+                                 expires=self.now + timedelta(seconds=seconds))
+
+    def create_token(self, token, seconds):
+        return AccessToken.objects.create(
+            user=self.user, application=self.application, token=token,
+            expires=self.now + timedelta(seconds=seconds))
+
+    def test_purge_in_batches(self):
+        rows, batches = purge_queryset(expired_access_tokens(self.now), batch_size=2)
+        self.assertEqual((rows, batches), (5, 3))
+        self.assertEqual(
+            set(AccessToken.objects.values_list("token", flat=True)),
+            {"live", "refreshable"})
+
+    def test_dry_run_deletes_nothing(self):
+        policies = [revoked_refresh_tokens, expired_access_tokens, expired_grants]
+        results = purge(policies, batch_size=10, dry_run=True)
+        self.assertEqual([r.rows for r in results], [1, 5, 1])
+        self.assertEqual(AccessToken.objects.count(), 7)
+
+        results = purge(policies, batch_size=10)
+        self.assertEqual([r.rows for r in results], [1, 5, 1])
+        self.assertEqual(RefreshToken.objects.get().token, "refresh")
+        self.assertEqual(Grant.objects.get().code, "code-1")
+
+    def test_command(self):
+        ValidPasswordResetKey.objects.create(user=self.user)
+        ValidPasswordResetKey.objects.update(expires=self.now - timedelta(days=1))
+        out = StringIO()
+        call_command("purge_expired", "--dry-run", stdout=out)
+        self.assertIn("Would delete 8 rows.", out.getvalue())
+        call_command("purge_expired", stdout=out)
+        self.assertIn("Deleted 8 rows.", out.getvalue())
+        self.assertFalse(ValidPasswordResetKey.objects.exists())
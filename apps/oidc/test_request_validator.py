@@ -1,6 +1,8 @@
 import base64
 import json
+from datetime import timedelta
 from django.test import TestCase
+from django.utils import timezone
 from oauth2_provider.models import (
     get_access_token_model,
     get_application_model,
@@ -10,6 +12,8 @@ from oauth2_provider.models import (
 from django.contrib.auth import get_user_model
 from urllib.parse import parse_qs, urlencode, urlparse
 from django.urls import reverse
+from apps.accounts.models import UserProfile
+from vmi.oauth2_validators import get_reusable_token, normalize_scope
 from .jwt import get_jwt_builder
 
 
@@ -118,6 +122,40 @@ class RequestValidatorTests(TestCase):
             audience=self.application.client_id)
         self.assertEqual(claims['sub'], self.test_user.id)
 
+    def get_id_token_claims(self, **params):
+        self.client.login(username="test_user", password="123456")
+        # Approved on the authorization form, which carries the claims request.
+        response = self.client.post(reverse("oauth2_provider:authorize"), data=dict({
+            "client_id": self.application.client_id,
+            "state": "random_state_string",
+            "redirect_uri": "http://example.org",
+            "response_type": "code",
+            "allow": True,
+        }, **params))
+        authorization_code = parse_qs(urlparse(response["Location"]).query)["code"].pop()
+        response = self.client.post(
+            reverse("oauth2_provider:token"),
+            data={"grant_type": "authorization_code",
+                  "code": authorization_code,
+                  "redirect_uri": "http://example.org"},
+            **get_basic_auth_header(self.application.client_id, self.application.client_secret))
+        id_token = json.loads(response.content.decode("utf-8"))["id_token"]
+        return JWTBuilder().decode(id_token, audience=self.application.client_id)
+
+    def test_claims_request_narrows_the_id_token(self):
+        UserProfile.objects.create(user=self.test_user)
+        claims = self.get_id_token_claims(scope="openid email address")
+        self.assertEqual(claims["email"], "test@example.com")
+        self.assertIn("address", claims)
+        claims = self.get_id_token_claims(
+            scope="openid email address", claims=json.dumps({"id_token": {"email": None}}))
+        self.assertEqual(claims["email"], "test@example.com")
+        self.assertNotIn("address", claims)
+        # The claims request never adds a claim the scopes did not grant.
+        claims = self.get_id_token_claims(
+            scope="openid", claims=json.dumps({"id_token": {"email": None}}))
+        self.assertNotIn("email", claims)
+
     def test_standard_oauth_implicit_works(self):
         """
         If application.skip_authorization = True,
@@ -164,3 +202,48 @@ class RequestValidatorTests(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 302)
         self.assertIn("error", response["Location"])
+
+
+class ReusableAccessTokenTests(TestCase):
+
+    def setUp(self):
+        self.user = UserModel.objects.create_user(
+            "reuse_user",
+            "reuse@example.com",
+            "123456")
+        self.application = Application.objects.create(
+            name="Reuse Application",
+            redirect_uris="http://localhost",
+            user=self.user,
+            client_type=Application.CLIENT_CONFIDENTIAL,
+            authorization_grant_type=Application.GRANT_AUTHORIZATION_CODE,
+        )
+
+    def create_token(self, token, scope, seconds=3600):
+        return AccessToken.objects.create(
+            user=self.user, application=self.application, token=token,
+            scope=scope, expires=timezone.now() + timedelta(seconds=seconds))
+
+    def test_reuses_token_with_all_scopes(self):
+        self.create_token("short", "openid profile", seconds=60)
+        longest = self.create_token("long", "email openid profile")
+        RefreshToken.objects.create(
+            user=self.user, application=self.application,
+            token="refresh", access_token=longest)
+        self.create_token("expired", "openid profile", seconds=-60)
+        with self.assertNumQueries(1):
+            token = get_reusable_token(self.user, self.application, ["profile", "openid"])
+            self.assertEqual(token.token, "long")
+            self.assertEqual(token.refresh_token.token, "refresh")
+
+    def test_scopes_must_match_whole_words(self):
+        self.create_token("token", "openid profile_extra")
+        self.assertIsNone(get_reusable_token(self.user, self.application, ["profile"]))
+        self.assertEqual(get_reusable_token(self.user, self.application, []).token, "token")
+
+    def test_expired_tokens_are_not_reused(self):
+        self.create_token("expired", "openid", seconds=-60)
+        self.assertIsNone(get_reusable_token(self.user, self.application, ["openid"]))
+
+    def test_normalize_scope(self):
+        self.assertEqual(normalize_scope(["profile", "openid", "profile"]), "openid profile")
@@ -0,0 +1,159 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+from django.test import SimpleTestCase
+from django.urls import reverse
+from .jwt import get_jwt_builder
+from .secrets import (
+    FileKeyStore,
+    RSA256Keys,
+    get_key_ring,
+    key_cache,
+    reload_keys,
+)
+from .settings import oidc_settings
+
+JWTBuilder = get_jwt_builder()
+
+
+class TempKeyStoreMixin(object):
+
+    def setUp(self):
+        self.key_dir = tempfile.mkdtemp()
+
+        class TempFileKeyStore(FileKeyStore):
+            _private_key_file = os.path.join(self.key_dir, "private.pem")
+            _public_key_file = os.path.join(self.key_dir, "public.pem")
+            _key_ring_file = os.path.join(self.key_dir, "keyring.json")
+
+        patcher = mock.patch.object(
+            oidc_settings, "OIDC_KEY_STORAGE", TempFileKeyStore)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.key_dir)
+        self.addCleanup(reload_keys)
+        reload_keys()
+
+
+class KeyCacheTests(TempKeyStoreMixin, SimpleTestCase):
+
+    def test_keys_are_parsed_once(self):
+        first = RSA256Keys().get_signing_key()
+        with mock.patch.object(FileKeyStore, "key_ring",
+                               new_callable=mock.PropertyMock) as key_ring:
+            self.assertIs(RSA256Keys().get_signing_key(), first)
+            self.assertIs(RSA256Keys().get_public_jwk(),
+                          RSA256Keys().get_public_jwk())
+            key_ring.assert_not_called()
+
+    def test_rewritten_key_files_are_picked_up(self):
+        kid = RSA256Keys().get_public_jwk()["kid"]
+        RSA256Keys().generate_keys(reload=False)
+        os.utime(oidc_settings.OIDC_KEY_STORAGE._key_ring_file,
+                 ns=(0, 0))
+        with mock.patch.object(oidc_settings,
+                               "OIDC_KEY_CACHE_CHECK_INTERVAL", 0):
+            self.assertNotEqual(RSA256Keys().get_public_jwk()["kid"], kid)
+
+    def test_key_files_rewritten_while_loading_are_picked_up(self):
+        load = key_cache._load
+
+        def load_then_rewrite(storage):
+            ring = load(storage)
+            RSA256Keys().generate_keys(reload=False)
+            os.utime(storage._key_ring_file, ns=(0, 0))
+            return ring
+
+        with mock.patch.object(oidc_settings,
+                               "OIDC_KEY_CACHE_CHECK_INTERVAL", 0):
+            with mock.patch.object(key_cache, "_load", load_then_rewrite):
+                kid = RSA256Keys().get_public_jwk()["kid"]
+            self.assertNotEqual(RSA256Keys().get_public_jwk()["kid"], kid)
+
+    def test_reload_hook(self):
+        kid = RSA256Keys().get_public_jwk()["kid"]
+        RSA256Keys().generate_keys()
+        self.assertIsNot(key_cache.get(), None)
+        self.assertNotEqual(RSA256Keys().get_public_jwk()["kid"], kid)
+
+    def test_encode_decode_roundtrip(self):
+        token = JWTBuilder().encode({"sub": "123", "aud": "client"})
+        claims = JWTBuilder().decode(token, audience="client")
+        self.assertEqual(claims["sub"], "123")
+
+
+class KeyRingTests(TempKeyStoreMixin, SimpleTestCase):
+
+    def test_rotation(self):
+        RSA256Keys().publish_next_key()
+        ring = get_key_ring()
+        active_kid = ring.active.kid
+        next_kid = ring.keys[1].kid
+        token = JWTBuilder().encode({"sub": "123", "aud": "client"})
+
+        RSA256Keys().rotate()
+        ring = get_key_ring()
+        self.assertEqual(ring.active.kid, next_kid)
+        self.assertEqual([k.status for k in ring.keys],
+                         ["active", "next", "retired"])
+        self.assertEqual(ring.keys[2].kid, active_kid)
+        # Tokens signed with the retired key still verify.
+        claims = JWTBuilder().decode(token, audience="client")
+        self.assertEqual(claims["sub"], "123")
+
+    def test_rotation_rewrites_only_the_key_ring(self):
+        storage = oidc_settings.OIDC_KEY_STORAGE()
+        RSA256Keys().publish_next_key()
+        next_key = storage.key_ring["next"]
+        with mock.patch.object(FileKeyStore, "store_private") as store_private, \
+                mock.patch.object(FileKeyStore, "store_public") as store_public:
+            RSA256Keys().rotate()
+        store_private.assert_not_called()
+        store_public.assert_not_called()
+        self.assertEqual(storage.key_ring["active"], next_key)
+        self.assertFalse(os.path.exists(storage._private_key_file))
+
+    def test_pem_keys_are_active_until_the_first_rotation(self):
+        storage = oidc_settings.OIDC_KEY_STORAGE()
+        key = RSA256Keys().new_key()
+        storage.store_private(key["private"].encode())
+        storage.store_public(key["public"].encode())
+        RSA256Keys().publish_next_key()
+        self.assertEqual(get_key_ring().active.public_pem, key["public"])
+        RSA256Keys().rotate()
+        ring = get_key_ring()
+        self.assertEqual(ring.active.public_pem, storage.key_ring["active"]["public"])
+        self.assertEqual(ring.keys[2].public_pem, key["public"])
+
+    def test_retired_keys_are_trimmed(self):
+        with mock.patch.object(oidc_settings, "OIDC_KEY_RING_RETIRED_KEYS", 1):
+            RSA256Keys().rotate()
+            RSA256Keys().rotate()
+        self.assertEqual(len(get_key_ring().keys), 3)
+
+    def test_rotation_due(self):
+        self.assertFalse(RSA256Keys().rotation_due(90))
+        RSA256Keys().publish_next_key()
+        self.assertFalse(RSA256Keys().rotation_due(90))
+        self.assertTrue(RSA256Keys().rotation_due(0))
+
+    def test_jwks_uri(self):
+        RSA256Keys().publish_next_key()
+        response = self.client.get(reverse("jwks_uri"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("max-age", response["Cache-Control"])
+        jwks = json.loads(response.content.decode())
+        self.assertEqual([k["kid"] for k in jwks["keys"]],
+                         [k.kid for k in get_key_ring().keys])
+
+        response = self.client.get(reverse("jwks_uri"),
+                                   HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn("max-age", response["Cache-Control"])
+
+        RSA256Keys().rotate()
+        response = self.client.get(reverse("jwks_uri"),
+                                   HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
@@ -1,11 +1,17 @@
 # TODO Split these up
+import hashlib
 import logging
 import datetime
+import json
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.renderers import JSONRenderer
 from rest_framework import permissions
+from django.http import HttpResponse
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.generic import View
 from oauthlib.oauth2.rfc6749.grant_types import OIDCNoPrompt
 from oauth2_provider import scopes
 from oauth2_provider.exceptions import OAuthToolkitError
@@ -14,8 +20,12 @@ from oauth2_provider.settings import oauth2_settings
 from oauth2_provider.views.base import (
     AuthorizationView as OAuth2AuthorizationView
 )
+from oauth2_provider.views.introspect import (
+    IntrospectTokenView as OAuth2IntrospectTokenView
+)
+from .access_tokens import get_token_id
 from .settings import oidc_settings
-from .claims import get_claims_provider
+from .claims import get_claim_registry, get_claims_provider
 from .jwt import get_jwt_builder
 from .forms import NonceAllowForm
 from .exceptions import AuthenticationRequired
@@ -26,12 +36,35 @@ Scopes = scopes.get_scopes_backend()
 ClaimsProvider = get_claims_provider()
 
 
-class Wellknown(APIView):
-    renderer_classes = [JSONRenderer]
+class DiscoveryDocument(object):
+    """
+    The OpenID Provider configuration, built and serialized once.
 
-    def get(self, request, format=None):
+    ``version`` holds the settings and the claim registry the document is
+    built from; the document is rebuilt when one of them is replaced. The
+    ETag is derived from the body, so every process serves the same one.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.document = self.build()
+        self.body = json.dumps(
+            self.document, sort_keys=True, separators=(",", ":")).encode()
+        self.etag = hashlib.sha256(self.body).hexdigest()
+
+    @classmethod
+    def get_version(cls):
+        return (oidc_settings.OIDC_ISSUER,
+                Scopes.get_all_scopes(),
+                get_claim_registry())
+
+    def is_current(self, version):
+        # Settings and registries are replaced, never changed in place, so
+        # an identity check is enough.
+        return all(old is new for old, new in zip(self.version, version))
 
-        return Response({
+    def build(self):
+        return {
             # TODO get this from oauth server config
             "grant_types_supported": [
                 "authorization_code",
@@ -58,19 +91,58 @@ class Wellknown(APIView):
                 oidc_settings.OIDC_ISSUER + reverse("registration_endpoint"),
             "response_types_supported":
                 oauth2_settings.OAUTH2_SERVER_CLASS.get_all_response_types(),
-            "scopes_supported": Scopes.get_all_scopes().keys(),
-            "claims_supported": ClaimsProvider.get_supported_claims(),
+            "scopes_supported": list(Scopes.get_all_scopes().keys()),
+            "claims_supported": list(ClaimsProvider.get_supported_claims()),
+            "claims_parameter_supported": True,
             "jwks_uri": oidc_settings.OIDC_ISSUER + reverse("jwks_uri"),
             "subject_types_supported": ["public", ],
-        })
+        }
 
 
-class JWKSURI(APIView):
-    renderer_classes = [JSONRenderer]
+_discovery_document = None
 
-    def get(self, request, format=None):
-        return Response({
-            "keys": [get_jwt_builder().get_jwks()]})
+
+def get_discovery_document():
+    global _discovery_document
+    version = DiscoveryDocument.get_version()
+    document = _discovery_document
+    if document is None or not document.is_current(version):
+        document = _discovery_document = DiscoveryDocument(version)
+    return document
+
+
+class Wellknown(View):
+    """Serve the discovery document, serialized once per process."""
+
+    def get(self, request, *args, **kwargs):
+        document = get_discovery_document()
+        return cacheable_json_response(request, document.body,
+                                       document.etag,
+                                       oidc_settings.OIDC_DISCOVERY_MAX_AGE)
+
+
+def cacheable_json_response(request, body, etag, max_age):
+    """
+    Answer with a precomputed JSON body, or with a 304 when the client
+    already holds it. Both carry the same validators and Cache-Control.
+    """
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+
+class JWKSURI(View):
+    """Serve the key ring's JWKS, serialized once per key ring version."""
+
+    def get(self, request, *args, **kwargs):
+        key_ring = get_jwt_builder().get_key_ring()
+        return cacheable_json_response(request, key_ring.jwks_body,
+                                       key_ring.etag,
+                                       oidc_settings.OIDC_JWKS_MAX_AGE)
 
 
 ClaimsProvider = get_claims_provider()
@@ -80,15 +152,27 @@ class UserInfo(APIView):
     permission_classes = [permissions.IsAuthenticated]
     renderer_classes = [JSONRenderer]
 
+    def get_claims(self, request):
+        # Only the claims granted to the access token's scopes.
+        scope = getattr(request.auth, 'scope', None)
+        scopes = scope.split() if scope is not None else None
+        cp = ClaimsProvider(user=request.user, token=None, request=request,
+                            scopes=scopes)
+        return cp.get_claims()
+
     def get(self, request, format=None):
-        cp = ClaimsProvider(user=request.user, token=None, request=request)
-        claims = cp.get_claims()
-        return Response(claims)
+        return Response(self.get_claims(request))
 
     def post(self, request, format=None):
-        cp = ClaimsProvider(user=request.user, token=None, request=request)
-        claims = cp.get_claims()
-        return Response(claims)
+        return Response(self.get_claims(request))
+
+
+class IntrospectTokenView(OAuth2IntrospectTokenView):
+    """Also introspect JWT access tokens, saved under their jti."""
+
+    @staticmethod
+    def get_token_response(token_value=None):
+        return OAuth2IntrospectTokenView.get_token_response(get_token_id(token_value))
 
 
 class AuthorizationView(OAuth2AuthorizationView):
@@ -103,6 +187,7 @@ class AuthorizationView(OAuth2AuthorizationView):
     def get_initial(self):
         initial_data = super().get_initial()
         initial_data["nonce"] = self.oauth2_data.get("nonce", None)
+        initial_data["claims"] = self.oauth2_data.get("claims", None)
         return initial_data
 
     def validate_authorization_request(self, request):
@@ -137,6 +222,7 @@ class AuthorizationView(OAuth2AuthorizationView):
 
     def get(self, request, *args, **kwargs):
         kwargs['nonce'] = request.GET.get('nonce', None)
+        kwargs['claims'] = request.GET.get('claims', None)
         return super().get(request, *args, **kwargs)
 
     def form_valid(self, form):
@@ -148,6 +234,7 @@ class AuthorizationView(OAuth2AuthorizationView):
             "response_type": form.cleaned_data.get("response_type", None),
             "state": form.cleaned_data.get("state", None),
             "nonce": form.cleaned_data.get("nonce", None),
+            "claims": form.cleaned_data.get("claims", None) or None,
         }
         scopes = form.cleaned_data.get("scope")
         allow = form.cleaned_data.get("allow")
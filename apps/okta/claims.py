@@ -9,13 +9,21 @@ __author__ = "Alan Viars"
 
 
 class AuthenticatorAssuranceProvider(BaseProvider):
+    select_related = ('upstreamidentityprovideruserauthenticatorassurance', )
+
+    def get_upstream_assurance(self):
+        # Read through the relation so the claim context's join is reused.
+        try:
+            return self.user.upstreamidentityprovideruserauthenticatorassurance
+        except UpstreamIdentityProviderUserAuthenticatorAssurance.DoesNotExist:
+            return None
 
     def claim_aal(self):
         try:
             if self.user:
-                upstream_aal = UpstreamIdentityProviderUserAuthenticatorAssurance.objects.filter(user=self.user)
+                upstream_aal = self.get_upstream_assurance()
                 if upstream_aal:
-                    return upstream_aal[0].aal
+                    return upstream_aal.aal
         except Exception as e:
             print(e)
             logger.debug(e)
@@ -23,9 +31,9 @@ class AuthenticatorAssuranceProvider(BaseProvider):
 
     def claim_amr(self):
         try:
-            upsteam = UpstreamIdentityProviderUserAuthenticatorAssurance.objects.filter(user=self.user)
+            upsteam = self.get_upstream_assurance()
             if upsteam:
-                return upsteam[0].amr_list
+                return upsteam.amr_list
             else:
                 msg = "No upstream Authenticator Assurance record for user %s" % (self.user)
                 print(msg)
@@ -39,12 +47,12 @@ class AuthenticatorAssuranceProvider(BaseProvider):
         # https://tools.ietf.org/html/rfc8485
         try:
             if self.user:
-                upstream_aal = UpstreamIdentityProviderUserAuthenticatorAssurance.objects.filter(user=self.user)
+                upstream_aal = self.get_upstream_assurance()
                 if upstream_aal:
                     vot = self.claims.get("vot", False)
                     if vot:
                         parts = vot.split(".")
-                        parts[1] = "C%s" % (upstream_aal[0].aal)
+                        parts[1] = "C%s" % (upstream_aal.aal)
                         return ".".join(parts)
                 return None
 
@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ReportsConfig(AppConfig):
-    name = 'reports'
+    name = 'apps.reports'
+    verbose_name = "Reports"
+
+    def ready(self):
+        if settings.REPORT_COUNTS_LIVE:
+            from .signals import connect_report_count_signals
+            connect_report_count_signals()
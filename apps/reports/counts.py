@@ -0,0 +1,206 @@
+"""
+Report counts, kept up to date as the counted rows change.
+
+The summary tables hold the number of users per organization and IAL, per
+IAL, per MFA method and per signup day, so a dashboard reads a handful of
+rows however many users there are. Each user's UserFact records the state
+the user is counted in; refresh_users() compares it with the user's
+current state and applies only the difference. Signals (see signals.py)
+refresh the users whose rows change, and bulk writes that send no signal
+call users_changed() themselves. "manage.py rebuild_report_counts"
+recomputes every count from the live tables.
+
+The user facts are written in the caller's transaction, but the shared
+count rows are only updated once it commits, in a short transaction of
+their own, so concurrent signups don't queue behind each other's row
+locks. A process that dies in between leaves counts for the rebuild to
+correct.
+"""
+import logging
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from ..accounts.member_import import chunked
+from ..accounts.models import Organization
+from ..fido.models import AttestedCredentialData
+from ..mfa.backends.sms.models import SMSDevice
+from .models import IALCount, MFACount, OrganizationCount, SignupCount, UserFact
+
+logger = logging.getLogger('verifymyidentity_.%s' % __name__)
+
+MEMBERS = 'members'
+AGENTS = 'agents'
+COUNT_MODELS = (OrganizationCount, IALCount, MFACount, SignupCount)
+FACT_FIELDS = ['ial_level', 'sms', 'fido', 'agent', 'joined_on']
+COUNT_FIELDS = ('members', 'agents', 'users')
+
+
+def get_memberships():
+    """The through model of each role."""
+    return {MEMBERS: Organization.members.through, AGENTS: Organization.users.through}
+
+
+class Tally(object):
+    """Changes to the counts, made with one update per count row."""
+
+    def __init__(self):
+        self.changes = defaultdict(Counter)
+
+    def add(self, model, key, **deltas):
+        self.changes[(model, tuple(sorted(key.items())))].update(deltas)
+
+    def add_fact(self, fact, sign):
+        agents = sign if fact.agent else 0
+        self.add(IALCount, {'ial_level': fact.ial_level}, users=sign, agents=agents)
+        for method in fact.mfa_methods:
+            self.add(MFACount, {'method': method}, users=sign, agents=agents)
+        self.add(SignupCount, {'day': fact.joined_on}, users=sign)
+
+    def add_membership(self, role, organization_id, fact, sign):
+        self.add(OrganizationCount, {'organization_id': organization_id, 'ial_level': fact.ial_level},
+                 **{role: sign})
+
+    def items(self):
+        # In a fixed order, so concurrent tallies lock the rows in the same order.
+        for (model, key), deltas in sorted(self.changes.items(), key=lambda i: (i[0][0]._meta.label, i[0][1])):
+            deltas = {field: delta for field, delta in deltas.items() if delta}
+            if deltas:
+                yield model, dict(key), deltas
+
+    @transaction.atomic
+    def apply(self):
+        for model, key, deltas in self.items():
+            updates = {field: F(field) + delta for field, delta in deltas.items()}
+            if not model.objects.filter(**key).update(**updates):
+                model.objects.get_or_create(**key)
+                model.objects.filter(**key).update(**updates)
+
+    def apply_on_commit(self):
+        """Apply the changes once the current transaction commits, and not if it rolls back."""
+        if self.changes:
+            transaction.on_commit(self.apply)
+
+    def create(self):
+        """Insert the counts, into empty tables."""
+        rows = defaultdict(list)
+        for model, key, deltas in self.items():
+            rows[model].append(model(**key, **deltas))
+        for model, objs in rows.items():
+            model.objects.bulk_create(objs)
+
+
+def current_facts(user_ids):
+    """The current state of each of ``user_ids`` that exists, as unsaved UserFacts."""
+    users = get_user_model().objects.filter(pk__in=user_ids).annotate(
+        has_sms=Exists(SMSDevice.objects.filter(user=OuterRef('pk'))),
+        has_fido=Exists(AttestedCredentialData.objects.filter(user=OuterRef('pk'))),
+        is_agent=Exists(Organization.users.through.objects.filter(user=OuterRef('pk'))),
+    ).values_list('pk', 'userprofile__ial_level', 'has_sms', 'has_fido', 'is_agent', 'date_joined')
+    return {pk: UserFact(user_id=pk, ial_level=ial_level or 1, sms=sms, fido=fido, agent=agent,
+                         joined_on=timezone.localdate(date_joined))
+            for pk, ial_level, sms, fido, agent, date_joined in users}
+
+
+def get_user_memberships(user_ids):
+    """(role, organization id, user id) of each membership of ``user_ids``."""
+    for role, through in get_memberships().items():
+        for organization_id, user_id in through.objects.filter(user_id__in=user_ids).values_list(
+                'organization_id', 'user_id'):
+            yield role, organization_id, user_id
+
+
+@transaction.atomic
+def refresh_users(user_ids, deleted=False):
+    """
+    Count ``user_ids`` in their current state, or not at all when they are
+    about to be ``deleted``. Returns the number of users whose counts changed.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return 0
+    stored = UserFact.objects.select_for_update().in_bulk(user_ids)
+    current = {} if deleted else current_facts(user_ids)
+    changed = {user_id for user_id in set(stored) | set(current)
+               if not (user_id in current and current[user_id].same_as(stored.get(user_id)))}
+    if not changed:
+        return 0
+    tally = Tally()
+    for role, organization_id, user_id in get_user_memberships(changed):
+        for facts, sign in ((stored, -1), (current, 1)):
+            if user_id in facts:
+                tally.add_membership(role, organization_id, facts[user_id], sign)
+    for user_id in changed:
+        if user_id in stored:
+            tally.add_fact(stored[user_id], -1)
+        if user_id in current:
+            tally.add_fact(current[user_id], 1)
+    tally.apply_on_commit()
+    UserFact.objects.bulk_create([current[user_id] for user_id in changed
+                                  if user_id in current and user_id not in stored])
+    UserFact.objects.bulk_update([current[user_id] for user_id in changed
+                                  if user_id in current and user_id in stored], FACT_FIELDS)
+    UserFact.objects.filter(pk__in=[user_id for user_id in changed if user_id not in current]).delete()
+    return len(changed)
+
+
+@transaction.atomic
+def count_memberships(role, pairs, sign):
+    """
+    Count the memberships ``pairs`` of (organization id, user id) in (``sign``
+    1) or out (-1). Call it before the memberships are added or removed.
+    """
+    refresh_users({user_id for organization_id, user_id in pairs})
+    facts = UserFact.objects.in_bulk({user_id for organization_id, user_id in pairs})
+    tally = Tally()
+    for organization_id, user_id in pairs:
+        if user_id in facts:
+            tally.add_membership(role, organization_id, facts[user_id], sign)
+    tally.apply_on_commit()
+
+
+def users_changed(user_ids):
+    """Refresh the counts of users changed by a bulk write that sends no signal."""
+    if settings.REPORT_COUNTS_LIVE:
+        refresh_users(user_ids)
+
+
+def counts_by_key():
+    """Every count row but the zeroes as {(model, key...): (count...)}."""
+    counts = {}
+    for model in COUNT_MODELS:
+        fields = [f.attname for f in model._meta.concrete_fields if not f.primary_key]
+        keys = [f for f in fields if f not in COUNT_FIELDS]
+        for row in model.objects.values_list(*keys + [f for f in fields if f in COUNT_FIELDS]):
+            if any(row[len(keys):]):
+                counts[(model._meta.label, ) + row[:len(keys)]] = row[len(keys):]
+    return counts
+
+
+@transaction.atomic
+def rebuild(batch_size=None):
+    """
+    Recompute every count from the live tables. Returns the number of count
+    rows that were missing, stale or left over.
+    """
+    batch_size = batch_size or settings.REPORT_COUNTS_BATCH_SIZE
+    before = counts_by_key()
+    UserFact.objects.all().delete()
+    for model in COUNT_MODELS:
+        model.objects.all().delete()
+    tally = Tally()
+    user_ids = list(get_user_model().objects.order_by('pk').values_list('pk', flat=True))
+    for batch in chunked(user_ids, batch_size):
+        facts = current_facts(batch)
+        UserFact.objects.bulk_create(facts.values())
+        for fact in facts.values():
+            tally.add_fact(fact, 1)
+        for role, organization_id, user_id in get_user_memberships(batch):
+            tally.add_membership(role, organization_id, facts[user_id], 1)
+    tally.create()
+    after = counts_by_key()
+    wrong = sum(1 for key in set(before) | set(after) if before.get(key) != after.get(key))
+    logger.info("Rebuilt the report counts, %d were wrong.", wrong)
+    return wrong
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ...counts import rebuild
+
+
+class Command(BaseCommand):
+    help = ('Recompute the report counts from the users, memberships, IAL '
+            'documentation and MFA devices, correcting any that drifted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.REPORT_COUNTS_BATCH_SIZE,
+                            help='Users counted per query.')
+
+    def handle(self, *args, **options):
+        wrong = rebuild(batch_size=options['batch_size'])
+        self.stdout.write("Rebuilt the report counts, %d were wrong." % (wrong))
@@ -0,0 +1,68 @@
+# Generated by Django 2.2.20 on 2026-10-18 20:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('accounts', '0037_usersession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IALCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ial_level', models.PositiveSmallIntegerField(unique=True)),
+                ('users', models.IntegerField(default=0)),
+                ('agents', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MFACount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(blank=True, choices=[('', 'None'), ('FIDO', 'FIDO U2F or FIDO 2.0'), ('SMS', 'Text Message (SMS)')], max_length=8, unique=True)),
+                ('users', models.IntegerField(default=0)),
+                ('agents', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SignupCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('users', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserFact',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='report_fact', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('ial_level', models.PositiveSmallIntegerField(default=1)),
+                ('sms', models.BooleanField(default=False)),
+                ('fido', models.BooleanField(default=False)),
+                ('agent', models.BooleanField(default=False)),
+                ('joined_on', models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrganizationCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ial_level', models.PositiveSmallIntegerField()),
+                ('members', models.IntegerField(default=0)),
+                ('agents', models.IntegerField(default=0)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_counts', to='accounts.Organization')),
+            ],
+            options={
+                'unique_together': {('organization', 'ial_level')},
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.db import models
+from ..accounts.models import Organization
+
+# The MFA methods counted. A user with neither is counted under NONE.
+NONE = ''
+FIDO = 'FIDO'
+SMS = 'SMS'
+MFA_METHOD_CHOICES = ((NONE, 'None'),
+                      (FIDO, 'FIDO U2F or FIDO 2.0'),
+                      (SMS, 'Text Message (SMS)'))
+
+
+class UserFact(models.Model):
+    """
+    The state of a user as last counted. When a signal reports a change, the
+    counts are adjusted by the difference between it and the user's current
+    state. See apps.reports.counts.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                primary_key=True, related_name='report_fact')
+    ial_level = models.PositiveSmallIntegerField(default=1)
+    sms = models.BooleanField(default=False)
+    fido = models.BooleanField(default=False)
+    # An agent of at least one organization.
+    agent = models.BooleanField(default=False)
+    joined_on = models.DateField()
+
+    def __str__(self):
+        return str(self.user_id)
+
+    @property
+    def mfa_methods(self):
+        methods = [method for method, enrolled in ((FIDO, self.fido), (SMS, self.sms)) if enrolled]
+        return methods or [NONE]
+
+    def same_as(self, other):
+        return other is not None and all(
+            getattr(self, f) == getattr(other, f) for f in ('ial_level', 'sms', 'fido', 'agent', 'joined_on'))
+
+
+class OrganizationCount(models.Model):
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='report_counts')
+    ial_level = models.PositiveSmallIntegerField()
+    members = models.IntegerField(default=0)
+    agents = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = (('organization', 'ial_level'), )
+
+    def __str__(self):
+        return "%s IAL%d" % (self.organization_id, self.ial_level)
+
+
+class IALCount(models.Model):
+    ial_level = models.PositiveSmallIntegerField(unique=True)
+    users = models.IntegerField(default=0)
+    agents = models.IntegerField(default=0)
+
+    def __str__(self):
+        return "IAL%d" % (self.ial_level)
+
+
+class MFACount(models.Model):
+    method = models.CharField(max_length=8, choices=MFA_METHOD_CHOICES, unique=True, blank=True)
+    users = models.IntegerField(default=0)
+    agents = models.IntegerField(default=0)
+
+    def __str__(self):
+        return self.get_method_display()
+
+
+class SignupCount(models.Model):
+    day = models.DateField(unique=True)
+    users = models.IntegerField(default=0)
+
+    def __str__(self):
+        return str(self.day)
@@ -0,0 +1,202 @@
+"""
+CSV reports, streamed as they are read.
+
+A report is a Report subclass listed in settings.REPORTS and served at
+reports/<slug>.csv. Its rows() reads querysets with iterator(chunk_size=...),
+so memory use and the time to the first byte stay flat however many rows
+there are. The related columns a report needs are joined into its one
+query with values_list() rather than fetched per row or built into model
+instances, and many-to-many reports iterate the through table instead of
+each object's related manager. The summary reports read the counts kept
+by apps.reports.counts.
+
+Each report names the group allowed to download it. Reports of
+organizations only cover the organizations the requester is an agent of,
+or every organization for superusers; the site-wide counts are for staff.
+"""
+import csv
+import io
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils.module_loading import import_string
+from social_django.models import UserSocialAuth
+from ..accounts.models import Organization
+from ..fido.models import AttestedCredentialData
+from ..mfa.backends.sms.models import SMSDevice
+from .models import IALCount, MFACount, OrganizationCount, SignupCount
+
+# Characters written before a part of the report is sent.
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def yes_no(value):
+    return "Y" if value else "N"
+
+
+class Report(object):
+    slug = None
+    title = None
+    header = ()
+    # Members of this group, and superusers, may download the report.
+    group = "OrganizationAgentReport"
+    # Whether the members of the group must also be staff.
+    staff_only = False
+
+    def __init__(self, user=None, chunk_size=None):
+        # Without a user, e.g. from the shell, every organization is covered.
+        self.user = user
+        self.chunk_size = chunk_size or settings.REPORT_CHUNK_SIZE
+
+    @classmethod
+    def allows(cls, user, groups=None):
+        """Whether ``user``, a member of ``groups`` when known, may download the report."""
+        if not getattr(user, 'is_authenticated', False):
+            return False
+        if user.is_superuser:
+            return True
+        if cls.staff_only and not user.is_staff:
+            return False
+        if groups is None:
+            return user.groups.filter(name=cls.group).exists()
+        return cls.group in groups
+
+    def organizations(self):
+        """The organizations the report may cover."""
+        if self.user is None or self.user.is_superuser:
+            return Organization.objects.all()
+        return Organization.objects.filter(users=self.user)
+
+    def iterate(self, queryset):
+        return queryset.iterator(chunk_size=self.chunk_size)
+
+    def rows(self):
+        """Yield the rows of the report, each a list of cells."""
+        raise NotImplementedError
+
+    def stream(self):
+        """Yield the CSV text of the header and rows in parts of about STREAM_BUFFER_SIZE."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=',')
+        writer.writerow(self.header)
+        for row in self.rows():
+            writer.writerow(row)
+            if buffer.tell() >= STREAM_BUFFER_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+
+class OrganizationAgentsReport(Report):
+    slug = "organizations-and-agents"
+    title = "Organizations and Agents"
+    header = ("organization", "point_of_contact", "agent_first_name", "agent_last_name",
+              "agent_email", "agent_phone_number", "agent_last_login")
+
+    def rows(self):
+        agents = Organization.users.through.objects.filter(
+            organization__in=self.organizations()).order_by(
+            'organization__name', 'organization_id', 'pk').values_list(
+            'organization__name', 'organization__point_of_contact_id', 'user_id', 'user__first_name',
+            'user__last_name', 'user__email', 'user__userprofile__mobile_phone_number', 'user__last_login')
+        for name, point_of_contact_id, user_id, first_name, last_name, email, phone_number, last_login \
+                in self.iterate(agents):
+            yield [name, yes_no(point_of_contact_id == user_id), first_name, last_name, email,
+                   phone_number or "", last_login]
+
+
+class MembersByOrganizationReport(Report):
+    slug = "members-by-organization"
+    title = "Members by Organization"
+    header = ("organization", "member_subject", "member_first_name", "member_last_name",
+              "member_email", "member_ial", "member_date_joined")
+    group = "MembersByOrganizationReport"
+
+    def rows(self):
+        return self.iterate(Organization.members.through.objects.filter(
+            organization__in=self.organizations()).order_by(
+            'organization__name', 'organization_id', 'pk').values_list(
+            'organization__name', 'user__userprofile__subject', 'user__first_name', 'user__last_name',
+            'user__email', 'user__userprofile__ial_level', 'user__date_joined'))
+
+
+class IALDistributionReport(Report):
+    slug = "ial-distribution"
+    title = "Identity Assurance Levels"
+    header = ("ial", "users", "agents")
+    staff_only = True
+
+    def rows(self):
+        return IALCount.objects.order_by('ial_level').values_list('ial_level', 'users', 'agents')
+
+
+class OrganizationCountsReport(Report):
+    slug = "organization-counts"
+    title = "Members and Agents by Organization and IAL"
+    header = ("organization", "ial", "members", "agents")
+
+    def rows(self):
+        return self.iterate(OrganizationCount.objects.filter(
+            organization__in=self.organizations()).order_by(
+            'organization__name', 'organization_id', 'ial_level').values_list(
+            'organization__name', 'ial_level', 'members', 'agents'))
+
+
+class MFACountsReport(Report):
+    slug = "mfa-counts"
+    title = "Users and Agents by MFA Method"
+    header = ("mfa_method", "users", "agents")
+    staff_only = True
+
+    def rows(self):
+        for count in MFACount.objects.order_by('method'):
+            yield [count.get_method_display(), count.users, count.agents]
+
+
+class SignupCountsReport(Report):
+    slug = "signups"
+    title = "Signups by Day"
+    header = ("day", "users")
+    staff_only = True
+
+    def rows(self):
+        return self.iterate(SignupCount.objects.order_by('day').values_list('day', 'users'))
+
+
+class MFAEnrollmentReport(Report):
+    slug = "mfa-enrollment"
+    title = "MFA Enrollment"
+    header = ("subject", "username", "email", "sms", "sms_phone_number", "fido")
+    group = "MFAEnrollmentReport"
+
+    def rows(self):
+        sms_devices = SMSDevice.objects.filter(user=OuterRef('pk')).order_by('pk')
+        users = get_user_model().objects.annotate(
+            sms_phone_number=Subquery(sms_devices.values('phone_number')[:1]),
+            fido=Exists(AttestedCredentialData.objects.filter(user=OuterRef('pk'))),
+        ).order_by('pk').values_list(
+            'userprofile__subject', 'username', 'email', 'sms_phone_number', 'fido')
+        for subject, username, email, sms_phone_number, fido in self.iterate(users):
+            yield [subject, username, email, yes_no(sms_phone_number), sms_phone_number, yes_no(fido)]
+
+
+class UpstreamIdPLinksReport(Report):
+    slug = "upstream-idp-links"
+    title = "Upstream Identity Provider Links"
+    header = ("provider", "uid", "subject", "username", "email", "linked_at")
+    group = "UpstreamIdPLinksReport"
+
+    def rows(self):
+        return self.iterate(UserSocialAuth.objects.order_by('provider', 'pk').values_list(
+            'provider', 'uid', 'user__userprofile__subject', 'user__username', 'user__email', 'created'))
+
+
+def get_reports():
+    """The classes of settings.REPORTS by slug."""
+    reports = OrderedDict()
+    for path in settings.REPORTS:
+        report = import_string(path)
+        reports[report.slug] = report
+    return reports
@@ -0,0 +1,113 @@
+import functools
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+    pre_migrate,
+)
+from ..accounts.models import Organization, UserProfile
+from ..fido.models import AttestedCredentialData
+from ..mfa.backends.sms.models import SMSDevice
+from .counts import AGENTS, MEMBERS, count_memberships, refresh_users
+
+# Set while migrations run, when the count tables may not exist yet. Users a
+# data migration creates are counted by "manage.py rebuild_report_counts".
+migrating = False
+
+
+def migrate_started(sender, **kwargs):
+    global migrating
+    migrating = True
+
+
+def migrate_finished(sender, **kwargs):
+    global migrating
+    migrating = False
+
+
+def counting(handler):
+    @functools.wraps(handler)
+    def receiver(*args, **kwargs):
+        if not migrating:
+            handler(*args, **kwargs)
+    return receiver
+
+
+@counting
+def user_created(sender, instance, created, **kwargs):
+    if created:
+        refresh_users([instance.pk])
+
+
+@counting
+def user_deleted(sender, instance, **kwargs):
+    # Before the delete cascades to the user's memberships.
+    refresh_users([instance.pk], deleted=True)
+
+
+@counting
+def user_row_saved(sender, instance, **kwargs):
+    refresh_users([instance.user_id])
+
+
+@counting
+def user_row_deleted(sender, instance, **kwargs):
+    # Once the delete commits: it may be part of deleting the user.
+    user_id = instance.user_id
+    transaction.on_commit(lambda: refresh_users([user_id]))
+
+
+@counting
+def organization_deleting(sender, instance, **kwargs):
+    instance._counted_agent_ids = list(instance.users.values_list('pk', flat=True))
+
+
+@counting
+def organization_deleted(sender, instance, **kwargs):
+    # Its counts went with it, but its agents may be agents of no organization now.
+    refresh_users(getattr(instance, '_counted_agent_ids', ()))
+
+
+@counting
+def memberships_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    role = MEMBERS if sender is Organization.members.through else AGENTS
+    if action in ('pre_add', 'pre_remove', 'pre_clear'):
+        if reverse:
+            pairs = [(organization_id, instance.pk) for organization_id in pk_set or ()]
+            existing = sender.objects.filter(user_id=instance.pk)
+        else:
+            pairs = [(instance.pk, user_id) for user_id in pk_set or ()]
+            existing = sender.objects.filter(organization_id=instance.pk)
+        if action != 'pre_add':
+            # Only the memberships that exist are removed.
+            if action == 'pre_remove':
+                existing = existing.filter(**{'organization_id__in' if reverse else 'user_id__in': pk_set})
+            pairs = list(existing.values_list('organization_id', 'user_id'))
+        count_memberships(role, pairs, 1 if action == 'pre_add' else -1)
+        instance._counted_user_ids = {user_id for organization_id, user_id in pairs}
+    elif role == AGENTS:
+        # Whether they are an agent of any organization may have changed.
+        refresh_users(getattr(instance, '_counted_user_ids', ()))
+
+
+def connect_report_count_signals():
+    pre_migrate.connect(migrate_started, dispatch_uid='report_counts_migrate_started')
+    post_migrate.connect(migrate_finished, dispatch_uid='report_counts_migrate_finished')
+    user_model = get_user_model()
+    post_save.connect(user_created, sender=user_model, dispatch_uid='report_counts_user_created')
+    pre_delete.connect(user_deleted, sender=user_model, dispatch_uid='report_counts_user_deleted')
+    for model in (UserProfile, SMSDevice, AttestedCredentialData):
+        label = model._meta.label
+        post_save.connect(user_row_saved, sender=model, dispatch_uid='report_counts_save_%s' % (label))
+        post_delete.connect(user_row_deleted, sender=model, dispatch_uid='report_counts_delete_%s' % (label))
+    pre_delete.connect(organization_deleting, sender=Organization,
+                       dispatch_uid='report_counts_organization_deleting')
+    post_delete.connect(organization_deleted, sender=Organization,
+                        dispatch_uid='report_counts_organization_deleted')
+    for through in (Organization.members.through, Organization.users.through):
+        m2m_changed.connect(memberships_changed, sender=through,
+                            dispatch_uid='report_counts_%s' % (through._meta.label))
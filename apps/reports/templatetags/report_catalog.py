@@ -0,0 +1,16 @@
+from django import template
+from ..reports import get_reports
+
+register = template.Library()
+
+
+@register.simple_tag
+def reports_for(user):
+    """
+    The reports of settings.REPORTS that ``user`` may download. Without a
+    request in the context, e.g. on error pages, ``user`` is "" and none are.
+    """
+    if not getattr(user, 'is_authenticated', False):
+        return []
+    groups = set(user.groups.values_list('name', flat=True))
+    return [report for report in get_reports().values() if report.allows(user, groups)]
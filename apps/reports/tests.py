@@ -1,3 +1,241 @@
-# from django.test import TestCase
+import csv
+import io
+from datetime import date, timedelta
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from social_django.models import UserSocialAuth
+from ..accounts.models import Organization, UserProfile
+from ..fido.models import AttestedCredentialData
+from ..ial.models import IdentityAssuranceLevelDocumentation
+from ..mfa.backends.sms.models import SMSDevice
+from .counts import rebuild
+from .models import IALCount, MFACount, OrganizationCount, SignupCount
+from .reports import IALDistributionReport, Report, OrganizationAgentsReport
+from .templatetags.report_catalog import reports_for
 
-# Create your tests here.
+User = get_user_model()
+
+
+def commit():
+    """Run the on_commit callbacks of the test's transaction, as its commit would."""
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for sids, func in callbacks:
+        func()
+
+
+def read_csv(response):
+    return list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+
+
+class ReportTestCase(TestCase):
+
+    def setUp(self):
+        self.viewer = User.objects.create_user("viewer", "viewer@example.com", "pass")
+        self.viewer.groups.add(Group.objects.create(name="OrganizationAgentReport"))
+        self.org = Organization.objects.create(name="Acme")
+        self.agents = []
+        for i in range(3):
+            user = User.objects.create_user("agent%d" % (i), "agent%d@example.com" % (i), "pass")
+            UserProfile.objects.create(user=user, mobile_phone_number="+1555555555%d" % (i))
+            self.agents.append(user)
+        self.org.users.add(*self.agents)
+        self.org.members.add(*self.agents[:2])
+        self.org.point_of_contact = self.agents[1]
+        self.org.save()
+        # The viewer's reports only cover the organizations it is an agent of.
+        self.other_org = Organization.objects.create(name="Other")
+        self.other_org.users.add(self.viewer)
+        self.other_org.members.add(self.agents[2])
+        commit()
+
+    def test_organizations_and_agents(self):
+        self.org.users.add(self.viewer)
+        self.client.force_login(self.viewer)
+        response = self.client.get("/reports/org-and-agent-report")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = read_csv(response)
+        self.assertEqual(rows[0], list(OrganizationAgentsReport.header))
+        self.assertEqual([row[:2] + row[4:6] for row in rows[1:]], [
+            ["Acme", "N", "agent0@example.com", "+15555555550"],
+            ["Acme", "Y", "agent1@example.com", "+15555555551"],
+            ["Acme", "N", "agent2@example.com", "+15555555552"],
+            ["Acme", "N", "viewer@example.com", ""],
+            ["Other", "N", "viewer@example.com", ""],
+        ])
+
+    def test_organization_reports_cover_the_viewers_organizations(self):
+        self.client.force_login(self.viewer)
+        rows = read_csv(self.client.get("/reports/org-and-agent-report"))
+        self.assertEqual([row[0] for row in rows[1:]], ["Other"])
+        rows = read_csv(self.client.get("/reports/organization-counts.csv"))
+        self.assertEqual([row[:3] for row in rows[1:]], [["Other", "1", "1"]])
+        self.viewer.groups.add(Group.objects.create(name="MembersByOrganizationReport"))
+        rows = read_csv(self.client.get("/reports/members-by-organization.csv"))
+        self.assertEqual([row[0] + " " + row[4] for row in rows[1:]], ["Other agent2@example.com"])
+
+    def test_queries_do_not_grow_with_the_rows(self):
+        with CaptureQueriesContext(connection) as few:
+            list(OrganizationAgentsReport(chunk_size=2).stream())
+        more = []
+        for i in range(3, 6):
+            user = User.objects.create_user("agent%d" % (i), "agent%d@example.com" % (i), "pass")
+            more.append(user)
+        self.org.users.add(*more)
+        with CaptureQueriesContext(connection) as many:
+            rows = list(OrganizationAgentsReport(chunk_size=100).stream())
+        self.assertEqual(len(few), len(many))
+        self.assertEqual("".join(rows).count("\n"), 8)
+
+    def test_catalog(self):
+        SMSDevice.objects.create(user=self.agents[0], phone_number="+15555555550")
+        UserSocialAuth.objects.create(user=self.agents[2], provider="okta-openidconnect", uid="00u1")
+        self.viewer.is_superuser = True
+        self.viewer.save()
+        self.client.force_login(self.viewer)
+        rows = read_csv(self.client.get("/reports/members-by-organization.csv"))
+        self.assertEqual([row[4] for row in rows[1:]],
+                         ["agent0@example.com", "agent1@example.com", "agent2@example.com"])
+        rows = read_csv(self.client.get("/reports/ial-distribution.csv"))
+        self.assertEqual(rows, [["ial", "users", "agents"], ["1", "4", "4"]])
+        rows = read_csv(self.client.get("/reports/mfa-enrollment.csv"))
+        enrollment = {row[1]: row[3:] for row in rows[1:]}
+        self.assertEqual(enrollment["viewer"], ["N", "", "N"])
+        self.assertEqual(enrollment["agent0"], ["Y", "+15555555550", "N"])
+        rows = read_csv(self.client.get("/reports/upstream-idp-links.csv"))
+        self.assertEqual(rows[1][:4], ["okta-openidconnect", "00u1", self.agents[2].userprofile.subject, "agent2"])
+        self.assertEqual(self.client.get("/reports/nothing.csv").status_code, 404)
+
+    def test_group_required(self):
+        self.client.force_login(self.agents[0])
+        response = self.client.get("/reports/mfa-enrollment.csv")
+        self.assertEqual(response.status_code, 302)
+        # The agent contact sheet's group doesn't open the member-level reports.
+        self.client.force_login(self.viewer)
+        for slug in ("members-by-organization", "mfa-enrollment", "upstream-idp-links"):
+            self.assertEqual(self.client.get("/reports/%s.csv" % (slug)).status_code, 302)
+        self.viewer.groups.add(Group.objects.create(name="MFAEnrollmentReport"))
+        self.assertEqual(self.client.get("/reports/mfa-enrollment.csv").status_code, 200)
+
+    def test_site_wide_counts_are_for_staff(self):
+        self.client.force_login(self.viewer)
+        self.assertEqual(self.client.get("/reports/ial-distribution.csv").status_code, 302)
+        self.assertNotIn(IALDistributionReport, reports_for(self.viewer))
+        self.viewer.is_staff = True
+        self.viewer.save()
+        self.assertEqual(self.client.get("/reports/ial-distribution.csv").status_code, 200)
+        self.assertIn(IALDistributionReport, reports_for(self.viewer))
+
+    def test_menu_without_a_request(self):
+        # As on the 500 page, whose context has no request.
+        self.assertEqual(reports_for(""), [])
+        self.assertIn("navbar", render_to_string("include/main-nav.html"))
+
+    def test_stream_is_sent_in_parts(self):
+        class Numbers(Report):
+            header = ("number",)
+
+            def rows(self):
+                for i in range(20000):
+                    yield [i]
+        parts = list(Numbers().stream())
+        self.assertGreater(len(parts), 1)
+        self.assertEqual(len("".join(parts).splitlines()), 20001)
+
+
+class CountsTestCase(TestCase):
+
+    def setUp(self):
+        # Count the root user a data migration created.
+        rebuild()
+        self.org = Organization.objects.create(name="Acme")
+        self.users = []
+        for i in range(4):
+            user = User.objects.create_user("user%d" % (i), "user%d@example.com" % (i), "pass")
+            UserProfile.objects.create(user=user)
+            self.users.append(user)
+
+    def assertCountsRebuilt(self):
+        commit()
+        self.assertEqual(rebuild(), 0)
+
+    def org_counts(self):
+        commit()
+        return {count.ial_level: (count.members, count.agents)
+                for count in OrganizationCount.objects.filter(organization=self.org)}
+
+    def test_memberships_and_ial(self):
+        self.org.members.add(*self.users[:3])
+        self.org.users.add(self.users[3])
+        self.users[0].org_members.add(self.org)
+        self.assertEqual(self.org_counts(), {1: (3, 1)})
+        self.assertEqual(IALCount.objects.get(ial_level=1).agents, 1)
+        # Nothing is counted before the transaction commits.
+        self.org.members.remove(self.users[0])
+        self.assertEqual(OrganizationCount.objects.get(organization=self.org).members, 3)
+        self.assertEqual(self.org_counts(), {1: (2, 1)})
+        self.org.members.add(self.users[0])
+
+        IdentityAssuranceLevelDocumentation.objects.create(
+            subject_user=self.users[0], evidence="ONE-SUPERIOR-OR-STRONG-PLUS",
+            expires_at=date.today() + timedelta(days=1))
+        self.assertEqual(self.org_counts(), {1: (2, 1), 2: (1, 0)})
+        self.assertCountsRebuilt()
+
+        UserProfile.downgrade_expired_ial(date.today() + timedelta(days=2))
+        self.assertEqual(self.org_counts(), {1: (3, 1), 2: (0, 0)})
+
+        self.org.members.remove(self.users[1], self.users[3])
+        self.users[2].org_members.clear()
+        self.assertEqual(self.org_counts(), {1: (1, 1), 2: (0, 0)})
+        self.org.users.clear()
+        commit()
+        self.assertEqual(IALCount.objects.get(ial_level=1).agents, 0)
+        self.assertCountsRebuilt()
+
+    def test_mfa_and_signups(self):
+        self.org.users.add(*self.users[:2])
+        SMSDevice.objects.create(user=self.users[0], phone_number="+15555555550")
+        AttestedCredentialData.objects.create(user=self.users[1], aaguid=b"", _credential_id=b"1",
+                                              _public_key=b"")
+        AttestedCredentialData.objects.create(user=self.users[2], aaguid=b"", _credential_id=b"2",
+                                              _public_key=b"")
+        commit()
+        counts = {count.method: (count.users, count.agents) for count in MFACount.objects.all()}
+        self.assertEqual(counts, {"": (2, 0), "SMS": (1, 1), "FIDO": (2, 1)})
+        self.assertEqual(SignupCount.objects.get(day=timezone.localdate()).users, 5)
+        self.assertCountsRebuilt()
+
+        self.users[0].delete()
+        commit()
+        self.assertEqual(MFACount.objects.get(method="SMS").users, 0)
+        self.assertEqual(self.org_counts(), {1: (0, 1)})
+        self.org.delete()
+        commit()
+        self.assertEqual(MFACount.objects.get(method="FIDO").agents, 0)
+        self.assertCountsRebuilt()
+
+    def test_rebuild_corrects_drift(self):
+        self.org.members.add(*self.users)
+        commit()
+        IALCount.objects.update(users=0)
+        OrganizationCount.objects.all().delete()
+        self.assertEqual(rebuild(), 2)
+        self.assertEqual(self.org_counts(), {1: (4, 0)})
+        self.assertEqual(IALCount.objects.get(ial_level=1).users, 5)
+
+    def test_summary_reports(self):
+        viewer = User.objects.create_superuser("viewer", "viewer@example.com", "pass")
+        self.org.members.add(*self.users)
+        commit()
+        self.client.force_login(viewer)
+        rows = read_csv(self.client.get("/reports/organization-counts.csv"))
+        self.assertEqual(rows, [["organization", "ial", "members", "agents"], ["Acme", "1", "4", "0"]])
+        rows = read_csv(self.client.get("/reports/mfa-counts.csv"))
+        self.assertEqual(rows[1], ["None", "6", "0"])
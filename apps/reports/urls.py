@@ -1,12 +1,13 @@
 # Copyright Videntity Systems, Inc.
 from django.conf.urls import url
-from .views import orgs_and_agents_report
+from .views import report_csv
 
 
 # Copyright Videntity Systems Inc.
 
 urlpatterns = [
     url(r'^org-and-agent-report$',
-        orgs_and_agents_report, name='orgs_and_agents_report'),
+        report_csv, {'slug': 'organizations-and-agents'}, name='orgs_and_agents_report'),
+    url(r'^(?P<slug>[-\w]+)\.csv$', report_csv, name='report'),
 
 ]
@@ -1,10 +1,9 @@
 import logging
-from django.http import HttpResponse
 from django.contrib.auth.decorators import login_required
-from ..accounts.models import Organization, UserProfile
-from .decorators import group_required
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, StreamingHttpResponse
+from .reports import get_reports
 from datetime import datetime
-import csv
 
 # Copyright Videntity Systems Inc.
 
@@ -16,34 +15,16 @@ __author__ = "Alan Viars"
 
 
 @login_required
-@group_required("OrganizationAgentReport")
-def orgs_and_agents_report(request):
-    filename = datetime.now().strftime('%m-%d-%Y_%H:%M:%S') + '.csv'
-    response = HttpResponse(content_type="text/csv")
+def report_csv(request, slug):
+    report_class = get_reports().get(slug)
+    if report_class is None:
+        raise Http404("No such report.")
+    if not report_class.allows(request.user):
+        return redirect_to_login(request.get_full_path())
+    filename = slug + "_" + datetime.now().strftime('%m-%d-%Y_%H:%M:%S') + '.csv'
+    response = StreamingHttpResponse(report_class(request.user).stream(), content_type="text/csv")
     response['Content-Disposition'] = 'attachment; filename=' + filename
-    rows = []
-    row = ["organization", "point_of_contact", "agent_first_name", "agent_last_name",
-           "agent_email", "agent_phone_number",  "agent_last_login"]
-    rows.append(row)
-    row = []
-    for org in Organization.objects.all():
-        for agent in org.users.all():
-            row.append(org.name)
-            if org.point_of_contact == agent:
-                row.append("Y")
-            else:
-                row.append("N")
-            up = UserProfile.objects.get(user=agent)
-            row = row + [agent.first_name, agent.last_name,
-                         agent.email, up.mobile_phone_number, agent.last_login]
-            rows.append(row)
-            row = []
-
-    writer = csv.writer(response, delimiter=',')
-    for r in rows:
-        # filtered_string = "".join(s for s in c if s in string.printable)
-        writer.writerows([r])
-    msg = "Org and agents report generated by %s %s." % (
-        request.user.first_name, request.user.last_name)
+    msg = "%s report generated by %s %s." % (
+        report_class.title, request.user.first_name, request.user.last_name)
     logger.info(msg)
     return response
@@ -1,6 +1,8 @@
 from django.test.client import Client
 from django.test import TestCase
 from django.urls import reverse
+from unittest import mock
+from apps.oidc.views import DiscoveryDocument, get_discovery_document
 
 
 class ClientApiOIDCDiscoveryTest(TestCase):
@@ -20,3 +22,27 @@ class ClientApiOIDCDiscoveryTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "userinfo_endpoint")
         self.assertContains(response, "jwks_uri")
+
+    def test_oidc_discovery_conditional_get(self):
+        """
+        Test the discovery document is cacheable and answers 304
+        """
+        response = self.client.get(reverse('openid-configuration'))
+        self.assertIn("max-age", response["Cache-Control"])
+        # Every process serves the same ETag; a start time would differ.
+        self.assertNotIn("Last-Modified", response)
+        not_modified = self.client.get(reverse('openid-configuration'),
+                                       HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], response["ETag"])
+
+    def test_oidc_discovery_is_built_once(self):
+        """
+        Test the discovery document is not rebuilt for every request
+        """
+        document = get_discovery_document()
+        with mock.patch.object(DiscoveryDocument, "build") as build:
+            response = self.client.get(reverse('openid-configuration'))
+        build.assert_not_called()
+        self.assertIs(get_discovery_document(), document)
+        self.assertEqual(response["ETag"], '"%s"' % (document.etag))
@@ -0,0 +1,121 @@
+"""
+Deletes rows that can never be used again (expired tokens, spent codes)
+in bounded batches.
+
+A purge policy is a function taking the current time and returning the
+queryset of purgeable rows. The policies are listed in settings.PURGE_POLICIES.
+"""
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('verifymyidentity_.%s' % __name__)
+
+
+class PurgeResult(object):
+
+    def __init__(self, label, rows, seconds, batches):
+        self.label = label
+        self.rows = rows
+        self.seconds = seconds
+        self.batches = batches
+
+    def __str__(self):
+        return "%s: %d rows in %d batches, %.2fs" % (
+            self.label, self.rows, self.batches, self.seconds)
+
+
+def get_purge_policies():
+    return [import_string(p) for p in settings.PURGE_POLICIES]
+
+
+def purge_queryset(queryset, batch_size):
+    """
+    Delete ``queryset`` one primary key range of at most ``batch_size`` rows
+    at a time, each range in its own transaction so locks stay short.
+    Returns the rows and batches deleted.
+    """
+    label = queryset.model._meta.label
+    rows = batches = 0
+    last_pk = None
+    while True:
+        candidates = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        pks = list(candidates.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        with transaction.atomic():
+            deleted, per_model = queryset.filter(
+                pk__gte=pks[0], pk__lte=pks[-1]).delete()
+        rows += per_model.get(label, 0)
+        batches += 1
+        last_pk = pks[-1]
+        if len(pks) < batch_size:
+            break
+    return rows, batches
+
+
+def purge(policies=None, batch_size=None, dry_run=False):
+    """Run the purge policies. A dry run only counts the rows."""
+    if policies is None:
+        policies = get_purge_policies()
+    if batch_size is None:
+        batch_size = settings.PURGE_BATCH_SIZE
+    now = timezone.now()
+    results = []
+    for policy in policies:
+        queryset = policy(now)
+        label = "%s (%s)" % (queryset.model._meta.label, policy.__name__)
+        start = time.monotonic()
+        if dry_run:
+            rows, batches = queryset.count(), 0
+        else:
+            rows, batches = purge_queryset(queryset, batch_size)
+        result = PurgeResult(label, rows, time.monotonic() - start, batches)
+        logger.info("Purge%s %s", " (dry run)" if dry_run else "", result)
+        results.append(result)
+    return results
+
+
+class PurgeScheduler(threading.Thread):
+    """Runs ``purge()`` every ``interval`` seconds in a daemon thread."""
+
+    daemon = True
+
+    def __init__(self, interval):
+        super().__init__(name="purge-scheduler")
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                purge()
+            except Exception:
+                logger.exception("Scheduled purge failed")
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self.stopped.set()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_purge_scheduler(interval=None):
+    """Start the in-process scheduler once, if PURGE_INTERVAL is set."""
+    global _scheduler
+    if interval is None:
+        interval = settings.PURGE_INTERVAL
+    if not interval:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PurgeScheduler(interval)
+            _scheduler.start()
+    return _scheduler
@@ -0,0 +1,134 @@
+"""
+Content-addressed QR code images, rendered off the request path.
+
+A QR code is stored at qr_codes/<sha256 of its segments>.png, so identical
+content is rendered and uploaded once, however many rows or saves use it.
+Models schedule the rendering with render_later() once their row commits;
+a thread pool renders and uploads the image and then sets the model's
+ImageField. Until then, views serve get_png(), rendered on demand and
+cached. Only render() writes those fields of existing rows: model saves
+leave them out with save_fields(), so a stale instance can't undo a render.
+"""
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import qrcode
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger('verifymyidentity_.%s' % __name__)
+
+QR_CODE_DIR = 'qr_codes'
+
+
+def get_digest(segments):
+    return hashlib.sha256(json.dumps(list(segments)).encode()).hexdigest()
+
+
+def get_path(segments):
+    return "%s/%s.png" % (QR_CODE_DIR, get_digest(segments))
+
+
+def render_png(segments):
+    """The PNG of a QR code holding ``segments``, each added as its own data segment."""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=6,
+        border=0)
+    for segment in segments:
+        qr.add_data(segment)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = BytesIO()
+    img.save(buffer)
+    return buffer.getvalue()
+
+
+def get_png(segments):
+    """The PNG of ``segments`` from the cache, rendered on a miss."""
+    key = "qrcode:%s" % get_digest(segments)
+    png = cache.get(key)
+    if png is None:
+        png = render_png(segments)
+        cache.set(key, png, settings.QR_CODE_CACHE_SECONDS)
+    return png
+
+
+def store(segments, png=None):
+    """
+    Upload the image of ``segments``, rendered unless ``png`` is given,
+    unless already stored. Returns its name.
+    """
+    path = get_path(segments)
+    if default_storage.exists(path):
+        return path
+    name = default_storage.save(path, ContentFile(png or get_png(segments)))
+    if name != path:
+        # A concurrent upload won the race and the storage picked another
+        # name. The content is the same, so keep the content-addressed one.
+        default_storage.delete(name)
+    return path
+
+
+def render(model_label, pk, field_name, segments):
+    """Store the image of ``segments`` and point the row's ``field_name`` at it."""
+    name = store(segments)
+    apps.get_model(model_label).objects.filter(pk=pk).update(**{field_name: name})
+    return name
+
+
+def save_fields(instance, field_names, update_fields=None):
+    """
+    The ``update_fields`` to save an existing ``instance`` with, leaving out
+    its QR code ``field_names``, which render() sets on the row directly.
+    """
+    if instance._state.adding or instance.pk is None:
+        return update_fields
+    if update_fields is None:
+        update_fields = [f.name for f in instance._meta.concrete_fields if not f.primary_key]
+    return [name for name in update_fields if name not in field_names]
+
+
+def render_in_thread(*args):
+    try:
+        render(*args)
+    except Exception:
+        logger.exception("Rendering the QR code of %s %s failed", args[0], args[1])
+    finally:
+        close_old_connections()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.QR_CODE_RENDER_THREADS,
+                                           thread_name_prefix="qr-codes")
+    return _executor
+
+
+def render_later(instance, field_name, segments):
+    """
+    Render the QR code of ``segments`` into ``instance.<field_name>`` after
+    the current transaction commits. Nothing is done when the field already
+    holds that image. With QR_CODE_RENDER_THREADS = 0 it is rendered now.
+    """
+    if getattr(instance, field_name).name == get_path(segments):
+        return
+    args = (instance._meta.label, instance.pk, field_name, list(segments))
+    if not settings.QR_CODE_RENDER_THREADS:
+        setattr(instance, field_name, render(*args))
+        return
+    transaction.on_commit(lambda: get_executor().submit(render_in_thread, *args))
@@ -1,10 +1,41 @@
+from django.db.models import TextField, Value
+from django.db.models.functions import Concat
 from django.utils import timezone
 from django.utils.timezone import timedelta
 from oauth2_provider.models import AccessToken, RefreshToken
+from apps.oidc.access_tokens import (
+    get_token_id,
+    jwt_access_tokens_enabled,
+    reencode_access_token,
+)
 from apps.oidc.request_validator import RequestValidator as OIDCRequestValidator
 from libs.grant_types_validator import SettingsFlowValidatorMixin
 
 
+def normalize_scope(scopes):
+    """Scopes as stored on access tokens: unique, sorted, space separated."""
+    return " ".join(sorted(set(scopes)))
+
+
+def get_reusable_token(user, application, scopes):
+    """
+    The live access token of the couple user/application with the longest
+    remaining lifetime that allows all of ``scopes``, with its refresh token.
+
+    One query on the (user, application, expires) index. The scope check is
+    done in SQL on the space padded scope, so no candidate is loaded into
+    Python.
+    """
+    tokens = AccessToken.objects.filter(
+        user=user, application=application, expires__gt=timezone.now(),
+    ).annotate(
+        padded_scope=Concat(Value(" "), "scope", Value(" "), output_field=TextField()),
+    )
+    for scope in set(scopes):
+        tokens = tokens.filter(padded_scope__contains=" %s " % (scope))
+    return tokens.select_related('refresh_token', 'application').order_by('-expires').first()
+
+
 class RequestValidator(SettingsFlowValidatorMixin,
                        OIDCRequestValidator):
     pass
@@ -26,28 +57,22 @@ class SingleAccessTokenValidator(RequestValidator):
         If all the conditions are true the same access_token is issued.
         Otherwise a new one is created with the default strategy.
         """
-        # this queryset identifies all the valid access tokens
-        # for the couple user/application.
-        previous_valid_tokens = AccessToken.objects.filter(
-            user=request.user, application=request.client,
-        ).filter(expires__gt=timezone.now()).order_by('-expires')
-
         # if a refresh token was not used and a valid token exists we
         # can replace the new generated token with the old one.
-        if not request.refresh_token and previous_valid_tokens.exists():
-            for access_token in previous_valid_tokens:
-                # the previous access_token must allow access to the same scope
-                # or bigger
-                if access_token.allow_scopes(token['scope'].split()):
+        if not request.refresh_token:
+            access_token = get_reusable_token(
+                request.user, request.client, token['scope'].split())
+            if access_token is not None:
+                if jwt_access_tokens_enabled():
+                    token['access_token'] = reencode_access_token(access_token)
+                else:
                     token['access_token'] = access_token.token
-                    expires_in = access_token.expires - timezone.now()
-                    token['expires_in'] = expires_in.total_seconds()
-
-                    if hasattr(access_token, 'refresh_token'):
-                        token['refresh_token'] = access_token.refresh_token.token
+                expires_in = access_token.expires - timezone.now()
+                token['expires_in'] = expires_in.total_seconds()
 
-                    # break the loop and exist because we found to old token
-                    return
+                if hasattr(access_token, 'refresh_token'):
+                    token['refresh_token'] = access_token.refresh_token.token
+                return
 
         # default behaviour when no old token is found
         if request.refresh_token:
@@ -63,9 +88,9 @@ class SingleAccessTokenValidator(RequestValidator):
 
         access_token = AccessToken(
             user=request.user,
-            scope=token['scope'],
+            scope=normalize_scope(token['scope'].split()),
             expires=expires,
-            token=token['access_token'],
+            token=get_token_id(token['access_token']),
             application=request.client)
         access_token.save()
 
@@ -64,6 +64,7 @@ INSTALLED_APPS = [
     'apps.testclient',
     'apps.api',
     'apps.healthcards',
+    'apps.notifications',
 ]
 
 MIDDLEWARE = [
@@ -258,13 +259,47 @@ REST_FRAMEWORK = {
 
 # OAUTH SETTINGS
 OAUTH2_PROVIDER = {
-    'SCOPES': {'openid': 'open id connect access'},
-    'DEFAULT_SCOPES': ['openid'],
+    # Claim providers declare which of these scopes grant their claims.
+    # "openid" alone yields only the subject and authentication claims,
+    # unless OIDC_OPENID_SCOPE_ALL_CLAIMS is set.
+    'SCOPES': {'openid': 'open id connect access',
+               'profile': 'name, birthdate, gender and picture',
+               'email': 'email address',
+               'address': 'postal addresses',
+               'phone': 'phone number',
+               'document': 'identifiers and documents',
+               'organization': 'organization memberships and affiliations',
+               'person_to_person': 'people you act on behalf of',
+               'verified_claims': 'verified identity evidence'},
+    # Requests without a scope keep receiving every claim.
+    'DEFAULT_SCOPES': ['__all__'],
     'OAUTH2_VALIDATOR_CLASS': 'vmi.oauth2_validators.SingleAccessTokenValidator',
     'OAUTH2_SERVER_CLASS': 'apps.oidc.server.Server',
     'REQUEST_APPROVAL_PROMPT': 'auto',
     'ACCESS_TOKEN_EXPIRE_SECONDS':  int(env('ACCESS_TOKEN_EXPIRE_SECONDS', 315360000))
 }
+# Expired tokens and spent one-time codes deleted by "manage.py purge_expired"
+PURGE_POLICIES = [
+    'apps.oidc.purge.revoked_refresh_tokens',
+    'apps.oidc.purge.expired_access_tokens',
+    'apps.oidc.purge.expired_grants',
+    'apps.oidc.purge.expired_revoked_access_tokens',
+    'apps.mfa.backends.sms.purge.expired_sms_codes',
+    'apps.accounts.purge.spent_phone_verify_codes',
+    'apps.accounts.purge.expired_activation_keys',
+    'apps.accounts.purge.expired_password_reset_keys',
+    'apps.accounts.purge.old_id_card_confirmations',
+    'apps.accounts.purge.expired_sessions',
+    'apps.notifications.purge.delivered_notifications',
+]
+# Rows deleted per transaction.
+PURGE_BATCH_SIZE = int(env('PURGE_BATCH_SIZE', 1000))
+# Seconds between purges run in a background thread of each web process.
+# 0 disables it, e.g. when purge_expired runs from cron instead.
+PURGE_INTERVAL = int(env('PURGE_INTERVAL', 0))
+ID_CARD_CONFIRMATION_RETENTION_DAYS = int(
+    env('ID_CARD_CONFIRMATION_RETENTION_DAYS', 30))
+
 OAUTH2_PROVIDER_GRANT_MODEL = 'oidc.Grant'
 OAUTH2_PROVIDER_ACCESS_TOKEN_MODEL = 'oauth2_provider.AccessToken'
 OAUTH2_PROVIDER_APPLICATION_MODEL = 'oauth2_provider.Application'
@@ -321,10 +356,38 @@ OIDC_PROVIDER = {
         'apps.mfa.backends.sms.claims.AuthenticatorAssuranceProvider',
         'apps.okta.claims.AuthenticatorAssuranceProvider',
     ],
+    'OIDC_CLAIM_SNAPSHOTS': True,
+    'OIDC_CLAIM_SNAPSHOT_SOURCES': {
+        # The person_to_person claim embeds the subject's profile, so the
+        # subject's changes also reach their delegates.
+        'auth.User': ('pk', 'persontoperson_delegate__subject'),
+        'accounts.UserProfile': ('userprofile',
+                                 'persontoperson_delegate__subject__userprofile'),
+        'accounts.Address': ('address', ),
+        'accounts.IndividualIdentifier': ('individualidentifier', ),
+        'accounts.UpstreamIdentityProviderUserAuthenticatorAssurance': (
+            'upstreamidentityprovideruserauthenticatorassurance', ),
+        'accounts.PersonToPersonRelationship': ('persontoperson_delegate', ),
+        'accounts.Organization': ('org_members', 'org_staff'),
+        'ial.IdentityAssuranceLevelDocumentation': (
+            'subject_user', 'persontoperson_delegate__subject__subject_user'),
+        'fido.AttestedCredentialData': ('attestedcredentialdata', ),
+        'sms.SMSDevice': ('smsdevice', ),
+    },
+    # Signed access tokens validated without a token lookup.
+    'OIDC_JWT_ACCESS_TOKENS': bool_env(env('OIDC_JWT_ACCESS_TOKENS', False)),
+    # Every claim for scope=openid tokens, for relying parties that predate
+    # the claim scopes.
+    'OIDC_OPENID_SCOPE_ALL_CLAIMS': bool_env(env('OIDC_OPENID_SCOPE_ALL_CLAIMS', False)),
 }
 
 # Adding to allow other modes of SMS text delivery in the future.
-SMS_STRATEGY = env('SMS_STRATEGY', 'AWS-SNS')  # AWS-SNS or TWILIO
+SMS_STRATEGY = env('SMS_STRATEGY', 'AWS-SNS')  # AWS-SNS, TWILIO or MEMORY (no network)
+# HTTP connections kept open to the SMS provider, and their timeout in seconds.
+SMS_MAX_POOL_CONNECTIONS = int(env('SMS_MAX_POOL_CONNECTIONS', 10))
+SMS_TIMEOUT = int(env('SMS_TIMEOUT', 10))
+# Seconds each message "takes" with the MEMORY strategy.
+SMS_FAKE_LATENCY = float(env('SMS_FAKE_LATENCY', 0))
 
 # If Using TWILIO, set these credentials
 
@@ -338,6 +401,85 @@ TWILIO_FROM_NUMBER = env('TWILIO_FROM_NUMBER', "+15555555555")
 # Add a prefix to the luhn checkdigit calculation.
 # This can help identify genuine subject ids and indicate provenance.
 SUBJECT_LUHN_PREFIX = env('SUBJECT_LUHN_PREFIX', '')
+# Subject IDs each process reserves with one query.
+SUBJECT_ID_BLOCK_SIZE = int(env('SUBJECT_ID_BLOCK_SIZE', 100))
+# Rows of a bulk member import written per transaction.
+MEMBER_IMPORT_BATCH_SIZE = int(env('MEMBER_IMPORT_BATCH_SIZE', 500))
+# Profiles set back to IAL1 per transaction by "manage.py downgrade_expired_ial".
+IAL_DOWNGRADE_BATCH_SIZE = int(env('IAL_DOWNGRADE_BATCH_SIZE', 500))
+# Profiles per page of member search results.
+MEMBER_SEARCH_PAGE_SIZE = int(env('MEMBER_SEARCH_PAGE_SIZE', 50))
+# Users per page of /api/v1/user/, and per batch of claims when the list is not paged.
+API_USER_PAGE_SIZE = int(env('API_USER_PAGE_SIZE', 100))
+# The largest page a client may ask for with ?page_size=.
+API_USER_MAX_PAGE_SIZE = int(env('API_USER_MAX_PAGE_SIZE', 500))
+# The most objects a bulk write (.../bulk/) takes in one request.
+API_BULK_MAX_ITEMS = int(env('API_BULK_MAX_ITEMS', 1000))
+# The most users a bulk write takes: each password is hashed, ~0.1 s apiece.
+API_USER_BULK_MAX_ITEMS = int(env('API_USER_BULK_MAX_ITEMS', 50))
+
+# Threads rendering and uploading QR code images after the request commits.
+# 0 renders them in the request.
+QR_CODE_RENDER_THREADS = int(env('QR_CODE_RENDER_THREADS', 2))
+# Seconds QR codes rendered on demand are cached, and browsers may keep them.
+QR_CODE_CACHE_SECONDS = int(env('QR_CODE_CACHE_SECONDS', 3600))
+
+# SMART Health Card batch issuance ("manage.py issue_health_cards" and the
+# API): signing processes of the command (0 signs in its own process), cards
+# written per batch and threads uploading QR codes.
+SHC_ISSUE_PROCESSES = int(env('SHC_ISSUE_PROCESSES', 0))
+SHC_ISSUE_BATCH_SIZE = int(env('SHC_ISSUE_BATCH_SIZE', 500))
+SHC_ISSUE_UPLOAD_THREADS = int(env('SHC_ISSUE_UPLOAD_THREADS', 8))
+# Cards accepted per API request. The API signs them in the web worker, so
+# this stays small: larger batches go through "manage.py issue_health_cards".
+SHC_ISSUE_API_MAX_CARDS = int(env('SHC_ISSUE_API_MAX_CARDS', 50))
+
+# CSV reports served at reports/<slug>.csv. See apps/reports/reports.py.
+REPORTS = [
+    'apps.reports.reports.OrganizationAgentsReport',
+    'apps.reports.reports.MembersByOrganizationReport',
+    'apps.reports.reports.MFAEnrollmentReport',
+    'apps.reports.reports.IALDistributionReport',
+    'apps.reports.reports.OrganizationCountsReport',
+    'apps.reports.reports.MFACountsReport',
+    'apps.reports.reports.SignupCountsReport',
+    'apps.reports.reports.UpstreamIdPLinksReport',
+]
+# Rows fetched per query while a report streams.
+REPORT_CHUNK_SIZE = int(env('REPORT_CHUNK_SIZE', 2000))
+# Keep the report counts (apps/reports/counts.py) up to date as users,
+# memberships, IAL documentation and MFA devices change. Turn it off for
+# large loads and run "manage.py rebuild_report_counts" afterwards.
+REPORT_COUNTS_LIVE = bool_env(env('REPORT_COUNTS_LIVE', True))
+# Users counted per query by rebuild_report_counts.
+REPORT_COUNTS_BATCH_SIZE = int(env('REPORT_COUNTS_BATCH_SIZE', 500))
+
+# Emails and text messages are queued in the outbox and sent by
+# "manage.py deliver_notifications". FileTransport and LoopbackTransport
+# (apps.notifications.transports) replace the providers in development.
+NOTIFICATION_TRANSPORTS = {
+    'email': env('NOTIFICATION_EMAIL_TRANSPORT', 'apps.notifications.transports.EmailTransport'),
+    'sms': env('NOTIFICATION_SMS_TRANSPORT', 'apps.notifications.transports.SMSTransport'),
+}
+NOTIFICATION_FILE_PATH = env('NOTIFICATION_FILE_PATH', os.path.join(BASE_DIR, 'tmp', 'notifications'))
+# Concurrent sends per channel.
+NOTIFICATION_CHANNEL_CONCURRENCY = {
+    'email': int(env('NOTIFICATION_EMAIL_CONCURRENCY', 4)),
+    'sms': int(env('NOTIFICATION_SMS_CONCURRENCY', 2)),
+}
+NOTIFICATION_BATCH_SIZE = int(env('NOTIFICATION_BATCH_SIZE', 100))
+NOTIFICATION_MAX_ATTEMPTS = int(env('NOTIFICATION_MAX_ATTEMPTS', 6))
+# Seconds before the first retry, doubled for each later one.
+NOTIFICATION_RETRY_DELAY = int(env('NOTIFICATION_RETRY_DELAY', 30))
+NOTIFICATION_RETRY_MAX_DELAY = int(env('NOTIFICATION_RETRY_MAX_DELAY', 3600))
+# Seconds a worker holds the notifications it claimed.
+NOTIFICATION_LEASE_SECONDS = int(env('NOTIFICATION_LEASE_SECONDS', 300))
+# Seconds between outbox polls of a delivery thread in each web process, for
+# single process servers only: uWSGI doesn't run threads started at import
+# unless enable-threads and lazy-apps are set. 0, the default, leaves the
+# outbox to "manage.py deliver_notifications" running as its own process.
+NOTIFICATION_WORKER_INTERVAL = int(env('NOTIFICATION_WORKER_INTERVAL', 0))
+NOTIFICATION_RETENTION_DAYS = int(env('NOTIFICATION_RETENTION_DAYS', 7))
 APPLICATION_TITLE = env('APPLICATION_TITLE', "Verify My Identity")
 KILLER_APP_TITLE = env('KILLER_APP_TITLE', 'Example Application: SMART Health Cards')
 KILLER_APP_URI = env('KILLER_APP_URI', '')
@@ -510,6 +652,9 @@ CURRENT_TOS_VERSION = env('CURRENT_TOS_VERSION', "1")
 # Privacy Policy version
 CURRENT_PP_VERSION = env('CURRENT_PP_VERSION', "1")
 
+# Database sessions indexed by user, for remote logout.
+SESSION_ENGINE = 'apps.accounts.sessions'
+
 # Expire session on browser close.
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 
@@ -27,7 +27,7 @@ oauth2_base_urlpatterns = [
         oauth2_views.RevokeTokenView.as_view(),
         name="revoke-token"),
     url(r"^introspect/$",
-        oauth2_views.IntrospectTokenView.as_view(),
+        oidc_views.IntrospectTokenView.as_view(),
         name="introspect"),
 ]
 
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 dotenv.load_dotenv()
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vmi.settings')
 application = get_wsgi_application()
+
+# Purge expired tokens and codes in the background when PURGE_INTERVAL is set.
+from libs.purge import start_purge_scheduler  # noqa: E402
+start_purge_scheduler()
+
+# Send queued emails and texts when NOTIFICATION_WORKER_INTERVAL is set.
+from apps.notifications.worker import start_delivery_thread  # noqa: E402
+start_delivery_thread()